@@ -2,8 +2,6 @@
 
 import logging
 
-import numpy as np
-
 # pylint: disable=import-outside-toplevel
 log = logging.getLogger(__name__)
 
@@ -27,21 +25,23 @@ class PlayerCycle:
         self.round_number_in_street = 0
         self.idx = 0
         self.dealer_idx = dealer_idx
-        self.can_still_make_moves_in_this_hand = []  # if the player can still play in this round
-        self.alive = [True] * len(self.lst)  # if the player can still play in the following rounds
-        self.out_of_cash_but_contributed = [False] * len(self.lst)
+        # seat state as bitmasks, bit i is seat i
+        self.all_seats = (1 << self.size) - 1
+        self.can_act = 0  # if the player can still play in this round
+        self.alive_mask = self.all_seats  # if the player can still play in the following rounds
+        self.all_in = 0  # out of cash but contributed to the pot
+        self.folded = 0
         self.new_hand_reset()
         self.checkers = 0
-        self.folder = None
         self.max_raises_per_player_round = max_raises_per_player_round
-        self.max_remaining_steps_without_raising = len(self.alive)
+        self.max_remaining_steps_without_raising = self.size
 
     def new_hand_reset(self):
         """Reset state if a new hand is dealt"""
         self.idx = self.start_idx
-        self.can_still_make_moves_in_this_hand = [True] * len(self.lst)
-        self.out_of_cash_but_contributed = [False] * len(self.lst)
-        self.folder = [False] * len(self.lst)
+        self.can_act = self.all_seats
+        self.all_in = 0
+        self.folded = 0
         self.step_counter = 0
 
     def new_street_reset(self):
@@ -51,12 +51,12 @@ class PlayerCycle:
         self.idx = self.dealer_idx
         self.last_raiser_step = len(self.lst)
         self.checkers = 0
-        self.max_remaining_steps_without_raising = len(self.alive) - 1
+        self.max_remaining_steps_without_raising = self.size - 1
         self.last_raiser = None
 
     def next_player(self, step=1):
         """Switch to the next player in the round."""
-        if sum(np.array(self.can_still_make_moves_in_this_hand) + np.array(self.out_of_cash_but_contributed)) < 2:
+        if (self.can_act | self.all_in).bit_count() < 2:
             log.debug("Only one player remaining")
             return False  # only one player remains
 
@@ -66,12 +66,12 @@ class PlayerCycle:
         if self.step_counter > len(self.lst):
             self.round_number_in_street += 1
         if self.max_steps_total and (self.step_counter > self.max_steps_total):
-            log.info("Max steps total has been reached")
+            log.debug("Max steps total has been reached")
             return False
 
         if self.last_raiser:
             if self.step_counter > self.last_raiser + self.max_remaining_steps_without_raising:
-                log.info("Max steps without raising has been reached. For example all calls after raiser.")
+                log.debug("Max steps without raising has been reached. For example all calls after raiser.")
                 return False
 
             if self.max_steps_after_raiser and (self.step_counter > self.max_steps_after_raiser + self.last_raiser):
@@ -82,12 +82,12 @@ class PlayerCycle:
             log.debug("max steps after raiser has been reached")
             return False
 
-        if self.checkers == sum(self.alive):
+        if self.checkers == self.alive_count:
             log.debug("All players checked")
             return False
 
         while True:
-            if self.can_still_make_moves_in_this_hand[self.idx]:
+            if self.can_act >> self.idx & 1:
                 break
 
             self.idx += 1
@@ -106,7 +106,7 @@ class PlayerCycle:
         self.dealer_idx %= len(self.lst)
 
         while True:
-            if self.can_still_make_moves_in_this_hand[self.dealer_idx]:
+            if self.can_act >> self.dealer_idx & 1:
                 break
 
             self.dealer_idx += 1
@@ -114,23 +114,35 @@ class PlayerCycle:
 
         return self.lst[self.dealer_idx]
 
+    STATE_FIELDS = ('idx', 'dealer_idx', 'step_counter', 'round_number_in_street', 'last_raiser', 'last_raiser_step',
+                    'max_steps_total', 'checkers', 'max_remaining_steps_without_raising', 'can_act', 'alive_mask',
+                    'all_in', 'folded')
+
+    def get_state(self):
+        """Tuple of the fields that change during a game, see STATE_FIELDS"""
+        return tuple(getattr(self, field) for field in self.STATE_FIELDS)
+
+    def set_state(self, state):
+        """Restore a state of get_state"""
+        for field, value in zip(self.STATE_FIELDS, state):
+            setattr(self, field, value)
+
     def set_idx(self, idx):
         """Set the index to a specific player"""
         self.idx = idx
 
     def deactivate_player(self, idx):
         """Deactivate a pleyr if he has folded or is out of cash."""
-        assert self.can_still_make_moves_in_this_hand[idx], "Already deactivated"
-        self.can_still_make_moves_in_this_hand[idx] = False
+        assert self.can_act >> idx & 1, "Already deactivated"
+        self.can_act &= ~(1 << idx)
 
     def deactivate_current(self):
         """Deactivate the current player if he has folded or is out of cash."""
-        assert self.can_still_make_moves_in_this_hand[self.idx], "Already deactivated"
-        self.can_still_make_moves_in_this_hand[self.idx] = False
+        self.deactivate_player(self.idx)
 
     def mark_folder(self):
         """Mark a player as no longer eligible to win cash from the current hand"""
-        self.folder[self.idx] = True
+        self.folded |= 1 << self.idx
 
     def mark_raiser(self):
         """Mark a raise for the current player."""
@@ -142,7 +154,7 @@ class PlayerCycle:
 
     def mark_out_of_cash_but_contributed(self):
         """Mark current player as a raiser or caller, but is out of cash."""
-        self.out_of_cash_but_contributed[self.idx] = True
+        self.all_in |= 1 << self.idx
         self.deactivate_current()
 
     def mark_bb(self):
@@ -156,12 +168,19 @@ class PlayerCycle:
 
     def update_alive(self):
         """Update the alive property"""
-        self.alive = np.array(self.can_still_make_moves_in_this_hand) + \
-                     np.array(self.out_of_cash_but_contributed)
+        self.alive_mask = self.can_act | self.all_in
+
+    @property
+    def alive_count(self):
+        """Number of players that are alive"""
+        return self.alive_mask.bit_count()
+
+    @property
+    def alive(self):
+        """If each player is alive, as list of bools"""
+        return [bool(self.alive_mask >> idx & 1) for idx in range(self.size)]
 
     def get_potential_winners(self):
-        """Players eligible to win the pot"""
-        potential_winners = np.logical_and(np.logical_or(np.array(self.can_still_make_moves_in_this_hand),
-                                                         np.array(self.out_of_cash_but_contributed)),
-                                           np.logical_not(np.array(self.folder)))
-        return potential_winners
+        """Seats of the players eligible to win the pot"""
+        potential_winners = (self.can_act | self.all_in) & ~self.folded
+        return [idx for idx in range(self.size) if potential_winners >> idx & 1]
@@ -1,39 +1,33 @@
 """Groupier functions"""
 import logging
+from functools import partial
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 from gym import Env
 from gym.spaces import Discrete
 
 from gym_env.cycle import PlayerCycle
 from gym_env.enums import Action, Stage
-from gym_env.rendering import PygletWindow, WHITE, RED, GREEN, BLUE
-from tools.hand_evaluator import get_winner
-from tools.helper import flatten
+from gym_env.observation import EQUITY_FIELDS, STAGE_FIELDS, STAGE_ROUNDS, ObservationData, ObservationInfo, \
+    observation_shape
+from tools.cards import CARD_INDEX, CARD_STRINGS, new_deck
+from tools.equity_cache import EquityCache
+from tools.hand_evaluator import get_hand_strengths, get_hand_type
+from tools.preflop_equity import preflop_lookup
 
 # pylint: disable=import-outside-toplevel
 
 log = logging.getLogger(__name__)
 
 winner_in_episodes = []
-MONTEACRLO_RUNS = 1000  # relevant for equity calculation if switched on
+MONTEACRLO_RUNS = 1000  # relevant for equity calculation if switched on, maximum runs for the python calculator
+MONTECARLO_TARGET_STDERR = 0.01  # the python calculator stops sampling once the equity is this precise
 
 
-class CommunityData:
-    """Data available to everybody"""
-
-    def __init__(self, num_players):
-        """data"""
-        self.current_player_position = [False] * num_players  # ix[0] = dealer
-        self.stage = [False] * 4  # one hot: preflop, flop, turn, river
-        self.community_pot = None
-        self.current_round_pot = None
-        self.active_players = [False] * num_players  # one hot encoded, 0 = dealer
-        self.big_blind = 0
-        self.small_blind = 0
-        self.legal_moves = [0 for action in Action]
+def _cpp_equity(player_cards, table_cards, players, runs, rng):
+    """Equity from the C++ calculator with the threads of the config, seeded from a numpy.random.Generator"""
+    from tools.montecarlo_cpp import montecarlo_parallel
+    return montecarlo_parallel(player_cards, table_cards, players, runs, seed=int(rng.integers(1, 2 ** 63)))
 
 
 class StageData:
@@ -49,16 +43,45 @@ class StageData:
         self.community_pot_at_action = [0] * num_players  # ix[0] = dealer
 
 
-class PlayerData:
-    "Player specific information"
+class FundsHistory:
+    """Stack of every seat at the start of each hand, kept in an array that doubles its capacity when full"""
 
-    def __init__(self):
-        """data"""
-        self.position = None
-        self.equity_to_river_alive = 0
-        self.equity_to_river_2plr = 0
-        self.equity_to_river_3plr = 0
-        self.stack = None
+    def __init__(self, num_players, capacity=256):
+        """Preallocate capacity hands"""
+        self._stacks = np.zeros((capacity, num_players))
+        self._hands = 0
+
+    @classmethod
+    def from_stacks(cls, stacks):
+        """History with the rows of an array of [hands, seats]"""
+        history = cls(stacks.shape[1], capacity=max(256, 2 * len(stacks)))
+        history._stacks[:len(stacks)] = stacks
+        history._hands = len(stacks)
+        return history
+
+    def append(self, stacks):
+        """Add the stacks of a new hand"""
+        if self._hands == len(self._stacks):
+            self._stacks = np.concatenate([self._stacks, np.zeros_like(self._stacks)])
+        self._stacks[self._hands] = stacks
+        self._hands += 1
+
+    @property
+    def stacks(self):
+        """Array of [hands, seats]"""
+        return self._stacks[:self._hands]
+
+    def __len__(self):
+        return self._hands
+
+    def __getitem__(self, hand):
+        """Stacks of a hand, negative indices count from the latest hand"""
+        return self.stacks[hand]
+
+    def to_frame(self, columns=None):
+        """DataFrame with one row per hand and one column per seat"""
+        import pandas as pd
+        return pd.DataFrame(self.stacks, columns=columns)
 
 
 class HoldemTable(Env):
@@ -66,7 +89,7 @@ class HoldemTable(Env):
 
     def __init__(self, initial_stacks=100, small_blind=1, big_blind=2, render=False, funds_plot=True,
                  max_raises_per_player_round=2, use_cpp_montecarlo=False, raise_illegal_moves=False,
-                 calculate_equity=False):
+                 calculate_equity=False, headless=False, seed=None, table_id=0):
         """
         The table needs to be initialized once at the beginning
 
@@ -78,20 +101,34 @@ class HoldemTable(Env):
             render (bool): render table after each move in graphical format
             funds_plot (bool): show plot of funds history at end of each episode
             max_raises_per_player_round (int): max raises per round per player
+            headless (bool): fast mode for mass simulation, no logging of the game, no plots and no rendering
+            seed (int): root seed of the random generators of the table, see seed()
+            table_id (int): id of the table, tables with the same seed and different ids are independent
 
         """
+        self.rng = np.random.default_rng()  # deals the cards
+        self.equity_rng = np.random.default_rng()  # draws the runs of the equity calculator
+        self.seed(seed, table_id)
+        if use_cpp_montecarlo:
+            from tools.montecarlo_cpp import pymontecarlo
+            if pymontecarlo is None:
+                log.warning("C++ equity calculator is not built (python setup.py build_ext --inplace), "
+                            "using the python calculator")
+                use_cpp_montecarlo = False
         if use_cpp_montecarlo:
-            import cppimport
-            calculator = cppimport.imp("tools.montecarlo_cpp.pymontecarlo")
-            get_equity = calculator.montecarlo
+            get_equity = preflop_lookup(partial(_cpp_equity, rng=self.equity_rng))
         else:
             from tools.montecarlo_python import get_equity
-        self.get_equity = get_equity
+            get_equity = partial(get_equity, target_stderr=MONTECARLO_TARGET_STDERR, rng=self.equity_rng)
+        self.equity_cache = EquityCache(get_equity)  # hit and miss counters are on the cache
+        self.get_equity = self.equity_cache
+        self.equity_memo = {}  # equities of the current hand by (cards, table cards, players alive)
         self.use_cpp_montecarlo = use_cpp_montecarlo
         self.num_of_players = 0
         self.small_blind = small_blind
         self.big_blind = big_blind
-        self.render_switch = render
+        self.headless = headless
+        self.render_switch = render and not headless
         self.players = []
         self.table_cards = None
         self.dealer_pos = None
@@ -109,15 +146,15 @@ class HoldemTable(Env):
         self.callers = []
         self.played_in_round = None
         self.min_call = None
-        self.community_data = None
-        self.player_data = None
+        self.observation_data = None  # preallocated observation, see gym_env.observation for the layout
         self.stage_data = None
         self.deck = None
         self.action = None
         self.winner_ix = None
+        self.winner_ixs = None
         self.initial_stacks = initial_stacks
         self.acting_agent = None
-        self.funds_plot = funds_plot
+        self.funds_plot = funds_plot and not headless
         self.max_raises_per_player_round = max_raises_per_player_round
         self.calculate_equity = calculate_equity
 
@@ -132,6 +169,7 @@ class HoldemTable(Env):
         self.done = False
         self.funds_history = None
         self.array_everything = None
+        self.observation_space = None
         self.legal_moves = None
         self.illegal_move_reward = -1
         self.action_space = Discrete(len(Action) - 2)
@@ -145,12 +183,13 @@ class HoldemTable(Env):
         self.reward = None
         self.info = None
         self.done = False
-        self.funds_history = pd.DataFrame()
+        self.funds_history = FundsHistory(len(self.players))
         self.first_action_for_hand = [True] * len(self.players)
 
         if not self.players:
             log.warning("No agents added. Add agents before resetting the environment.")
             return
+        self.observation_data = ObservationData(len(self.players))
 
         for player in self.players:
             player.stack = self.initial_stacks
@@ -206,9 +245,99 @@ class HoldemTable(Env):
                     self.first_action_for_hand[self.acting_agent] = False
                     self._calculate_reward(action)
 
-            log.debug(f"Previous action reward for seat {self.acting_agent}: {self.reward}")
+            log.debug("Previous action reward for seat %s: %s", self.acting_agent, self.reward)
         return self.array_everything, self.reward, self.done, self.info
 
+    def seed(self, seed=None, table_id=0):
+        """
+        Reseed the random generators of the table from a root seed and the table id.
+
+        The same seed and table id deal the same cards and equities again, different table ids give independent
+        streams. Without a seed the generators start from fresh entropy.
+        """
+        deal_seed, equity_seed = np.random.SeedSequence(seed, spawn_key=(table_id,)).spawn(2)
+        self.rng.bit_generator.state = np.random.PCG64(deal_seed).state
+        self.equity_rng.bit_generator.state = np.random.PCG64(equity_seed).state
+        return [seed]
+
+    def get_state(self):
+        """
+        Snapshot of the game as a flat dict of numbers, tuples and small arrays, restore it with set_state.
+
+        It holds everything the rules, the rewards and the observation depend on: stage, cards and deck, pots,
+        stacks, the player cycle and the funds history. The action logs of the players (actions, temp_stack)
+        are not part of it, and cards dealt after set_state are drawn from the table's generator as it is then.
+        """
+        hole_cards = np.full((len(self.players), 2), -1, dtype=np.int8)
+        for ix, player in enumerate(self.players):
+            hole_cards[ix, :len(player.cards)] = [CARD_INDEX[card] for card in player.cards]
+        return {'stage': self.stage.value,
+                'dealer_pos': self.dealer_pos,
+                'current_player': self.current_player.seat if self.current_player else -1,
+                'acting_agent': self.acting_agent,
+                'hole_cards': hole_cards,
+                'table_cards': tuple(CARD_INDEX[card] for card in self.table_cards),
+                'deck': tuple(self.deck),
+                'stacks': tuple(player.stack for player in self.players),
+                'num_raises_in_street': tuple(tuple(player.num_raises_in_street.values()) for player in self.players),
+                'last_action_in_stage': tuple(player.last_action_in_stage for player in self.players),
+                'community_pot': self.community_pot,
+                'current_round_pot': self.current_round_pot,
+                'player_pots': tuple(self.player_pots),
+                'player_max_win': tuple(self.player_max_win),
+                'last_player_pot': self.last_player_pot,
+                'min_call': self.min_call,
+                'played_in_round': self.played_in_round,
+                'round_number_in_street': self.round_number_in_street,
+                'last_caller': self.last_caller,
+                'last_raiser': self.last_raiser,
+                'raisers': tuple(self.raisers),
+                'callers': tuple(self.callers),
+                'first_action_for_hand': tuple(self.first_action_for_hand),
+                'stage_data': np.array([[getattr(stage, field) for field in STAGE_FIELDS]
+                                        for stage in self.stage_data], dtype=float),
+                'player_cycle': self.player_cycle.get_state(),
+                'funds_history': self.funds_history.stacks.copy(),
+                'winner_ix': self.winner_ix,
+                'done': self.done}
+
+    def set_state(self, state):
+        """Restore a snapshot of get_state of this table, observation, legal moves and info follow the state"""
+        self.stage = Stage(state['stage'])
+        self.dealer_pos = state['dealer_pos']
+        self.acting_agent = state['acting_agent']
+        self.table_cards = [CARD_STRINGS[card] for card in state['table_cards']]
+        self.deck = list(state['deck'])
+        for player, cards, stack, num_raises, last_action in zip(self.players, state['hole_cards'], state['stacks'],
+                                                                  state['num_raises_in_street'],
+                                                                  state['last_action_in_stage']):
+            player.cards = [CARD_STRINGS[card] for card in cards if card >= 0]
+            player.stack = stack
+            player.num_raises_in_street = dict(zip(player.num_raises_in_street, num_raises))
+            player.last_action_in_stage = last_action
+        self.community_pot = state['community_pot']
+        self.current_round_pot = state['current_round_pot']
+        self.player_pots = list(state['player_pots'])
+        self.player_max_win = list(state['player_max_win'])
+        self.last_player_pot = state['last_player_pot']
+        self.min_call = state['min_call']
+        self.played_in_round = state['played_in_round']
+        self.round_number_in_street = state['round_number_in_street']
+        self.last_caller = state['last_caller']
+        self.last_raiser = state['last_raiser']
+        self.raisers = list(state['raisers'])
+        self.callers = list(state['callers'])
+        self.first_action_for_hand = list(state['first_action_for_hand'])
+        for stage, values in zip(self.stage_data, state['stage_data']):
+            for field, value in zip(STAGE_FIELDS, values.tolist()):
+                setattr(stage, field, value)
+        self.player_cycle.set_state(state['player_cycle'])
+        self.funds_history = FundsHistory.from_stacks(state['funds_history'])
+        self.winner_ix = state['winner_ix']
+        self.done = state['done']
+        self.current_player = self.players[state['current_player']] if state['current_player'] >= 0 else None
+        self._get_environment()
+
     def _execute_step(self, action):
         self._process_decision(action)
 
@@ -240,59 +369,44 @@ class HoldemTable(Env):
         self.reward = 0
         self.info = None
 
-        self.community_data = CommunityData(len(self.players))
-        self.community_data.community_pot = self.community_pot / (self.big_blind * 100)
-        self.community_data.current_round_pot = self.current_round_pot / (self.big_blind * 100)
-        self.community_data.small_blind = self.small_blind
-        self.community_data.big_blind = self.big_blind
-        self.community_data.stage[np.minimum(self.stage.value, 3)] = 1  # pylint: disable= invalid-sequence-index
-        self.community_data.legal_moves = [action in self.legal_moves for action in Action]
-        # self.cummunity_data.active_players
-
-        self.player_data = PlayerData()
-        self.player_data.stack = [player.stack / (self.big_blind * 100) for player in self.players]
+        data = self.observation_data
+        data['community_pot'] = self.community_pot / (self.big_blind * 100)
+        data['current_round_pot'] = self.current_round_pot / (self.big_blind * 100)
+        data['small_blind'] = self.small_blind
+        data['big_blind'] = self.big_blind
+        data['stage'] = 0
+        data['stage'][min(self.stage.value, 3)] = 1
+        data['legal_moves'] = [action in self.legal_moves for action in Action]
+        data['stack'] = [player.stack / (self.big_blind * 100) for player in self.players]
+        data.stage_data[:] = [[getattr(stage, field) for field in STAGE_FIELDS] for stage in self.stage_data]
 
         if not self.current_player:  # game over
             self.current_player = self.players[self.winner_ix]
 
-        self.player_data.position = self.current_player.seat
-        if self.calculate_equity:
-            self.current_player.equity_alive = self.get_equity(set(self.current_player.cards), set(self.table_cards),
-                                                               sum(self.player_cycle.alive), MONTEACRLO_RUNS)
-            self.player_data.equity_to_river_2plr = self.get_equity(set(self.current_player.cards),
-                                                                    set(self.table_cards),
-                                                                    sum(self.player_cycle.alive), MONTEACRLO_RUNS)
-            self.player_data.equity_to_river_3plr = self.get_equity(set(self.current_player.cards),
-                                                                    set(self.table_cards),
-                                                                    sum(self.player_cycle.alive), MONTEACRLO_RUNS)
-        else:
-            self.current_player.equity_alive = np.nan
-            self.player_data.equity_to_river_2plr = np.nan
-            self.player_data.equity_to_river_3plr = np.nan
-        self.current_player.equity_alive = self.get_equity(set(self.current_player.cards), set(self.table_cards),
-                                                           sum(self.player_cycle.alive), 1000)
-        self.player_data.equity_to_river_alive = self.current_player.equity_alive
-
-        arr1 = np.array(list(flatten(self.player_data.__dict__.values())))
-        arr2 = np.array(list(flatten(self.community_data.__dict__.values())))
-        arr3 = np.array([list(flatten(sd.__dict__.values())) for sd in self.stage_data]).flatten()
-        # arr_legal_only = np.array(self.community_data.legal_moves).flatten()
-
-        self.array_everything = np.concatenate([arr1, arr2, arr3]).flatten()
+        data['position'] = self.current_player.seat
+        get_current_equity = partial(self._get_player_equity, self.current_player, tuple(self.current_player.cards),
+                                     tuple(self.table_cards), self.player_cycle.alive_count)
+        # the equity fields share one calculation, without calculate_equity it happens when an agent reads it
+        equity = get_current_equity() if self.calculate_equity else np.nan
+        for field in EQUITY_FIELDS:
+            data[field] = equity
 
+        # agents keep observations, so they get a copy that the next step does not overwrite
+        self.array_everything = data.array.copy()
         self.observation = self.array_everything
-        self._get_legal_moves()
-
-        self.info = {'player_data': self.player_data.__dict__,
-                     'community_data': self.community_data.__dict__,
-                     'stage_data': [stage.__dict__ for stage in self.stage_data],
-                     'legal_moves': self.legal_moves}
-
-        self.observation_space = self.array_everything.shape
+        self.info = ObservationInfo(data, self.observation, self.legal_moves, get_current_equity)
 
         if self.render_switch:
             self.render()
 
+    def _get_player_equity(self, player, cards, table_cards, players_alive):
+        """Equity of a player's cards, calculated at most once per state of the hand"""
+        key = (cards, table_cards, players_alive)
+        if key not in self.equity_memo:
+            self.equity_memo[key] = self.get_equity(set(cards), set(table_cards), players_alive, MONTEACRLO_RUNS)
+        player.equity_alive = self.equity_memo[key]
+        return player.equity_alive
+
     def _calculate_reward(self, last_action):
         """
         Preliminiary implementation of reward function
@@ -309,11 +423,10 @@ class HoldemTable(Env):
         if self.done:
             won = 1 if not self._agent_is_autoplay(idx=self.winner_ix) else -1
             self.reward = self.initial_stacks * len(self.players) * won
-            log.debug(f"Keras-rl agent has reward {self.reward}")
+            log.debug("Keras-rl agent has reward %s", self.reward)
 
         elif len(self.funds_history) > 1:
-            self.reward = self.funds_history.iloc[-1, self.acting_agent] - self.funds_history.iloc[
-                -2, self.acting_agent]
+            self.reward = self.funds_history[-1][self.acting_agent] - self.funds_history[-2][self.acting_agent]
 
         else:
             pass
@@ -405,10 +518,10 @@ class HoldemTable(Env):
 
         self.player_cycle.update_alive()
 
-        log.info(
-            f"Seat {self.current_player.seat} ({self.current_player.name}): {action} - Remaining stack: {self.current_player.stack}, "
-            f"Round pot: {self.current_round_pot}, Community pot: {self.community_pot}, "
-            f"player pot: {self.player_pots[self.current_player.seat]}")
+        if not self.headless:
+            log.info("Seat %s (%s): %s - Remaining stack: %s, Round pot: %s, Community pot: %s, player pot: %s",
+                     self.current_player.seat, self.current_player.name, action, self.current_player.stack,
+                     self.current_round_pot, self.community_pot, self.player_pots[self.current_player.seat])
 
     def _start_new_hand(self):
         """Deal new cards to players and reset table states."""
@@ -417,16 +530,18 @@ class HoldemTable(Env):
         if self._check_game_over():
             return
 
-        log.info("")
-        log.info("++++++++++++++++++")
-        log.info("Starting new hand.")
-        log.info("++++++++++++++++++")
+        if not self.headless:
+            log.info("")
+            log.info("++++++++++++++++++")
+            log.info("Starting new hand.")
+            log.info("++++++++++++++++++")
         self.table_cards = []
+        self.equity_memo = {}
         self._create_card_deck()
         self.stage = Stage.PREFLOP
 
         # preflop round1,2, flop>: round 1,2, turn etc...
-        self.stage_data = [StageData(len(self.players)) for _ in range(8)]
+        self.stage_data = [StageData(len(self.players)) for _ in range(STAGE_ROUNDS)]
 
         # pots
         self.community_pot = 0
@@ -447,8 +562,7 @@ class HoldemTable(Env):
 
     def _save_funds_history(self):
         """Keep track of player funds history"""
-        funds_dict = {i: player.stack for i, player in enumerate(self.players)}
-        self.funds_history = pd.concat([self.funds_history, pd.DataFrame(funds_dict, index=[0])])
+        self.funds_history.append([player.stack for player in self.players])
 
     def _check_game_over(self):
         """Check if only one player has money left"""
@@ -470,20 +584,25 @@ class HoldemTable(Env):
 
     def _game_over(self):
         """End of an episode."""
-        log.info("Game over.")
         self.done = True
+        winner_in_episodes.append(self.winner_ix)
+        if self.headless:
+            return
+
+        import pandas as pd
+        log.info("Game over.")
         player_names = [f"{i} - {player.name}" for i, player in enumerate(self.players)]
-        self.funds_history.columns = player_names
+        funds_history = self.funds_history.to_frame(player_names)
+        log.info(funds_history)
         if self.funds_plot:
-            self.funds_history.reset_index(drop=True).plot()
-        log.info(self.funds_history)
-        plt.show()
+            import matplotlib.pyplot as plt
+            funds_history.plot()
+            plt.show()
 
-        winner_in_episodes.append(self.winner_ix)
         league_table = pd.Series(winner_in_episodes).value_counts()
         best_player = league_table.index[0]
         log.info(league_table)
-        log.info(f"Best Player: {best_player}")
+        log.info("Best Player: %s", best_player)
 
     def _initiate_round(self):
         """A new round (flop, turn, river) is initiated"""
@@ -501,8 +620,9 @@ class HoldemTable(Env):
             self.player_cycle.idx += 1
 
         if self.stage == Stage.PREFLOP:
-            log.info("")
-            log.info("===Round: Stage: PREFLOP")
+            if not self.headless:
+                log.info("")
+                log.info("===Round: Stage: PREFLOP")
             # max steps total will be adjusted again at bb
             self.player_cycle.max_steps_total = len(self.players) * self.max_raises_per_player_round + 2
 
@@ -518,7 +638,8 @@ class HoldemTable(Env):
             self._next_player()
 
         elif self.stage == Stage.SHOWDOWN:
-            log.info("Showdown")
+            if not self.headless:
+                log.info("Showdown")
 
         else:
             raise RuntimeError()
@@ -533,6 +654,7 @@ class HoldemTable(Env):
         self.players.append(player)
         self.player_status = [True] * len(self.players)
         self.player_pots = [0] * len(self.players)
+        self.observation_space = observation_shape(len(self.players))
 
     def _end_round(self):
         """End of preflop, flop, turn or river"""
@@ -552,8 +674,9 @@ class HoldemTable(Env):
         elif self.stage == Stage.RIVER:
             self.stage = Stage.SHOWDOWN
 
-        log.info("--------------------------------")
-        log.info(f"===ROUND: {self.stage} ===")
+        if not self.headless:
+            log.info("--------------------------------")
+            log.info("===ROUND: %s ===", self.stage)
         self._clean_up_pots()
 
     def _clean_up_pots(self):
@@ -563,40 +686,62 @@ class HoldemTable(Env):
 
     def _end_hand(self):
         self._clean_up_pots()
-        self.winner_ix = self._get_winner()
-        self._award_winner(self.winner_ix)
+        self.winner_ixs, hand_strengths = self._get_winners()
+        self.winner_ix = self.winner_ixs[0]
+        self._award_winners(hand_strengths)
 
-    def _get_winner(self):
-        """Determine which player has won the hand"""
-        potential_winners = self.player_cycle.get_potential_winners()
+    def _get_winners(self):
+        """
+        Determine which players have won the hand
 
-        potential_winner_idx = [i for i, potential_winner in enumerate(potential_winners) if potential_winner]
-        if sum(potential_winners) == 1:
-            winner_ix = [i for i, active in enumerate(potential_winners) if active][0]
+        Returns:
+            winner indices (list): all players sharing the best hand
+            hand strengths (np.ndarray): strength per seat, -1 for players that are out of the hand
+
+        """
+        potential_winner_idx = self.player_cycle.get_potential_winners()
+        hand_strengths = np.full(len(self.players), -1, dtype=np.int64)
+        if len(potential_winner_idx) == 1:
+            hand_strengths[potential_winner_idx[0]] = 0
             winning_card_type = 'Only remaining player in round'
 
         else:
             assert self.stage == Stage.SHOWDOWN
-            remaining_player_winner_ix, winning_card_type = get_winner([player.cards
-                                                                        for ix, player in enumerate(self.players) if
-                                                                        potential_winners[ix]],
-                                                                       self.table_cards)
-            winner_ix = potential_winner_idx[remaining_player_winner_ix]
-        log.info(f"Player {winner_ix} won: {winning_card_type}")
-        return winner_ix
-
-    def _award_winner(self, winner_ix):
-        """Hand the pot to the winner and handle side pots"""
-        max_win_per_player_for_winner = self.player_max_win[winner_ix]
-        total_winnings = sum(np.minimum(max_win_per_player_for_winner, self.player_max_win))
-        remains = np.maximum(0, np.array(self.player_max_win) - max_win_per_player_for_winner)  # to be returned
-
-        self.players[winner_ix].stack += total_winnings
-        self.winner_ix = winner_ix
-        if total_winnings < sum(self.player_max_win):
-            log.info("Returning side pots")
-            for i, player in enumerate(self.players):
-                player.stack += remains[i]
+            hand_strengths[potential_winner_idx] = get_hand_strengths([self.players[ix].cards
+                                                                       for ix in potential_winner_idx],
+                                                                      self.table_cards)
+            winning_card_type = get_hand_type(int(hand_strengths.max()))
+        winner_ixs = np.flatnonzero(hand_strengths == hand_strengths.max()).tolist()
+        if not self.headless:
+            log.info("Player(s) %s won: %s", winner_ixs, winning_card_type)
+        return winner_ixs, hand_strengths
+
+    def _award_winners(self, hand_strengths):
+        """
+        Hand the pot to the winners and handle side pots
+
+        The pot is split in layers at each player's total contribution. Each layer is shared equally among
+        the best hands of the players that contributed to it in full; a layer nobody in the hand can claim
+        is returned to the players who paid into it.
+        """
+        contributions = np.array(self.player_max_win, dtype=float)
+        previous_level = 0
+        for level in np.unique(contributions[contributions > 0]):
+            layer = np.minimum(contributions, level) - np.minimum(contributions, previous_level)
+            previous_level = level
+            eligible = (hand_strengths >= 0) & (contributions >= level)
+            if not eligible.any():
+                if not self.headless:
+                    log.info("Returning side pots")
+                for i, player in enumerate(self.players):
+                    player.stack += layer[i]
+                continue
+
+            best_strength = hand_strengths[eligible].max()
+            layer_winners = np.flatnonzero(eligible & (hand_strengths == best_strength))
+            share = layer.sum() / len(layer_winners)
+            for ix in layer_winners:
+                self.players[ix].stack += share
 
     def _next_dealer(self):
         self.dealer_pos = self.player_cycle.next_dealer().seat
@@ -605,18 +750,21 @@ class HoldemTable(Env):
         """Move to the next player"""
         self.current_player = self.player_cycle.next_player()
         if not self.current_player:
-            if sum(self.player_cycle.alive) < 2:
-                log.info("Only one player remaining in round")
+            if self.player_cycle.alive_count < 2:
+                if not self.headless:
+                    log.info("Only one player remaining in round")
                 self.stage = Stage.END_HIDDEN
             else:
-                log.info("End round - no current player returned")
+                if not self.headless:
+                    log.info("End round - no current player returned")
                 self._end_round()
                 # todo: in some cases no new round should be initialized bc only one player is playing only it seems
                 self._initiate_round()
 
         elif self.current_player == 'max_steps_total' or self.current_player == 'max_steps_after_raiser':
             log.debug(self.current_player)
-            log.info("End of round ")
+            if not self.headless:
+                log.info("End of round ")
             self._end_round()
             return
 
@@ -645,7 +793,7 @@ class HoldemTable(Env):
             if self.current_player.stack > 0:
                 self.legal_moves.append(Action.ALL_IN)
 
-        log.debug(f"Community+current round pot pot: {self.community_pot + self.current_round_pot}")
+        log.debug("Community+current round pot pot: %s", self.community_pot + self.current_round_pot)
 
     def _close_round(self):
         """put player_pots into community pots"""
@@ -654,32 +802,33 @@ class HoldemTable(Env):
         self.played_in_round = 0
 
     def _create_card_deck(self):
-        values = "23456789TJQKA"
-        suites = "CDHS"
-        self.deck = []  # contains cards in the deck
-        _ = [self.deck.append(x + y) for x in values for y in suites]
+        self.deck = new_deck()  # integer cards, converted to strings when dealt
 
     def _distribute_cards(self):
-        log.info(f"Dealer is at position {self.dealer_pos}")
+        if not self.headless:
+            log.info("Dealer is at position %s", self.dealer_pos)
         for player in self.players:
             player.cards = []
             if player.stack <= 0:
                 continue
             for _ in range(2):
-                card = np.random.randint(0, len(self.deck))
-                player.cards.append(self.deck.pop(card))
-            log.info(f"Player {player.seat} got {player.cards} and ${player.stack}")
+                card = self.rng.integers(len(self.deck))
+                player.cards.append(CARD_STRINGS[self.deck.pop(card)])
+            if not self.headless:
+                log.info("Player %s got %s and $%s", player.seat, player.cards, player.stack)
 
     def _distribute_cards_to_table(self, amount_of_cards):
         for _ in range(amount_of_cards):
-            card = np.random.randint(0, len(self.deck))
-            self.table_cards.append(self.deck.pop(card))
-        log.info(f"Cards on table: {self.table_cards}")
+            card = self.rng.integers(len(self.deck))
+            self.table_cards.append(CARD_STRINGS[self.deck.pop(card)])
+        if not self.headless:
+            log.info("Cards on table: %s", self.table_cards)
 
     def render(self, mode='human'):
         """Render the current state"""
         if mode != "human":
             return
+        from gym_env.rendering import PygletWindow, WHITE, RED, GREEN, BLUE
         screen_width = 600
         screen_height = 400
         table_radius = 200
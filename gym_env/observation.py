@@ -0,0 +1,141 @@
+"""
+Fixed layout of the observation vector.
+
+The observation is one float32 vector, n is the number of players and amounts are in units of 100 big blinds:
+
+player_data
+    position                    1   seat of the player to act
+    equity_to_river_alive       1   equity against the players alive, NaN unless the table calculates equity
+    equity_to_river_2plr        1   same as equity_to_river_alive
+    equity_to_river_3plr        1   same as equity_to_river_alive
+    stack                       n   stack of every seat
+community_data
+    current_player_position     n   one hot, ix 0 = dealer (not filled yet, always 0)
+    stage                       4   one hot: preflop, flop, turn, river
+    community_pot               1
+    current_round_pot           1
+    active_players              n   ix 0 = dealer (not filled yet, always 0)
+    big_blind                   1   in chips
+    small_blind                 1   in chips
+    legal_moves                 10  1 for every Action that is allowed
+stage_data                      8 x 6 x n
+    preflop, flop, turn and river with 2 rounds each, for every round the STAGE_FIELDS per seat
+
+The table writes the fields into one preallocated buffer in place. The info of a step is built from a copy of
+the observation, only when an agent reads it.
+"""
+from collections.abc import Mapping
+
+import numpy as np
+
+from gym_env.enums import Action
+
+STAGE_ROUNDS = 8
+STAGE_FIELDS = ('calls', 'raises', 'min_call_at_action', 'contribution', 'stack_at_action', 'community_pot_at_action')
+EQUITY_FIELDS = ('equity_to_river_alive', 'equity_to_river_2plr', 'equity_to_river_3plr')
+
+
+def observation_layout(num_players):
+    """(group, field, size) of every field of the observation in order"""
+    return [('player_data', 'position', 1),
+            *[('player_data', field, 1) for field in EQUITY_FIELDS],
+            ('player_data', 'stack', num_players),
+            ('community_data', 'current_player_position', num_players),
+            ('community_data', 'stage', 4),
+            ('community_data', 'community_pot', 1),
+            ('community_data', 'current_round_pot', 1),
+            ('community_data', 'active_players', num_players),
+            ('community_data', 'big_blind', 1),
+            ('community_data', 'small_blind', 1),
+            ('community_data', 'legal_moves', len(Action)),
+            ('stage_data', 'stage_data', STAGE_ROUNDS * len(STAGE_FIELDS) * num_players)]
+
+
+def observation_shape(num_players):
+    """Shape of the observation vector"""
+    return (sum(size for _, _, size in observation_layout(num_players)),)
+
+
+class ObservationData:
+    """Preallocated observation vector, fields are read and written by name"""
+
+    def __init__(self, num_players):
+        """Allocate the vector for a table with num_players seats"""
+        self.num_players = num_players
+        self.fields = {}
+        self.groups = {}
+        offset = 0
+        for group, field, size in observation_layout(num_players):
+            self.fields[field] = slice(offset, offset + size)
+            self.groups.setdefault(group, []).append(field)
+            offset += size
+        self.array = np.zeros(offset, dtype=np.float32)
+        self.stage_data = self.array[self.fields['stage_data']].reshape(STAGE_ROUNDS, len(STAGE_FIELDS), num_players)
+
+    def __getitem__(self, field):
+        """View of a field"""
+        return self.array[self.fields[field]]
+
+    def __setitem__(self, field, value):
+        self.array[self.fields[field]] = value
+
+    def group_dict(self, group, observation):
+        """Fields of a group in an observation as dict, fields of size 1 as float and the others as list"""
+        if group == 'stage_data':
+            stage_data = observation[self.fields['stage_data']].reshape(self.stage_data.shape)
+            return [dict(zip(STAGE_FIELDS, stage.tolist())) for stage in stage_data]
+        values = {}
+        for field in self.groups[group]:
+            value = observation[self.fields[field]].tolist()
+            values[field] = value[0] if len(value) == 1 else value
+        return values
+
+
+class LazyEquityData(dict):
+    """Player data handed to agents in info, equities that are not in the data are calculated on first access"""
+
+    def __init__(self, data, get_equity):
+        """get_equity() returns the equity of the player in the observed state"""
+        super().__init__(data)
+        self._get_equity = get_equity
+
+    def __missing__(self, key):
+        if key not in EQUITY_FIELDS:
+            raise KeyError(key)
+        self[key] = self._get_equity()
+        return self[key]
+
+
+class ObservationInfo(Mapping):
+    """
+    The info of a step: player_data, community_data, stage_data and legal_moves.
+
+    The dicts are built from the observation on first access. The equities in player_data are read from the
+    table's calculation (in full precision), which only runs if they were not already calculated for the observation.
+    """
+
+    KEYS = ('player_data', 'community_data', 'stage_data', 'legal_moves')
+
+    def __init__(self, observation_data, observation, legal_moves, get_equity):
+        """observation is a copy of observation_data.array that does not change anymore"""
+        self._observation_data = observation_data
+        self._observation = observation
+        self._get_equity = get_equity
+        self._values = {'legal_moves': legal_moves}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self.KEYS:
+                raise KeyError(key)
+            values = self._observation_data.group_dict(key, self._observation)
+            if key == 'player_data':
+                values = LazyEquityData({field: value for field, value in values.items()
+                                         if field not in EQUITY_FIELDS}, self._get_equity)
+            self._values[key] = values
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
@@ -0,0 +1,196 @@
+"""
+Tables hosted in worker processes, with their results in shared memory.
+
+Equity-enabled tables spend their time in python, so one process only uses one core. SubprocHoldemTable spreads
+the tables over worker processes. Only the actions travel through the pipes: the workers write observations,
+rewards, dones and legal move masks straight into one shared memory block that the parent reads as numpy arrays.
+"""
+import logging
+import multiprocessing
+import random
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from gym.spaces import Discrete
+
+from gym_env.enums import Action
+from gym_env.observation import observation_shape
+from gym_env.vec_env import reset_table, step_table
+
+log = logging.getLogger(__name__)
+
+
+class SharedArrays:
+    """The result arrays of all tables as views into one shared memory buffer"""
+
+    def __init__(self, buffer, num_envs, observation_shape):
+        """Lay the arrays out in the buffer, the same layout in every process"""
+        observation_shape = (num_envs,) + tuple(observation_shape)
+        layout = [('observations', observation_shape, np.float32),
+                  ('terminal_observations', observation_shape, np.float32),
+                  ('rewards', (num_envs,), np.float64),
+                  ('dones', (num_envs,), np.bool_),
+                  ('legal_moves', (num_envs, len(Action)), np.bool_)]
+        offset = 0
+        for name, shape, dtype in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset) if buffer is not None else None
+            setattr(self, name, array)
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+            offset += -offset % 8  # keep every array aligned
+        self.size = offset
+
+    def release(self):
+        """Drop the views, the shared memory can only be closed without them"""
+        for name in ('observations', 'terminal_observations', 'rewards', 'dones', 'legal_moves'):
+            setattr(self, name, None)
+
+
+def seed_process(seed_sequence):
+    """Seed the global generators of random and numpy that the agents and the tables draw from"""
+    random.seed(int(seed_sequence.generate_state(1)[0]))
+    np.random.seed(seed_sequence.generate_state(4))
+
+
+def _worker(connection, shared_memory_name, num_envs, shape, env_fns, seed, seed_sequence):
+    """Host the tables env_fns (dict of table index to callable) until told to close"""
+    shared_memory = SharedMemory(name=shared_memory_name)
+    arrays = SharedArrays(shared_memory.buf, num_envs, shape)
+    seed_process(seed_sequence)  # forked workers would otherwise share the random state of the agents
+    envs = {ix: env_fn() for ix, env_fn in env_fns.items()}
+    if seed is not None:
+        for ix, env in envs.items():
+            env.seed(seed, table_id=ix)
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == 'close':
+                break
+            try:
+                if command == 'step':
+                    for ix, action in data:
+                        step_table(envs[ix], ix, action, arrays)
+                elif command == 'reset':
+                    for ix, env in envs.items():
+                        reset_table(env, ix, arrays)
+                connection.send(None)
+            except Exception as error:  # pylint: disable=broad-except
+                connection.send(error)  # raised in the parent
+    except KeyboardInterrupt:
+        log.info("Worker interrupted")
+    finally:
+        arrays.release()
+        shared_memory.close()
+
+
+class SubprocHoldemTable:
+    """
+    N HoldemTables in worker processes, with the interface of VecHoldemTable.
+
+    The tables are spread round robin over the workers. infos are not returned, they stay in the workers.
+    Call close() (or use it as context manager) to stop the workers and free the shared memory.
+    """
+
+    def __init__(self, env_fns, num_players, workers=None, context=None, seed=None):
+        """
+        Args:
+            env_fns (list): callables that each return a HoldemTable with its players added, need to be
+                picklable unless the context forks
+            num_players (int): number of players at every table
+            workers (int): number of worker processes, defaults to one per table up to the number of cores
+            context (str): multiprocessing start method, e.g. 'fork' or 'spawn', the platform default if None
+            seed (int): root seed, table ix is seeded with (seed, ix) like in VecHoldemTable and every worker
+                seeds random and np.random for its agents with its own child of the seed
+
+        """
+        self.num_envs = len(env_fns)
+        self.observation_space = observation_shape(num_players)
+        self.action_space = Discrete(len(Action) - 2)
+        workers = workers or min(self.num_envs, multiprocessing.cpu_count())
+        seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+
+        self.shared_memory = SharedMemory(create=True,
+                                          size=SharedArrays(None, self.num_envs, self.observation_space).size)
+        self.arrays = SharedArrays(self.shared_memory.buf, self.num_envs, self.observation_space)
+        self.table_workers = [ix % workers for ix in range(self.num_envs)]
+
+        mp_context = multiprocessing.get_context(context)
+        self.connections = []
+        self.processes = []
+        for worker in range(workers):
+            parent_connection, worker_connection = mp_context.Pipe()
+            worker_env_fns = {ix: env_fn for ix, env_fn in enumerate(env_fns) if self.table_workers[ix] == worker}
+            process = mp_context.Process(target=_worker, daemon=True,
+                                         args=(worker_connection, self.shared_memory.name, self.num_envs,
+                                               self.observation_space, worker_env_fns, seed, seed_sequences[worker]))
+            process.start()
+            worker_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+        self._waiting = []
+        self.closed = False
+
+    def reset(self):
+        """Reset all tables, returns the observations and the legal move masks"""
+        for connection in self.connections:
+            connection.send(('reset', None))
+        self._wait(self.connections)
+        self.arrays.rewards[:] = 0
+        self.arrays.dones[:] = False
+        return self.arrays.observations.copy(), self.arrays.legal_moves.copy()
+
+    def step_async(self, actions, tables=None):
+        """Send the actions for the tables (all if not given) to the workers, they play them right away"""
+        tables = range(self.num_envs) if tables is None else tables
+        self.arrays.rewards[:] = 0
+        self.arrays.dones[:] = False
+        worker_actions = {}
+        for ix, action in zip(tables, actions):
+            worker_actions.setdefault(self.table_workers[ix], []).append((ix, int(action)))
+        for worker, table_actions in worker_actions.items():
+            self.connections[worker].send(('step', table_actions))
+        self._waiting = [self.connections[worker] for worker in worker_actions]
+
+    def step_wait(self):
+        """Wait for the workers, returns observations, rewards, dones and legal move masks like VecHoldemTable"""
+        waiting, self._waiting = self._waiting, []
+        self._wait(waiting)
+        return self.arrays.observations.copy(), self.arrays.rewards.copy(), self.arrays.dones.copy(), \
+            self.arrays.legal_moves.copy(), [None] * self.num_envs
+
+    def step(self, actions, tables=None):
+        """Play one action on each table (or on the given tables)"""
+        self.step_async(actions, tables)
+        return self.step_wait()
+
+    @property
+    def terminal_observations(self):
+        """Last observation of the tables that finished an episode in the last step"""
+        return self.arrays.terminal_observations
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self.closed:
+            return
+        waiting, self._waiting = self._waiting, []
+        self._wait(waiting)
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(('close', None))
+            process.join()
+            connection.close()
+        self.arrays.release()
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _wait(connections):
+        errors = [connection.recv() for connection in connections]
+        for error in errors:
+            if error is not None:
+                raise error
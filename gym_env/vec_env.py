@@ -0,0 +1,126 @@
+"""
+Several independent tables stepped as one batch.
+
+Each table is a regular HoldemTable with its agents added, so the rules, the player cycle and the rewards are
+exactly those of the single table. A learning agent acts through a PlayerShell on every table and gets the
+observations, rewards, dones and legal move masks of all tables as stacked arrays.
+"""
+import numpy as np
+
+from gym_env.enums import Action
+
+
+def legal_moves_mask(legal_moves):
+    """Bool array with one entry per Action, True if the action is allowed"""
+    mask = np.zeros(len(Action), dtype=bool)
+    mask[[action.value for action in legal_moves]] = True
+    return mask
+
+
+def reset_table(env, ix, arrays):
+    """Reset table ix and write its first observation and legal moves into the arrays"""
+    arrays.observations[ix] = env.reset()
+    arrays.legal_moves[ix] = legal_moves_mask(env.legal_moves)
+
+
+def step_table(env, ix, action, arrays):
+    """
+    Play an action on table ix and write the results into the arrays.
+
+    arrays has the attributes observations, terminal_observations, rewards, dones and legal_moves as in
+    VecHoldemTable. The autoplay agents that act after the shell play right away, so that the observation and
+    legal moves are those of the shell again. A finished table is reset.
+    """
+    observation, reward, done, _ = env.step(Action(int(action)))
+    if not done and env._agent_is_autoplay():  # pylint: disable=protected-access
+        observation, autoplay_reward, done, _ = env.step(None)  # plays until the shell is to act
+        if done:
+            reward = autoplay_reward  # final reward of the episode
+    arrays.rewards[ix] = reward
+    arrays.dones[ix] = done
+    if done:
+        arrays.terminal_observations[ix] = observation
+        reset_table(env, ix, arrays)
+    else:
+        arrays.observations[ix] = observation
+        arrays.legal_moves[ix] = legal_moves_mask(env.legal_moves)
+
+
+class VecHoldemTable:
+    """
+    N HoldemTables in one process.
+
+    step() steps all tables in lockstep. step_async() and step_wait() split a step, optionally for a subset of the
+    tables so that they do not need to move together. A table whose episode is done is reset automatically:
+    its done flag is set, its reward is the final reward and the returned observation is the first one of the
+    new episode. The last observation of the finished episode is kept in terminal_observations.
+    """
+
+    def __init__(self, env_fns, seed=None):
+        """
+        Args:
+            env_fns (list): callables that each return a HoldemTable with its players added
+            seed (int): root seed, table ix is seeded with (seed, ix), the tables keep their own seeds if None
+
+        """
+        self.envs = [env_fn() for env_fn in env_fns]
+        if seed is not None:
+            for ix, env in enumerate(self.envs):
+                env.seed(seed, table_id=ix)
+        self.num_envs = len(self.envs)
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+        if any(env.observation_space != self.observation_space for env in self.envs):
+            raise ValueError("All tables need the same number of players")
+
+        self.observations = np.zeros((self.num_envs,) + tuple(self.observation_space), dtype=np.float32)
+        self.terminal_observations = np.zeros_like(self.observations)
+        self.rewards = np.zeros(self.num_envs)
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+        self.legal_moves = np.zeros((self.num_envs, len(Action)), dtype=bool)
+        self.infos = [None] * self.num_envs
+        self._pending = None
+
+    def reset(self):
+        """Reset all tables, returns the observations and the legal move masks"""
+        for ix, env in enumerate(self.envs):
+            reset_table(env, ix, self)
+            self.infos[ix] = env.info
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.observations.copy(), self.legal_moves.copy()
+
+    def step_async(self, actions, tables=None):
+        """Remember the actions for the tables (all if not given), they are played in step_wait"""
+        tables = range(self.num_envs) if tables is None else tables
+        self._pending = list(zip(tables, actions))
+
+    def step_wait(self):
+        """
+        Play the pending actions.
+
+        Returns:
+            observations (np.ndarray): [tables, observation size] float32
+            rewards (np.ndarray): [tables]
+            dones (np.ndarray): [tables] bool
+            legal moves (np.ndarray): [tables, len(Action)] bool masks
+            infos (list): info of every table
+
+        Tables that did not act keep their observation and get a reward of 0 and done False.
+
+        """
+        if self._pending is None:
+            raise RuntimeError("step_async needs to be called before step_wait")
+        self.rewards[:] = 0
+        self.dones[:] = False
+        for ix, action in self._pending:
+            step_table(self.envs[ix], ix, action, self)
+            self.infos[ix] = self.envs[ix].info
+        self._pending = None
+        return self.observations.copy(), self.rewards.copy(), self.dones.copy(), self.legal_moves.copy(), \
+            list(self.infos)
+
+    def step(self, actions, tables=None):
+        """Play one action on each table (or on the given tables), see step_wait for the results"""
+        self.step_async(actions, tables)
+        return self.step_wait()
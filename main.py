@@ -9,28 +9,28 @@ Usage:
   main.py selfplay dqn_train [options]
   main.py selfplay dqn_play [options]
   main.py learn_table_scraping [options]
+  main.py preflop_table [options]
 
 options:
   -h --help                 Show this screen.
   -r --render               render screen
-  -c --use_cpp_montecarlo   use cpp implementation of equity calculator. Requires cpp compiler but is 500x faster
+  -c --use_cpp_montecarlo   use cpp implementation of equity calculator. Build it with setup.py, 500x faster
   -f --funds_plot           Plot funds at end of episode
+  --headless                fast mode, no logging of the game, no plots and no rendering
   --log                     log file
   --name=<>                 Name of the saved model
   --screenloglevel=<>       log level on screen
   --episodes=<>             number of episodes to play
   --stack=<>                starting stack for each player [default: 500].
+  --runs=<>                 montecarlo runs per preflop table entry
+  --cores=<>                processes to generate the preflop table, defaults to config.ini
 
 """
 
 import logging
 
-import gym
 import numpy as np
-import pandas as pd
-from docopt import docopt
 
-from gym_env.env import PlayerShell
 from tools.helper import get_config
 from tools.helper import init_logger
 
@@ -39,6 +39,7 @@ from tools.helper import init_logger
 
 def command_line_parser():
     """Entry function"""
+    from docopt import docopt
     args = docopt(__doc__)
     if args['--log']:
         logfile = args['--log']
@@ -59,7 +60,8 @@ def command_line_parser():
         runner = SelfPlay(render=args['--render'], num_episodes=num_episodes,
                           use_cpp_montecarlo=args['--use_cpp_montecarlo'],
                           funds_plot=args['--funds_plot'],
-                          stack=int(args['--stack']))
+                          stack=int(args['--stack']),
+                          headless=args['--headless'])
 
         if args['random']:
             runner.random_agents()
@@ -80,6 +82,12 @@ def command_line_parser():
         elif args['dqn_play']:
             runner.dqn_play_keras_rl(model_name)
 
+    elif args['preflop_table']:
+        from tools.preflop_equity import DEFAULT_RUNS, generate_preflop_table
+        runs = int(args['--runs']) if args['--runs'] else DEFAULT_RUNS
+        cores = int(args['--cores']) if args['--cores'] else None
+        filename = generate_preflop_table(runs=runs, cores=cores)
+        log.info(f"Preflop equity table saved to {filename}")
 
     else:
         raise RuntimeError("Argument not yet implemented")
@@ -88,8 +96,9 @@ def command_line_parser():
 class SelfPlay:
     """Orchestration of playing against itself"""
 
-    def __init__(self, render, num_episodes, use_cpp_montecarlo, funds_plot, stack=500):
+    def __init__(self, render, num_episodes, use_cpp_montecarlo, funds_plot, stack=500, headless=False):
         """Initialize"""
+        self.headless = headless
         self.winner_in_episodes = []
         self.use_cpp_montecarlo = use_cpp_montecarlo
         self.funds_plot = funds_plot
@@ -101,10 +110,11 @@ class SelfPlay:
 
     def random_agents(self):
         """Create an environment with 6 random players"""
+        import gym
         from agents.agent_random import Player as RandomPlayer
         env_name = 'neuron_poker-v0'
         num_of_plrs = 2
-        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
         for _ in range(num_of_plrs):
             player = RandomPlayer()
             self.env.add_player(player)
@@ -113,10 +123,11 @@ class SelfPlay:
 
     def key_press_agents(self):
         """Create an environment with 6 key press agents"""
+        import gym
         from agents.agent_keypress import Player as KeyPressAgent
         env_name = 'neuron_poker-v0'
         num_of_plrs = 2
-        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
         for _ in range(num_of_plrs):
             player = KeyPressAgent()
             self.env.add_player(player)
@@ -125,10 +136,12 @@ class SelfPlay:
 
     def equity_vs_random(self):
         """Create 6 players, 4 of them equity based, 2 of them random"""
+        import gym
+        import pandas as pd
         from agents.agent_consider_equity import Player as EquityPlayer
         from agents.agent_random import Player as RandomPlayer
         env_name = 'neuron_poker-v0'
-        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
         self.env.add_player(EquityPlayer(name='equity/50/50', min_call_equity=.5, min_bet_equity=-.5))
         self.env.add_player(EquityPlayer(name='equity/50/80', min_call_equity=.8, min_bet_equity=-.8))
         self.env.add_player(EquityPlayer(name='equity/70/70', min_call_equity=.7, min_bet_equity=-.7))
@@ -150,13 +163,15 @@ class SelfPlay:
 
     def equity_self_improvement(self, improvement_rounds):
         """Create 6 players, 4 of them equity based, 2 of them random"""
+        import gym
+        import pandas as pd
         from agents.agent_consider_equity import Player as EquityPlayer
         calling = [.1, .2, .3, .4, .5, .6]
         betting = [.2, .3, .4, .5, .6, .7]
 
         for improvement_round in range(improvement_rounds):
             env_name = 'neuron_poker-v0'
-            self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+            self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
             for i in range(6):
                 self.env.add_player(EquityPlayer(name=f'Equity/{calling[i]}/{betting[i]}',
                                                  min_call_equity=calling[i],
@@ -181,12 +196,14 @@ class SelfPlay:
 
     def dqn_train_keras_rl(self, model_name):
         """Implementation of kreras-rl deep q learing."""
+        import gym
         from agents.agent_consider_equity import Player as EquityPlayer
         from agents.agent_keras_rl_dqn import Player as DQNPlayer
         from agents.agent_random import Player as RandomPlayer
+        from gym_env.env import PlayerShell
         env_name = 'neuron_poker-v0'
         env = gym.make(env_name, initial_stacks=self.stack, funds_plot=self.funds_plot, render=self.render,
-                       use_cpp_montecarlo=self.use_cpp_montecarlo)
+                       use_cpp_montecarlo=self.use_cpp_montecarlo, headless=self.headless)
 
         np.random.seed(123)
         env.seed(123)
@@ -205,11 +222,13 @@ class SelfPlay:
 
     def dqn_play_keras_rl(self, model_name):
         """Create 6 players, one of them a trained DQN"""
+        import gym
         from agents.agent_consider_equity import Player as EquityPlayer
         from agents.agent_keras_rl_dqn import Player as DQNPlayer
         from agents.agent_random import Player as RandomPlayer
+        from gym_env.env import PlayerShell
         env_name = 'neuron_poker-v0'
-        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
         self.env.add_player(EquityPlayer(name='equity/50/50', min_call_equity=.5, min_bet_equity=.5))
         self.env.add_player(EquityPlayer(name='equity/50/80', min_call_equity=.8, min_bet_equity=.8))
         self.env.add_player(EquityPlayer(name='equity/70/70', min_call_equity=.7, min_bet_equity=.7))
@@ -224,11 +243,13 @@ class SelfPlay:
 
     def dqn_train_custom_q1(self):
         """Create 6 players, 4 of them equity based, 2 of them random"""
+        import gym
+        import pandas as pd
         from agents.agent_consider_equity import Player as EquityPlayer
         from agents.agent_custom_q1 import Player as Custom_Q1
         from agents.agent_random import Player as RandomPlayer
         env_name = 'neuron_poker-v0'
-        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render)
+        self.env = gym.make(env_name, initial_stacks=self.stack, render=self.render, headless=self.headless)
         # self.env.add_player(EquityPlayer(name='equity/50/50', min_call_equity=.5, min_bet_equity=-.5))
         # self.env.add_player(EquityPlayer(name='equity/50/80', min_call_equity=.8, min_bet_equity=-.8))
         # self.env.add_player(EquityPlayer(name='equity/70/70', min_call_equity=.7, min_bet_equity=-.7))
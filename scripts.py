@@ -46,6 +46,12 @@ def main_dqn_play():
     command_line_parser()
 
 
+def main_preflop_table():
+    """Regenerate the preflop equity table"""
+    sys.argv = ["main.py", "preflop_table"] + sys.argv[1:]
+    command_line_parser()
+
+
 def main_random_render():
     """Run random agents with rendering"""
     sys.argv = ["main.py", "selfplay", "random", "--render"]
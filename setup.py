@@ -1,20 +1,35 @@
-"""Distribution to pipy"""
+"""
+Build of the C++ extension, the build backend in pyproject.toml runs it.
 
-from setuptools import setup, find_packages
+The C++ equity calculator is built as a regular extension module, for development in place with
+``python setup.py build_ext --inplace``. NEURON_POKER_MARCH sets the -march flag (default native, empty to omit).
+"""
+import os
+import sys
 
-with open("readme.rst") as readme:
-    long_description = readme.read()
+from pybind11.setup_helpers import Pybind11Extension, build_ext
+from setuptools import setup
 
+
+def _compile_args():
+    if sys.platform == 'win32':
+        return ['/O2']
+    march = os.environ.get('NEURON_POKER_MARCH', 'native')
+    return ['-O3'] + ([f'-march={march}'] if march else [])
+
+
+montecarlo_cpp = Pybind11Extension(
+    'tools.montecarlo_cpp.pymontecarlo',
+    sources=['tools/montecarlo_cpp/pymontecarlo.cpp', 'tools/montecarlo_cpp/Montecarlo.cpp'],
+    include_dirs=['tools/montecarlo_cpp'],
+    depends=['tools/montecarlo_cpp/Montecarlo.h'],
+    cxx_std=17,
+    extra_compile_args=_compile_args(),
+    extra_link_args=[] if sys.platform == 'win32' else ['-pthread'],
+)
+
+# the metadata and the packages are in pyproject.toml, setup.py only adds the extension
 setup(
-    name='neuron_poker',
-    version='1.0.0',
-    long_description=long_description,
-    url='https://github.com/dickreuter/neuron_poker',
-    author='Nicolas Dickreuter',
-    author_email='dickreuter@gmail.com',
-    license='MIT',
-    description=('OpenAi gym for textas holdem poker with graphical rendering and montecarlo.'),
-    packages=find_packages(exclude=['tests', 'gym_env', 'tools']),
-    install_requires=['pyglet', 'pytest', 'pandas', 'pylint', 'gym', 'numpy', 'matplotlib'],
-    platforms='any',
+    ext_modules=[montecarlo_cpp],
+    cmdclass={'build_ext': build_ext},
 )
@@ -0,0 +1,39 @@
+"""Tests for the integer card representation."""
+from tools.cards import CARD_STRINGS, canonical_suits, card_to_int, cards_to_array, cards_to_ints, cards_to_mask, \
+    int_to_card, mask_to_cards, new_deck, rank_of, suit_of
+
+
+def test_string_int_roundtrip():
+    """Every card converts to an int and back"""
+    for i, card in enumerate(CARD_STRINGS):
+        assert card_to_int(card) == i
+        assert int_to_card(i) == card
+    assert card_to_int('2C') == 0
+    assert card_to_int('AS') == 51
+    assert rank_of(card_to_int('TD')) == 8
+    assert suit_of(card_to_int('TD')) == 1
+
+
+def test_masks():
+    """Hand masks contain each card once"""
+    mask = cards_to_mask(['AS', 'KH', '2C'])
+    assert bin(mask).count('1') == 3
+    assert mask_to_cards(mask) == ['2C', 'KH', 'AS']
+
+
+def test_deck_and_arrays():
+    """Known cards are removed from the deck and nested card lists convert to arrays"""
+    deck = new_deck([card_to_int('AS'), card_to_int('2C')])
+    assert len(deck) == 50
+    assert card_to_int('AS') not in deck
+    arr = cards_to_array([['AS', 'KS'], ['2C', '3C']])
+    assert arr.shape == (2, 2)
+    assert arr[0, 0] == 51
+
+
+def test_canonical_suits():
+    """Suit-isomorphic situations share one representation"""
+    first = canonical_suits(cards_to_ints(['AH', 'KH']), cards_to_ints(['2C', '7D', '9S']))
+    second = canonical_suits(cards_to_ints(['KS', 'AS']), cards_to_ints(['9D', '2H', '7C']))
+    assert first == second
+    assert first != canonical_suits(cards_to_ints(['AH', 'KD']), cards_to_ints(['2C', '7D', '9S']))
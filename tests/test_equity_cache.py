@@ -0,0 +1,26 @@
+"""Tests for the equity cache."""
+from tools.equity_cache import EquityCache
+
+
+def test_cache_hits_on_isomorphic_situations():
+    """Suit-isomorphic situations are simulated once, the least recently used entries are dropped"""
+    calls = []
+
+    def get_equity(player_cards, table_cards, players, runs):
+        calls.append((player_cards, table_cards, players, runs))
+        return 0.5
+
+    cache = EquityCache(get_equity, maxsize=2)
+    assert cache({'AH', 'KH'}, {'2C', '7D', '9S'}, 2, 1000) == 0.5
+    assert cache({'AS', 'KS'}, {'2H', '7C', '9D'}, 2, 1000) == 0.5
+    assert (cache.hits, cache.misses, len(calls)) == (1, 1, 1)
+
+    cache({'AS', 'KS'}, {'2H', '7C', '9D'}, 3, 1000)  # other player count
+    cache({'AS', 'KD'}, set(), 2, 1000)
+    assert cache.misses == 3
+    assert len(cache) == 2
+    cache({'AH', 'KH'}, {'2C', '7D', '9S'}, 2, 1000)  # evicted
+    assert cache.misses == 4
+
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
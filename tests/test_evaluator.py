@@ -1,7 +1,11 @@
 """Test Hand evaluation."""
 import logging
 
-from tools.hand_evaluator import eval_best_hand
+import numpy as np
+
+from tools.cards import cards_to_ints
+from tools.hand_evaluator import EvaluatorTables, eval_best_hand, evaluate_batch, evaluate_hand, get_hand_type, \
+    get_winners, load_tables, save_tables
 
 log = logging.getLogger(__name__)
 
@@ -131,3 +135,69 @@ def test_evaluator13():
     expected = 0
     winner, _ = eval_best_hand(cards)
     assert winner == cards[expected]
+
+
+def test_hand_types():
+    """Table based evaluator returns the expected categories"""
+    hands = {'StraightFlush': ['AS', '2S', '3S', '4S', '5S', 'KD', 'KH'],
+             'FoufOfAKind': ['9S', '9H', '9D', '9C', 'AS', 'KS', '2D'],
+             'FullHouse': ['9S', '9H', '9D', 'AC', 'AS', 'KS', 'KD'],
+             'Flush': ['2H', '7H', '9H', 'JH', 'KH', 'KD', 'KS'],
+             'Straight': ['AS', 'KH', 'QD', 'JC', 'TS', '2D', '2H'],
+             'ThreeOfAKind': ['9S', '9H', '9D', 'AC', 'KS', '2D', '4H'],
+             'TwoPair': ['9S', '9H', 'AD', 'AC', 'KS', 'KD', '4H'],
+             'Pair': ['9S', '9H', 'AD', 'JC', 'KS', '2D', '4H'],
+             'HighCard': ['9S', '7H', 'AD', 'JC', 'KS', '2D', '4H']}
+    for expected, hand in hands.items():
+        assert get_hand_type(evaluate_hand(cards_to_ints(hand))) == expected
+
+
+def test_hand_strength_ordering():
+    """Kickers are compared and identical hands tie"""
+    wheel = evaluate_hand(cards_to_ints(['AS', '2D', '3S', '4H', '5C', 'KD', 'QH']))
+    six_high = evaluate_hand(cards_to_ints(['6S', '2D', '3S', '4H', '5C', 'KD', 'QH']))
+    assert six_high > wheel
+    quads_ace_kicker = evaluate_hand(cards_to_ints(['4D', '4C', '4H', '4S', 'AD', '2D', '3C']))
+    quads_king_kicker = evaluate_hand(cards_to_ints(['4D', '4C', '4H', '4S', 'KD', 'QD', 'JC']))
+    assert quads_ace_kicker > quads_king_kicker
+    board = ['4D', '4C', '4H', '4S', 'AD']
+    assert evaluate_hand(cards_to_ints(board + ['2D', '3C'])) == evaluate_hand(cards_to_ints(board + ['5D', '6C']))
+
+
+def test_persisted_tables(tmp_path):
+    """Tables are written once, memory mapped and regenerated if the file version is outdated"""
+    filename = str(tmp_path / 'tables.bin')
+    save_tables(filename)
+    tables = EvaluatorTables(filename)
+    default_tables = load_tables()
+    assert tables.is_valid()
+    assert np.array_equal(tables.ranks, default_tables.ranks)
+    assert np.array_equal(tables.flush, default_tables.flush)
+
+    outdated = np.memmap(filename, dtype=np.uint64, mode='r+', shape=(1,), offset=8)
+    outdated[0] = 0
+    outdated.flush()
+    assert not EvaluatorTables(filename).is_valid()
+    assert load_tables(filename).is_valid()
+    load_tables()
+
+
+def test_evaluate_batch():
+    """Vectorized evaluation matches the evaluation of single hands"""
+    rng = np.random.default_rng(0)
+    hands = np.argsort(rng.random((2000, 52)), axis=1)[:, :7]
+    strengths = evaluate_batch(hands)
+    assert strengths.shape == (2000,)
+    assert strengths.tolist() == [evaluate_hand(hand) for hand in hands.tolist()]
+    assert evaluate_batch(hands.reshape(1000, 2, 7)).shape == (1000, 2)
+
+
+def test_get_winners_split_pot():
+    """All players sharing the best hand are returned"""
+    table_cards = ['AC', 'AD', 'AS', 'KS', 'KD']
+    winners, hand_type = get_winners([['2H', '8S'], ['3H', '4D'], ['QC', 'JC']], table_cards)
+    assert winners == [0, 1, 2]
+    assert hand_type == 'FullHouse'
+    winners, hand_type = get_winners([['2H', '8S'], ['AH', '4D'], ['QC', 'JC']], table_cards)
+    assert winners == [1]
+    assert hand_type == 'FoufOfAKind'
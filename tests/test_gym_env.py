@@ -1,9 +1,17 @@
 """Tests for the gym environment"""
+import logging
+import random
+import timeit
+from functools import partial
+
+import numpy as np
 import pytest
 
+from agents.agent_random import Player as RandomPlayer
 from gym_env.cycle import PlayerCycle
 from gym_env.enums import Action, Stage
-from gym_env.env import HoldemTable
+from gym_env.env import FundsHistory, HoldemTable
+from gym_env.observation import ObservationData, observation_shape
 
 
 def _create_env(n_players,
@@ -209,6 +217,21 @@ def test_cycle_mechanism1():
     assert current == 'utg1'
 
 
+def test_cycle_seat_state():
+    """Folded and all in players are counted from the seat masks"""
+    cycle = PlayerCycle(['dealer', 'sb', 'bb', 'utg'])
+    assert cycle.alive_count == 4
+    cycle.next_player()
+    cycle.mark_out_of_cash_but_contributed()  # sb is all in
+    cycle.next_player()
+    cycle.deactivate_current()
+    cycle.mark_folder()  # bb folds
+    cycle.update_alive()
+    assert cycle.alive == [True, True, False, True] and cycle.alive_count == 3
+    assert cycle.get_potential_winners() == [0, 1, 3]
+    assert cycle.next_player() == 'utg'
+
+
 class PlayerForTest:
     """Player shell"""
 
@@ -238,7 +261,7 @@ def test_call_proper_amount():
     raise_size = 2 * (env.small_blind + env.big_blind)
 
     # Blinds should have been posted
-    assert env.community_data.current_round_pot == env.big_blind + env.small_blind
+    assert env.observation_data['current_round_pot'][0] == env.big_blind + env.small_blind
 
     # Button will raise pot size (2*(sb+bb)), sb will call all in with 1 for a total contribution of sb+1,
     # bb should have to bet 2*sb+bb in order to call
@@ -375,3 +398,155 @@ def test_headsup_bb_starts_flop_sb_ends_preflop():
     env.step(Action.CALL)  # sb calls
     assert env.stage == Stage.FLOP
     assert env.current_player.seat == 0  # The bb should play first in FLOP
+
+
+def test_split_pot_with_side_pot():
+    """The main pot goes to the short stack, the tied players split the side pot"""
+    env = _create_env(3)
+    for player in env.players:
+        player.stack = 0
+    env.player_max_win = [10, 30, 30]
+    env._award_winners(np.array([5, 3, 3]))  # pylint: disable=protected-access
+    assert [player.stack for player in env.players] == [30, 20, 20]
+
+    for player in env.players:
+        player.stack = 0
+    env._award_winners(np.array([-1, 3, 3]))  # pylint: disable=protected-access
+    assert [player.stack for player in env.players] == [0, 35, 35]
+
+
+def test_equity_is_calculated_lazily():
+    """Equity is only calculated when observed or read from info, and once per state"""
+    calls = []
+
+    def get_equity(player_cards, table_cards, players, runs):
+        calls.append((frozenset(player_cards), frozenset(table_cards), players, runs))
+        return 0.5
+
+    env = _create_env(3)
+    env.get_equity = get_equity
+    env.step(Action.CALL)
+    assert not calls
+    assert np.isnan(env.observation).sum() == 3
+
+    assert env.info['player_data']['equity_to_river_alive'] == 0.5
+    assert env.info['player_data']['equity_to_river_2plr'] == 0.5
+    env._get_environment()  # pylint: disable=protected-access
+    assert env.info['player_data']['equity_to_river_alive'] == 0.5
+    assert len(calls) == 1
+
+    env.calculate_equity = True
+    env._get_environment()  # pylint: disable=protected-access
+    assert not np.isnan(env.observation).any()
+    assert len(calls) == 1
+
+
+def test_observation_layout():
+    """The observation has a fixed float32 layout and info is read from it"""
+    env = _create_env(3)
+    assert env.observation_space == observation_shape(3) == env.observation.shape
+    assert env.observation.dtype == np.float32
+    env.step(Action.CALL)
+    observation = env.observation
+    env.step(Action.CALL)
+    assert observation is not env.observation  # observations kept by agents are not overwritten
+
+    data = ObservationData(3)
+    info = env.info
+    assert env.observation[data.fields['position']][0] == env.current_player.seat == info['player_data']['position']
+    assert list(env.observation[data.fields['stage']]) == [1, 0, 0, 0]
+    assert info['stage_data'][0]['calls'] == [1, 1, 0]  # dealer and small blind called
+    assert info['legal_moves'] == env.legal_moves
+    assert set(info) == {'player_data', 'community_data', 'stage_data', 'legal_moves'}
+
+
+def test_funds_history():
+    """Stacks are appended per hand into a growing buffer and turned into a DataFrame on demand"""
+    history = FundsHistory(2, capacity=2)
+    for hand in range(5):
+        history.append([100 + hand, 100 - hand])
+    assert len(history) == 5
+    assert list(history[-1]) == [104, 96]
+    assert history.to_frame(['a', 'b'])['b'].tolist() == [100, 99, 98, 97, 96]
+
+    env = _create_env(2)
+    small_blind = env.current_player.seat
+    env.step(Action.FOLD)
+    assert len(env.funds_history) == 2
+    assert env.funds_history[-1][small_blind] == 99
+    assert env.funds_history.stacks.sum(axis=1).tolist() == [200, 200]
+
+
+def _play_random_games(headless, games=3):
+    """Seeded games of three random agents, returns the funds history of every game"""
+    random.seed(4)
+    histories = []
+    for game in range(games):
+        env = HoldemTable(initial_stacks=10, funds_plot=False, headless=headless, seed=4, table_id=game)
+        for _ in range(3):
+            env.add_player(RandomPlayer())
+        env.reset()
+        histories.append(env.funds_history.stacks)
+    return histories
+
+
+def test_headless(caplog):
+    """A headless table plays the same games without logging, within 20% of the time with logging disabled"""
+    with caplog.at_level(logging.INFO):
+        expected = _play_random_games(headless=False)
+        caplog.clear()
+        histories = _play_random_games(headless=True)
+        assert not [record for record in caplog.records if record.name == 'gym_env.env']
+    for history, expected_history in zip(histories, expected):
+        assert np.array_equal(history, expected_history)
+
+    with caplog.at_level(logging.INFO):
+        headless = min(timeit.repeat(partial(_play_random_games, True), number=1, repeat=3))
+    logging.disable(logging.CRITICAL)
+    try:
+        disabled = min(timeit.repeat(partial(_play_random_games, True), number=1, repeat=3))
+    finally:
+        logging.disable(logging.NOTSET)
+    assert headless < 1.2 * disabled
+
+
+def test_get_and_set_state():
+    """A table restored from a snapshot continues exactly like the table it was taken from"""
+    env = _create_env(3)
+    env.step(Action.CALL)
+    env.step(Action.RAISE_POT)
+    state = env.get_state()
+    observation = env.observation
+    legal_moves = env.legal_moves
+
+    env.seed(2)
+    actions = [Action.CALL, Action.CALL, Action.CHECK, Action.CHECK, Action.CHECK]
+    for action in actions:
+        env.step(action)
+    expected = (env.observation, env.get_state())
+    assert env.stage != Stage.PREFLOP
+
+    env.set_state(state)
+    assert np.array_equal(env.observation, observation, equal_nan=True)
+    assert env.legal_moves == legal_moves and env.stage == Stage.PREFLOP
+    env.seed(2)
+    for action in actions:
+        env.step(action)
+    assert np.array_equal(env.observation, expected[0], equal_nan=True)
+    for key, value in expected[1].items():
+        assert np.array_equal(env.get_state()[key], value), key
+
+
+def test_seeded_tables():
+    """Tables deal from their own generators, derived from the root seed and the table id"""
+    def hole_cards(table_id):
+        env = HoldemTable(funds_plot=False, seed=7, table_id=table_id)
+        for _ in range(3):
+            env.add_player(PlayerForTest())
+        env.reset()
+        return [player.cards for player in env.players]
+
+    state = np.random.get_state()[1].copy()
+    assert hole_cards(0) == hole_cards(0)
+    assert hole_cards(0) != hole_cards(1)
+    assert np.array_equal(np.random.get_state()[1], state)  # the global generator is not used
@@ -0,0 +1,27 @@
+"""Import time regression tests, the GUI and DataFrame libraries are only imported where they are used"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HEAVY_MODULES = ('matplotlib', 'pandas', 'pyglet')
+
+
+def _imported_modules(module):
+    """Modules out of HEAVY_MODULES and gym that importing module in a fresh interpreter imports"""
+    code = f"import sys, {module}; print(' '.join(name for name in {HEAVY_MODULES + ('gym',)} if name in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent.parent)
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize("module", ['gym_env.env', 'gym_env.vec_env', 'gym_env.subproc_env'])
+def test_env_does_not_import_gui_libraries(module):
+    """Headless training does not import matplotlib, pandas or pyglet"""
+    assert not _imported_modules(module) & set(HEAVY_MODULES)
+
+
+def test_main_imports_before_dispatching():
+    """The command line imports gym and the heavy libraries only for the command that needs them"""
+    assert not _imported_modules('main')
@@ -1,206 +1,118 @@
-# """Test numpy based equity calculator"""
-#
-# import cppimport
-# import pytest
-#
-# from tools.helper import ON_CI
-#
-# calculator = cppimport.imp("tools.montecarlo_cpp.pymontecarlo")
-#
-#
-# def _runner(my_cards, cards_on_table, players, expected_result, iterations=5000):
-#     """Montecarlo test"""
-#     if len(cards_on_table) < 3:
-#         cards_on_table = {'null'}
-#     equity = calculator.montecarlo(my_cards, cards_on_table, players, iterations) * 100
-#     assert equity == pytest.approx(expected_result, abs=3)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo1():
-#     """Montecarlo test"""
-#     my_cards = {'3H', '3S'}
-#     cards_on_table = {'8S', '4S', 'QH', '8C', '4H'}
-#     expected_results = 40.2
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo2():
-#     """Montecarlo test"""
-#     my_cards = {'8H', '8D'}
-#     cards_on_table = {'QH', '7H', '9H', 'JH', 'TH'}
-#     expected_results = 95.6
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo3():
-#     """Montecarlo test"""
-#     my_cards = {'AS', 'KS'}
-#     cards_on_table = {}
-#     expected_results = 49.9 + 1.9
-#     players = 3
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo4():
-#     """Montecarlo test"""
-#     my_cards = {'AS', 'KS'}
-#     cards_on_table = {}
-#     expected_results = 66.1 + 1.6
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo5():
-#     """Montecarlo test"""
-#     my_cards = {'8S', 'TS'}
-#     cards_on_table = {'8H', 'KS', '9S', 'TH', 'KH'}
-#     expected_results = 71.5 + 5.9
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo6():
-#     """Montecarlo test"""
-#     my_cards = {'8S', 'TS'}
-#     cards_on_table = {'2S', '3S', '4S', 'KS', 'AS'}
-#     expected_results = 87
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo7():
-#     """Montecarlo test"""
-#     my_cards = {'8S', '2S'}
-#     cards_on_table = {'5S', '3S', '4S', 'KS', 'AS'}
-#     expected_results = 100
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo8():
-#     """Montecarlo test"""
-#     my_cards = {'8S', 'TS'}
-#     cards_on_table = {}
-#     expected_results = 22.6 + 2.9
-#     players = 5
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo8b():
-#     """Montecarlo test"""
-#     my_cards = {'2C', 'QS'}
-#     cards_on_table = {}
-#     expected_results = 49.6  # 45 win and 4 tie
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo9():
-#     """Montecarlo test"""
-#     my_cards = {'7H', '7S'}
-#     cards_on_table = {'7C', '8C', '8S', 'AC', 'AH'}
-#     expected_results = 83
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo10():
-#     """Montecarlo test"""
-#     my_cards = {'3S', 'QH'}
-#     cards_on_table = {'2C', '5H', '7C'}
-#     expected_results = 30.9 + 2.2
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo11():
-#     """Montecarlo test"""
-#     my_cards = {'5C', 'JS'}
-#     cards_on_table = {}
-#     expected_results = 23
-#     players = 4
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo12():
-#     """Montecarlo test"""
-#     my_cards = {'TC', 'TH'}
-#     cards_on_table = {'4D', 'QD', 'KC'}
-#     expected_results = 66.7 + 0.38
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo13():
-#     """Montecarlo test"""
-#     my_cards = {'JH', 'QS'}
-#     cards_on_table = {'5C', 'JD', 'AS', 'KS', 'QD'}
-#     expected_results = 77
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo14():
-#     """Montecarlo test"""
-#     my_cards = {'2H', '8S'}
-#     cards_on_table = {'AC', 'AD', 'AS', 'KS', 'KD'}
-#     expected_results = 95
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo15():
-#     """Montecarlo test"""
-#     my_cards = {'KD', 'KS'}
-#     cards_on_table = {'4D', '6S', '9C', '9S', 'TC'}
-#     expected_results = 88
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo16():
-#     """Montecarlo test"""
-#     my_cards = {'5H', 'KD'}
-#     cards_on_table = {'KH', 'JS', '2C', 'QS'}
-#     expected_results = 75.6 + 3.6
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo17():
-#     """Montecarlo test"""
-#     my_cards = {'JD', 'JS'}
-#     cards_on_table = {'8C', 'TC', 'JC', '5H', 'QC'}
-#     expected_results = 26.1
-#     players = 3
-#     _runner(my_cards, cards_on_table, players, expected_results)
-#
-#
-# @pytest.mark.skipif(ON_CI)
-# def test_montecarlo19():
-#     """Montecarlo test"""
-#     my_cards = {'TD', '7D'}
-#     cards_on_table = {'8D', 'QD', '7C', '5D', '6D'}
-#     expected_results = 87
-#     players = 2
-#     _runner(my_cards, cards_on_table, players, expected_results)
+"""Tests for the C++ equity calculator, skipped if the extension is not built (python setup.py build_ext --inplace)"""
+import time
+
+import numpy as np
+import pytest
+
+from tools import montecarlo_python
+from tools.cards import CARD_INDEX
+
+calculator = pytest.importorskip("tools.montecarlo_cpp.pymontecarlo")
+
+RIVER_SPOTS = [({'2H', '8S'}, {'AC', 'AD', 'AS', 'KS', 'KD'}),
+               ({'3H', '3S'}, {'8S', '4S', 'QH', '8C', '4H'}),
+               ({'TD', '7D'}, {'8D', 'QD', '7C', '5D', '6D'})]
+
+
+def _exact_equity(my_cards, cards_on_table):
+    simulator = montecarlo_python.MonteCarlo()
+    simulator.run_montecarlo([list(my_cards)], list(cards_on_table), 2, 1, maxRuns=15000,
+                             timeout=time.time() + 5, ghost_cards='')
+    return simulator.equity
+
+
+@pytest.mark.parametrize("my_cards,cards_on_table", RIVER_SPOTS)
+def test_matches_exact_enumeration(my_cards, cards_on_table):
+    """Heads-up river equity agrees with the exact enumeration of the python calculator"""
+    equity = calculator.montecarlo(my_cards, cards_on_table, 2, 100000, seed=1)
+    assert equity == pytest.approx(_exact_equity(my_cards, cards_on_table), abs=0.01)
+
+
+def test_preflop():
+    """Preflop equity agrees with the shipped preflop table"""
+    assert calculator.montecarlo({'AS', 'KS'}, set(), 2, 100000, seed=1) == pytest.approx(0.669, abs=0.01)
+    assert calculator.montecarlo({'AS', 'KS'}, set(), 3, 100000, seed=1) == pytest.approx(0.508, abs=0.01)
+
+
+def test_seeded_parallel():
+    """A seed makes the result reproducible"""
+    equity = calculator.montecarlo_parallel({'AS', 'KS'}, set(), 2, 10000, threads=2, seed=3)
+    assert equity == calculator.montecarlo_parallel({'AS', 'KS'}, set(), 2, 10000, threads=2, seed=3)
+
+
+def test_config_threads():
+    """The wrappers run on the threads of the config by default, the result only depends on the threads"""
+    from tools import montecarlo_cpp
+    threads = montecarlo_cpp.config_threads()
+    assert threads >= 1
+    assert montecarlo_cpp.montecarlo_parallel({'AS', 'KS'}, set(), 2, 10000, seed=3) == \
+        calculator.montecarlo_parallel({'AS', 'KS'}, set(), 2, 10000, threads=threads, seed=3)
+
+
+def test_batch():
+    """A batch returns one equity per row, independent of the threads"""
+    rows = []
+    for my_cards, cards_on_table in RIVER_SPOTS:
+        rows.append([CARD_INDEX[card] for card in sorted(my_cards)] +
+                    [CARD_INDEX[card] for card in sorted(cards_on_table)] + [2, 50000])
+    rows.append([CARD_INDEX['AS'], CARD_INDEX['KS'], -1, -1, -1, -1, -1, 2, 50000])
+    situations = np.array(rows, dtype=np.int32)
+    assert situations.shape[1] == calculator.BATCH_COLUMNS
+
+    equities = calculator.montecarlo_batch(situations, threads=1, seed=5)
+    assert equities.dtype == np.float64 and equities.shape == (4,)
+    assert (equities == calculator.montecarlo_batch(situations, threads=3, seed=5)).all()
+    for equity, (my_cards, cards_on_table) in zip(equities, RIVER_SPOTS):
+        assert equity == pytest.approx(_exact_equity(my_cards, cards_on_table), abs=0.01)
+    assert equities[3] == pytest.approx(0.669, abs=0.015)
+
+    with pytest.raises(ValueError):
+        calculator.montecarlo_batch(np.zeros((2, 3), dtype=np.int32))
+
+
+def test_ranges_match_python():
+    """Weighted ranges, multiway and ghost cards agree with the python calculator"""
+    simulator = montecarlo_python.MonteCarlo()
+    spots = [([{'AA', 'KK', 'QQ'}], ['2C', '7D', '9S'], 3, '', 0.3),
+             ([['AS', 'KS']], ['2C', '7D', '9S', 'TH'], 4, ['QS', 'JS'], 1),
+             ([{'AKS': 2.0, 'QQ': 1.0}, ['9H', '9D']], [], 2, '', 1)]
+    for players, table_cards, player_amount, ghost_cards, opponent_range in spots:
+        equity = simulator.run_montecarlo_cpp(players, table_cards, player_amount, 100000, ghost_cards,
+                                              opponent_range, seed=1)
+        expected, _ = simulator.run_montecarlo(players, table_cards, player_amount, None, 100000,
+                                               time.time() + 10, ghost_cards, opponent_range)
+        assert equity == pytest.approx(expected, abs=0.01)
+
+
+def test_ranges_that_cannot_be_dealt():
+    """Ranges that always share a card raise instead of looping forever"""
+    aces = (np.array([[CARD_INDEX['AS'], CARD_INDEX['AH']]]), np.ones(1))
+    with pytest.raises(ValueError):
+        calculator.montecarlo_ranges([aces, aces], [], [], 100)
+    with pytest.raises(ValueError):
+        calculator.montecarlo_ranges([aces, None], [], [CARD_INDEX['AS']], 100)
+
+
+@pytest.mark.parametrize("row, message", [([51, 47, -1, -1, -1, -1, -1, 1, 100], "players"),
+                                          ([51, 47, -1, -1, -1, -1, -1, 30, 100], "cards left"),
+                                          ([51, 47, -1, -1, -1, -1, -1, 2, 0], "Iterations"),
+                                          ([51, 47, 47, 0, 1, -1, -1, 2, 100], "Repeated card"),
+                                          ([51, 47, 0, 0, 1, -1, -1, 2, 100], "Repeated card"),
+                                          ([51, 51, -1, -1, -1, -1, -1, 2, 100], "Repeated card")])
+def test_invalid_situations(row, message):
+    """Invalid rows raise with the row number, single situations raise as well"""
+    valid = [51, 47, -1, -1, -1, -1, -1, 2, 100]
+    with pytest.raises(ValueError, match=f"{message}.* in row 1"):
+        calculator.montecarlo_batch(np.array([valid, row], dtype=np.int32), threads=2)
+
+
+def test_invalid_situation():
+    """The single situation calculators reject what montecarlo_batch rejects"""
+    with pytest.raises(ValueError):
+        calculator.montecarlo({'AS', 'KS'}, set(), 1, 100)
+    with pytest.raises(ValueError):
+        calculator.montecarlo_parallel({'AS', 'KS'}, set(), 2, 0)
+    with pytest.raises(ValueError):
+        calculator.montecarlo({'AS', 'KS'}, {'KS', '2C', '3D'}, 2, 100)
+    with pytest.raises(ValueError):
+        calculator.montecarlo({'AS'}, set(), 2, 100)
@@ -6,6 +6,7 @@ import time
 import numpy as np
 
 from tools import montecarlo_python
+from tools.cards import cards_to_ints, ints_to_mask
 
 simulator = montecarlo_python.MonteCarlo()
 
@@ -45,7 +46,7 @@ def test_montecarlo1():
     """Montecarlo test"""
     my_cards = [['3H', '3S']]
     cards_on_table = ['8S', '4S', 'QH', '8C', '4H']
-    expected_results = 40.2
+    expected_results = 20.4  # mostly split pots playing the board
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -63,7 +64,7 @@ def test_montecarlo3():
     """Montecarlo test"""
     my_cards = [['AS', 'KS']]
     cards_on_table = []
-    expected_results = 49.9 + 1.9
+    expected_results = 49.9 + 1.9 / 2  # ties count as a share of the pot
     players = 3
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -72,7 +73,7 @@ def test_montecarlo4():
     """Montecarlo test"""
     my_cards = [['AS', 'KS']]
     cards_on_table = []
-    expected_results = 66.1 + 1.6
+    expected_results = 66.1 + 1.6 / 2
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -81,7 +82,7 @@ def test_montecarlo5():
     """Montecarlo test"""
     my_cards = [['8S', 'TS']]
     cards_on_table = ['8H', 'KS', '9S', 'TH', 'KH']
-    expected_results = 71.5 + 5.9
+    expected_results = 71.5 + 5.9 / 2
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -108,7 +109,7 @@ def test_montecarlo8():
     """Montecarlo test"""
     my_cards = [['8S', 'TS']]
     cards_on_table = []
-    expected_results = 22.6 + 2.9
+    expected_results = 22.6 + 2.9 / 2
     players = 5
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -117,7 +118,7 @@ def test_montecarlo8b():
     """Montecarlo test"""
     my_cards = [['2C', 'QS']]
     cards_on_table = []
-    expected_results = 49.6  # 45 win and 4 tie
+    expected_results = 45 + 4 / 2  # 45 win and 4 tie
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -135,7 +136,7 @@ def test_montecarlo10():
     """Montecarlo test"""
     my_cards = [['3S', 'QH']]
     cards_on_table = ['2C', '5H', '7C']
-    expected_results = 30.9 + 2.2
+    expected_results = 30.9 + 2.2 / 2
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -144,7 +145,7 @@ def test_montecarlo11():
     """Montecarlo test"""
     my_cards = [['5C', 'JS']]
     cards_on_table = []
-    expected_results = 23
+    expected_results = 20.6
     players = 4
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -153,7 +154,7 @@ def test_montecarlo12():
     """Montecarlo test"""
     my_cards = [['TC', 'TH']]
     cards_on_table = ['4D', 'QD', 'KC']
-    expected_results = 66.7 + 0.38
+    expected_results = 66.7 + 0.38 / 2
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -171,7 +172,7 @@ def test_montecarlo14():
     """Montecarlo test"""
     my_cards = [['2H', '8S']]
     cards_on_table = ['AC', 'AD', 'AS', 'KS', 'KD']
-    expected_results = 95
+    expected_results = 47.8  # split pot unless the opponent holds the last ace
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -189,7 +190,7 @@ def test_montecarlo16():
     """Montecarlo test"""
     my_cards = [['5H', 'KD']]
     cards_on_table = ['KH', 'JS', '2C', 'QS']
-    expected_results = 75.6 + 3.6
+    expected_results = 75.6 + 3.6 / 2
     players = 2
     _runner(simulator, my_cards, cards_on_table, players, expected_results)
 
@@ -217,7 +218,7 @@ def test_montecarlo20():
     my_cards = [['KS', 'KC']]
     cards_on_table = ['3D', '9H', 'AS', '7S', 'QH']
     opponent_range = 0.25
-    expected_results = 12.8
+    expected_results = 17.2  # top 25% by the preflop table, which ranks 4AO and 6AO just outside
     players = 3
     _runner(simulator, my_cards, cards_on_table, players, expected_results, opponent_range=opponent_range)
 
@@ -227,6 +228,80 @@ def test_montecarlo21():
     my_cards = [{'AKO', 'AA'}]
     cards_on_table = ['3D', '9H', 'AS', '7S', 'QH']
     opponent_range = 0.25
-    expected_results = 77.8
+    expected_results = 72.4  # split pots against AK count as a share of the pot
     players = 3
     _runner(simulator, my_cards, cards_on_table, players, expected_results, opponent_range=opponent_range)
+
+
+def test_exact_enumeration():
+    """Heads-up river and turn spots are enumerated exactly"""
+    simulator.run_montecarlo([['2H', '8S']], ['AC', 'AD', 'AS', 'KS', 'KD'], 2, 1, maxRuns=15000,
+                             timeout=time.time() + 1, ghost_cards='')
+    assert simulator.runs == 990  # every opponent holding
+    assert simulator.equity == 472.5 / 990  # opponent wins with AH or KCKH, all else is a split pot
+
+    simulator.run_montecarlo([['8H', '8D']], ['QH', '7H', '9H', 'JH'], 2, 1, maxRuns=50000,
+                             timeout=time.time() + 1, ghost_cards='')
+    assert simulator.runs == 990 * 46
+    equity = simulator.equity
+    assert montecarlo_python.get_equity(['8H', '8D'], ['QH', '7H', '9H', 'JH'], 2, 50000) == equity
+
+    simulator.run_montecarlo([['8H', '8D']], ['QH', '7H', '9H', 'JH'], 2, 1, maxRuns=15000,
+                             timeout=time.time() + 1, ghost_cards='')
+    assert simulator.runs == 15000  # more runouts than maxRuns are sampled
+
+    simulator.run_montecarlo([['2H', '8S']], ['2C', '7D', '9S', 'KD', '3C'], 2, 1, maxRuns=15000,
+                             timeout=time.time() + 1, ghost_cards=['AS', 'AH'], opponent_range={'AA'})
+    assert simulator.runs == 1  # ADAC is the only AA combo without a ghost card
+    assert simulator.equity == 0
+
+
+def test_adaptive_runs():
+    """Sampling stops once the target standard error is reached"""
+    simulator.run_montecarlo([['AS', 'AH']], [], 2, 1, maxRuns=15000, timeout=time.time() + 5, ghost_cards='',
+                             target_stderr=0.01)
+    assert simulator.runs < 15000
+    assert simulator.stderr <= 0.01
+    assert abs(simulator.equity - 0.85) < 0.04
+
+    simulator.run_montecarlo([['AS', 'KS']], ['QS', 'JS', 'TS', '2D', '3C'], 3, 1, maxRuns=15000,
+                             timeout=time.time() + 5, ghost_cards='', target_stderr=0.01)
+    assert simulator.runs == montecarlo_python.ADAPTIVE_BATCH_SIZE  # the nuts need a single batch
+    assert simulator.equity == 1
+
+
+def test_expand_range():
+    """Ranges expand to weighted combos without dead cards"""
+    dead_mask = ints_to_mask(cards_to_ints(['AS', 'KS']))
+    combos, weights = simulator.expand_range({'AA': 1.0, 'KAS': 0.5}, dead_mask)
+    assert len(combos) == 3 + 3  # AS and KS are dead
+    assert sorted(weights.tolist()) == [0.5] * 3 + [1.0] * 3
+    assert all(dead_mask >> card & 1 == 0 for card in combos.flatten())
+
+
+def test_seeded_generator():
+    """Simulators with generators of the same seed deal the same runs"""
+    equities = [montecarlo_python.get_equity({'AS', 'KD'}, {'2C', '7D', '9S'}, 3, 2000, rng=np.random.default_rng(5))
+                for _ in range(2)]
+    assert equities[0] == equities[1]
+    assert equities[0] != montecarlo_python.get_equity({'AS', 'KD'}, {'2C', '7D', '9S'}, 3, 2000,
+                                                        rng=np.random.default_rng(6))
+
+
+class _RecordingMonteCarlo(montecarlo_python.MonteCarlo):
+    """Keeps the dealt runs"""
+
+    def deal_runs(self, runs, player_sources, table_cards, deck):
+        dealt_runs, redraws = super().deal_runs(runs, player_sources, table_cards, deck)
+        self.dealt_runs.append(dealt_runs)
+        return dealt_runs, redraws
+
+
+def test_ghost_cards_are_not_dealt_to_ranges():
+    """Ghost cards are dead for range opponents, of AA only ADAC is left if AS and AH are ghost cards"""
+    simulation = _RecordingMonteCarlo(np.random.default_rng(1))
+    simulation.dealt_runs = []
+    simulation.run_montecarlo([['2H', '8S']], ['2C', '7D', '9S'], 3, 1, maxRuns=2000, timeout=time.time() + 10,
+                              ghost_cards=['AS', 'AH'], opponent_range={'AA', 'KK'})
+    dealt_cards = np.concatenate(simulation.dealt_runs)
+    assert not np.isin(dealt_cards, cards_to_ints(['AS', 'AH'])).any()
@@ -0,0 +1,35 @@
+"""Tests for the precomputed preflop equity table."""
+import numpy as np
+
+from tools import montecarlo_python
+from tools.preflop_equity import MAX_PLAYERS, MIN_PLAYERS, STARTING_HANDS, example_cards, get_preflop_equity, \
+    load_preflop_table, save_preflop_table, starting_hand
+
+
+def test_starting_hands():
+    """All 169 starting hands have a unique notation that maps back to itself"""
+    assert len(set(STARTING_HANDS)) == 169
+    assert starting_hand(['AS', 'KS']) == 'KAS'
+    assert starting_hand(['KD', 'AS']) == 'KAO'
+    assert starting_hand(['2C', '2D']) == '22'
+    for hand in STARTING_HANDS:
+        assert starting_hand(example_cards(hand)) == hand
+
+
+def test_shipped_table():
+    """The shipped table covers every hand for 2 to 10 players with sensible equities"""
+    table = load_preflop_table()
+    assert not np.isnan(table[:, MIN_PLAYERS:]).any()
+    assert abs(get_preflop_equity(['AS', 'AH'], 2) - 0.852) < 0.01
+    assert abs(get_preflop_equity(['7D', '2C'], 2) - 0.346) < 0.01
+    assert (np.diff(table[:, MIN_PLAYERS:], axis=1) < 0).all()  # more players, less equity
+    assert montecarlo_python.get_equity({'AS', 'AH'}, set(), 2, 1000) == get_preflop_equity(['AS', 'AH'], 2)
+
+
+def test_save_and_load(tmp_path):
+    """A saved table reads back with 4 decimals"""
+    table = np.random.random((len(STARTING_HANDS), MAX_PLAYERS + 1))
+    filename = save_preflop_table(table, str(tmp_path / 'preflop.csv'))
+    loaded = load_preflop_table(filename)
+    assert np.allclose(loaded[:, MIN_PLAYERS:], table[:, MIN_PLAYERS:], atol=1e-4)
+    load_preflop_table()
@@ -0,0 +1,118 @@
+"""Tests for the vectorized environment"""
+import random
+
+import numpy as np
+import pytest
+
+from agents.agent_random import Player as RandomPlayer
+from gym_env.enums import Action
+from gym_env.env import HoldemTable, PlayerShell
+from gym_env.observation import ObservationData
+from gym_env.subproc_env import SubprocHoldemTable, seed_process
+from gym_env.vec_env import VecHoldemTable, legal_moves_mask
+
+
+def _create_table():
+    env = HoldemTable(initial_stacks=20, funds_plot=False)
+    env.add_player(RandomPlayer())
+    env.add_player(RandomPlayer())
+    env.add_player(PlayerShell(name='shell', stack_size=20))
+    return env
+
+
+def _create_equity_table():
+    env = _create_table()
+    env.calculate_equity = True
+    return env
+
+
+def _first_legal(masks):
+    return masks.argmax(axis=1)
+
+
+def _last_legal(masks):
+    """Highest legal action, mostly all in, so that episodes end quickly"""
+    return masks.shape[1] - 1 - masks[:, ::-1].argmax(axis=1)
+
+
+def test_vec_env_matches_single_tables():
+    """Stepping tables in a batch gives the same results as stepping them one by one"""
+    random.seed(1)
+    vec_env = VecHoldemTable([_create_table] * 3, seed=1)
+    observations, masks = vec_env.reset()
+    assert observations.shape == (3,) + vec_env.observation_space and observations.dtype == np.float32
+    assert masks.shape == (3, len(Action))
+    batched = []
+    for _ in range(30):
+        observations, rewards, dones, masks, infos = vec_env.step(_last_legal(masks))
+        batched.append((observations, rewards, dones))
+        assert len(infos) == 3
+    assert sum(dones.sum() for _, _, dones in batched) > 0
+
+    random.seed(1)
+    envs = [_create_table() for _ in range(3)]
+    for ix, env in enumerate(envs):
+        env.seed(1, table_id=ix)
+        env.reset()
+    for observations, rewards, dones in batched:
+        for ix, env in enumerate(envs):
+            observation, reward, done, _ = env.step(Action(_last_legal(legal_moves_mask(env.legal_moves)[None])[0]))
+            if not done and env.current_player.name != 'shell':
+                observation, final_reward, done, _ = env.step(None)  # the random agents act until the shell's turn
+                reward = final_reward if done else reward
+            assert reward == rewards[ix] and done == dones[ix]
+            if done:
+                observation = env.reset()
+            assert np.array_equal(observation, observations[ix], equal_nan=True)
+
+
+def test_observations_are_the_shells():
+    """After every step the shell is to act on every table, so the observations and masks are its own"""
+    vec_env = VecHoldemTable([_create_table] * 3, seed=3)
+    _, masks = vec_env.reset()
+    for _ in range(200):
+        _, _, _, masks, _ = vec_env.step(_first_legal(masks))
+        assert [env.current_player.name for env in vec_env.envs] == ['shell'] * 3
+        for env, mask in zip(vec_env.envs, masks):
+            assert np.array_equal(mask, legal_moves_mask(env.legal_moves))
+
+
+def test_step_subset():
+    """Tables that are not stepped keep their observation"""
+    vec_env = VecHoldemTable([_create_table] * 2)
+    observations, masks = vec_env.reset()
+    new_observations, rewards, dones, _, _ = vec_env.step(_first_legal(masks)[:1], tables=[0])
+    assert np.array_equal(new_observations[1], observations[1], equal_nan=True)
+    assert rewards[1] == 0 and not dones[1]
+
+
+def test_subproc_env_matches_vec_env():
+    """Tables in worker processes give the results of the in process tables"""
+    seed_process(np.random.SeedSequence(2).spawn(1)[0])  # what the single worker does
+    vec_env = VecHoldemTable([_create_table] * 3, seed=2)
+    expected = [vec_env.reset()]
+    for _ in range(20):
+        expected.append(vec_env.step(_last_legal(expected[-1][-1] if len(expected) == 1 else expected[-1][3]))[:4])
+
+    with SubprocHoldemTable([_create_table] * 3, 3, workers=1, context='fork', seed=2) as pool:
+        observations, masks = pool.reset()
+        assert np.array_equal(observations, expected[0][0], equal_nan=True)
+        for step in expected[1:]:
+            results = pool.step(_last_legal(masks))
+            masks = results[3]
+            for result, expected_result in zip(results[:4], step):
+                assert np.array_equal(result, expected_result, equal_nan=True)
+    assert pool.closed
+
+
+def test_subproc_env_workers():
+    """Tables are spread over workers and errors of the tables reach the parent"""
+    with SubprocHoldemTable([_create_equity_table] * 3, 3, workers=3, context='fork', seed=0) as pool:
+        observations, masks = pool.reset()
+        equities = observations[:, ObservationData(3).fields['equity_to_river_alive']]
+        assert len(np.unique(equities)) == 3  # every worker has its own seed and deals its own cards
+        observations, rewards, dones, masks, _ = pool.step(_last_legal(masks))
+        assert observations.shape == (3,) + pool.observation_space
+        assert rewards.shape == dones.shape == (3,) and masks.shape == (3, len(Action))
+        with pytest.raises(ValueError):
+            pool.step([99], tables=[0])  # not an Action
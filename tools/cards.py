@@ -0,0 +1,133 @@
+"""
+Integer card representation shared by the evaluator, the simulators and the environment.
+
+A card is an int in 0..51 encoded as ``rank * 4 + suit`` where rank follows CARD_RANKS ('2' = 0, 'A' = 12)
+and suit follows SUITS ('C' = 0, 'S' = 3). A set of cards is a 64 bit mask with bit ``card`` set.
+Strings such as 'AS' are only used at the boundaries (logging, rendering, agents).
+"""
+
+from itertools import permutations
+
+import numpy as np
+
+CARD_RANKS = '23456789TJQKA'
+SUITS = 'CDHS'
+NUM_CARDS = 52
+
+CARD_STRINGS = tuple(rank + suit for rank in CARD_RANKS for suit in SUITS)
+CARD_INDEX = {card: i for i, card in enumerate(CARD_STRINGS)}
+CARD_MASKS = tuple(1 << i for i in range(NUM_CARDS))
+FULL_DECK_MASK = (1 << NUM_CARDS) - 1
+SUIT_PERMUTATIONS = tuple(permutations(range(len(SUITS))))
+
+
+def card_to_int(card):
+    """Convert a card string such as 'AS' into its integer index."""
+    return CARD_INDEX[card]
+
+
+def int_to_card(card):
+    """Convert an integer card back into its string representation."""
+    return CARD_STRINGS[card]
+
+
+def cards_to_ints(cards):
+    """Convert an iterable of card strings into a list of integer cards."""
+    return [CARD_INDEX[card] for card in cards]
+
+
+def ints_to_cards(cards):
+    """Convert an iterable of integer cards into a list of card strings."""
+    return [CARD_STRINGS[card] for card in cards]
+
+
+def rank_of(card):
+    """Rank of an integer card, 0 for a deuce and 12 for an ace."""
+    return card >> 2
+
+
+def suit_of(card):
+    """Suit of an integer card, index into SUITS."""
+    return card & 3
+
+
+def ints_to_mask(cards):
+    """Combine integer cards into a 64 bit hand mask."""
+    mask = 0
+    for card in cards:
+        mask |= CARD_MASKS[card]
+    return mask
+
+
+def cards_to_mask(cards):
+    """Combine card strings into a 64 bit hand mask."""
+    mask = 0
+    for card in cards:
+        mask |= CARD_MASKS[CARD_INDEX[card]]
+    return mask
+
+
+def mask_to_ints(mask):
+    """Expand a hand mask into a sorted list of integer cards."""
+    cards = []
+    while mask:
+        lowest = mask & -mask
+        cards.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return cards
+
+
+def mask_to_cards(mask):
+    """Expand a hand mask into a list of card strings."""
+    return [CARD_STRINGS[card] for card in mask_to_ints(mask)]
+
+
+def new_deck(excluded=None):
+    """
+    Create a deck of integer cards.
+
+    Args:
+        excluded (iterable): integer cards that are removed from the deck, e.g. known hole or table cards
+
+    Returns:
+        list of integer cards in ascending order
+
+    """
+    if not excluded:
+        return list(range(NUM_CARDS))
+    excluded_mask = ints_to_mask(excluded)
+    return [card for card in range(NUM_CARDS) if not excluded_mask & CARD_MASKS[card]]
+
+
+def canonical_suits(*card_groups):
+    """
+    Relabel suits so that suit-isomorphic situations share one representation.
+
+    For example AhKh on 2c7d9s and AsKs on 2h7c9d both become the same groups. Each group (e.g. hole cards,
+    table cards) is order independent.
+
+    Args:
+        card_groups (iterable): groups of integer cards
+
+    Returns:
+        tuple of sorted integer card tuples, the smallest over all 24 suit permutations
+
+    """
+    best = None
+    for permutation in SUIT_PERMUTATIONS:
+        candidate = tuple(tuple(sorted(card - (card & 3) + permutation[card & 3] for card in group))
+                          for group in card_groups)
+        if best is None or candidate < best:
+            best = candidate
+    return best
+
+
+def cards_to_array(cards, dtype=np.int8):
+    """Convert a list (or list of lists) of card strings into a numpy array of integer cards of the same shape."""
+    return np.array(_nested_ints(cards), dtype=dtype)
+
+
+def _nested_ints(cards):
+    if isinstance(cards, str):
+        return CARD_INDEX[cards]
+    return [_nested_ints(card) for card in cards]
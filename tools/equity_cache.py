@@ -0,0 +1,55 @@
+"""
+Bounded LRU cache in front of the equity calculators.
+
+Self-play asks for the same situations over and over, and suit-isomorphic situations have the same equity.
+Situations are therefore canonicalized with tools.cards.canonical_suits before the lookup, so AhKh on 2c7d9s
+and AsKs on 2h7c9d share one entry.
+"""
+from functools import lru_cache
+
+from tools.cards import CARD_INDEX, CARD_STRINGS, canonical_suits
+
+DEFAULT_CACHE_SIZE = 100000
+
+
+class EquityCache:
+    """
+    Wrap an equity calculator get_equity(player_cards, table_cards, players, runs).
+
+    The python (tools.montecarlo_python.get_equity), numpy (tools.montecarlo_numpy2.get_equity) and C++
+    (pymontecarlo.montecarlo) calculators share this signature. Cards are passed on to the calculator as
+    sets of card strings.
+    """
+
+    def __init__(self, get_equity, maxsize=DEFAULT_CACHE_SIZE):
+        """Create the cache, maxsize is the number of situations that are kept"""
+        self.get_equity = get_equity
+        self._cached_equity = lru_cache(maxsize=maxsize)(self._calculate)
+
+    def __call__(self, player_cards, table_cards, players, runs):
+        """Equity of the player cards, simulated only if the canonical situation is not cached yet"""
+        hole_cards, board = canonical_suits([CARD_INDEX[card] for card in player_cards],
+                                            [CARD_INDEX[card] for card in table_cards])
+        return self._cached_equity(hole_cards, board, players, runs)
+
+    def _calculate(self, hole_cards, board, players, runs):
+        return self.get_equity({CARD_STRINGS[card] for card in hole_cards}, {CARD_STRINGS[card] for card in board},
+                               players, runs)
+
+    @property
+    def hits(self):
+        """Lookups answered from the cache"""
+        return self._cached_equity.cache_info().hits
+
+    @property
+    def misses(self):
+        """Lookups that ran the calculator"""
+        return self._cached_equity.cache_info().misses
+
+    def __len__(self):
+        """Number of cached situations"""
+        return self._cached_equity.cache_info().currsize
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self._cached_equity.cache_clear()
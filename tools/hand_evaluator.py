@@ -1,119 +1,362 @@
-"""Texas holdem hand evaluation."""
+"""
+Texas holdem hand evaluation.
 
-# pylint: disable=too-many-statements, too-many-branches, too-many-locals
+Hands are scored with two lookup tables instead of sorting and counting cards for every hand:
 
-CARD_RANKS_ORIGINAL = '23456789TJQKA'
-SUITS_ORIGINAL = 'CDHS'
+- a rank pattern table: the rank counts of a hand are packed into one integer key (3 bits per rank,
+  see RANK_KEYS), which maps without collisions to the strength of the best non flush hand
+- a flush table: the 13 bit rank mask of the flush suit maps to the strength of the best flush or
+  straight flush (0 if the suit holds less than 5 distinct ranks)
+
+A strength is a single integer, higher is better. The hand category is stored in the bits above
+CATEGORY_SHIFT and the relevant ranks (kickers) in 4 bit fields below it.
+
+The rank pattern keys are mapped to table slots with a perfect hash (hash and displace). The tables are
+generated once, saved to a versioned binary file in the data directory and opened as numpy memmap on
+first use, so that all processes on a machine share the same pages.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from tools.cards import CARD_INDEX, CARD_RANKS, NUM_CARDS, SUITS
+from tools.helper import get_dir
+
+log = logging.getLogger(__name__)
+
+CARD_RANKS_ORIGINAL = CARD_RANKS
+SUITS_ORIGINAL = SUITS
+
+HAND_TYPES = ('HighCard', 'Pair', 'TwoPair', 'ThreeOfAKind', 'Straight', 'Flush', 'FullHouse', 'FoufOfAKind',
+              'StraightFlush')
+HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH, FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH = \
+    range(len(HAND_TYPES))
+CATEGORY_SHIFT = 20
+
+RANK_KEYS = tuple(1 << (3 * (card >> 2)) for card in range(NUM_CARDS))  # packed rank count contribution per card
+SUIT_KEYS = tuple(1 << (4 * (card & 3)) for card in range(NUM_CARDS))  # packed suit count contribution per card
+RANK_BITS = tuple(1 << (card >> 2) for card in range(NUM_CARDS))
+RANK_KEYS_ARRAY = np.array(RANK_KEYS, dtype=np.uint64)
+SUIT_KEYS_ARRAY = np.array(SUIT_KEYS, dtype=np.uint64)
+RANK_BITS_ARRAY = np.array(RANK_BITS, dtype=np.int32)
+FLUSH_CHECK = 0x3333  # adding 3 to every suit nibble sets its high bit when a suit appears at least 5 times
+FLUSH_BITS = 0x8888
+
+TABLES_VERSION = 1
+TABLES_MAGIC = 0x4E50484556414C  # 'NPHEVAL'
+HEADER_SIZE = 8  # uint64 words
+MASK64 = (1 << 64) - 1
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_BUCKET_BITS = 15
+HASH_SLOT_BITS = 17
+HASH_SLOT_SHIFT = 20
+FLUSH_TABLE_SIZE = 1 << 13
+
+# rank masks of the ten straights from ace high down to the wheel (A2345), with their high card
+STRAIGHTS = tuple((0b11111 << low, low + 4) for low in range(8, -1, -1)) + ((0b1000000001111, 3),)
+
+
+def _strength(category, ranks):
+    """Combine a category and up to five ranks (most significant first) into a single integer."""
+    strength = category << CATEGORY_SHIFT
+    for i, rank in enumerate(ranks[:5]):
+        strength |= rank << (16 - 4 * i)
+    return strength
+
+
+def _straight_high(rank_mask):
+    """High card of the best straight in a rank mask, or -1 if there is none"""
+    for straight_mask, high in STRAIGHTS:
+        if rank_mask & straight_mask == straight_mask:
+            return high
+    return -1
+
+
+def _pattern_strength(counts):
+    """Strength of the best hand without a flush, given the amount of cards per rank."""
+    ranks_desc = [rank for rank in range(12, -1, -1) if counts[rank]]
+    quads = [rank for rank in ranks_desc if counts[rank] == 4]
+    trips = [rank for rank in ranks_desc if counts[rank] == 3]
+    pairs = [rank for rank in ranks_desc if counts[rank] == 2]
+
+    if quads:
+        return _strength(FOUR_OF_A_KIND, [quads[0]] + [rank for rank in ranks_desc if rank != quads[0]][:1])
+    if trips and (len(trips) > 1 or pairs):
+        return _strength(FULL_HOUSE, [trips[0], max(trips[1:] + pairs)])
+
+    rank_mask = sum(1 << rank for rank in ranks_desc)
+    straight_high = _straight_high(rank_mask)
+    if straight_high >= 0:
+        return _strength(STRAIGHT, [straight_high])
+    if trips:
+        return _strength(THREE_OF_A_KIND, [trips[0]] + [rank for rank in ranks_desc if rank != trips[0]][:2])
+    if len(pairs) >= 2:
+        kickers = [rank for rank in ranks_desc if rank not in pairs[:2]][:1]
+        return _strength(TWO_PAIR, pairs[:2] + kickers)
+    if pairs:
+        return _strength(PAIR, pairs + [rank for rank in ranks_desc if rank != pairs[0]][:3])
+    return _strength(HIGH_CARD, ranks_desc[:5])
+
+
+def _flush_strength(rank_mask):
+    """Strength of the best flush or straight flush within the ranks of one suit, 0 if not a flush."""
+    ranks_desc = [rank for rank in range(12, -1, -1) if rank_mask & (1 << rank)]
+    if len(ranks_desc) < 5:
+        return 0
+    straight_high = _straight_high(rank_mask)
+    if straight_high >= 0:
+        return _strength(STRAIGHT_FLUSH, [straight_high])
+    return _strength(FLUSH, ranks_desc[:5])
+
+
+def _rank_patterns(max_cards=7):
+    """Yield (key, counts) for every combination of up to max_cards ranks with at most 4 cards per rank."""
+    counts = [0] * 13
+
+    def _recurse(rank, remaining, key):
+        if rank == 13:
+            yield key, counts
+            return
+        for count in range(min(4, remaining) + 1):
+            counts[rank] = count
+            yield from _recurse(rank + 1, remaining - count, key + count * (1 << (3 * rank)))
+        counts[rank] = 0
+
+    yield from _recurse(0, max_cards, 0)
+
+
+def _perfect_hash(keys, multiplier):
+    """
+    Hash and displace: assign every key a unique slot.
+
+    Keys are multiplied with the multiplier, the top bits select a bucket and the middle bits a slot,
+    which is xor-ed with the displacement of its bucket. Displacements are chosen greedily, largest buckets first.
+
+    Returns:
+        displacement (list) per bucket, or None if the multiplier produces unresolvable collisions
+
+    """
+    slot_mask = (1 << HASH_SLOT_BITS) - 1
+    buckets = [[] for _ in range(1 << HASH_BUCKET_BITS)]
+    for key in keys:
+        hashed = (key * multiplier) & MASK64
+        buckets[hashed >> (64 - HASH_BUCKET_BITS)].append((hashed >> HASH_SLOT_SHIFT) & slot_mask)
+
+    used = bytearray(1 << HASH_SLOT_BITS)
+    displacement = [0] * len(buckets)
+    for bucket in sorted(range(len(buckets)), key=lambda i: -len(buckets[i])):
+        slots = buckets[bucket]
+        if not slots:
+            break
+        if len(set(slots)) < len(slots):
+            return None
+        for disp in range(1 << HASH_SLOT_BITS):
+            candidates = [slot ^ disp for slot in slots]
+            if not any(used[slot] for slot in candidates):
+                for slot in candidates:
+                    used[slot] = 1
+                displacement[bucket] = disp
+                break
+    return displacement
+
+
+def build_tables():
+    """
+    Generate the lookup tables.
+
+    Returns:
+        header (ndarray): magic, version, hash multiplier and hash sizes
+        flush_table (ndarray): 13 bit rank mask -> strength of the best flush, 0 if less than 5 ranks
+        displacement (ndarray): perfect hash displacement per bucket
+        rank_table (ndarray): perfect hash slot -> strength of the best non flush hand
+
+    """
+    patterns = {key: _pattern_strength(counts) for key, counts in _rank_patterns() if key}
+    multiplier = HASH_MULTIPLIER
+    displacement = _perfect_hash(patterns, multiplier)
+    while displacement is None:
+        multiplier = (multiplier * 6364136223846793005 + 1442695040888963407) & MASK64 | 1
+        displacement = _perfect_hash(patterns, multiplier)
+
+    rank_table = np.zeros(1 << HASH_SLOT_BITS, dtype=np.int32)
+    for key, strength in patterns.items():
+        hashed = (key * multiplier) & MASK64
+        slot = ((hashed >> HASH_SLOT_SHIFT) & ((1 << HASH_SLOT_BITS) - 1)) ^ \
+            displacement[hashed >> (64 - HASH_BUCKET_BITS)]
+        rank_table[slot] = strength
+
+    header = np.zeros(HEADER_SIZE, dtype=np.uint64)
+    header[:5] = [TABLES_MAGIC, TABLES_VERSION, multiplier, HASH_BUCKET_BITS, HASH_SLOT_BITS]
+    flush_table = np.array([_flush_strength(rank_mask) for rank_mask in range(FLUSH_TABLE_SIZE)], dtype=np.int32)
+    return header, flush_table, np.array(displacement, dtype=np.int32), rank_table
+
+
+def get_tables_filename():
+    """Location of the persisted evaluator tables."""
+    return get_dir('data', f'hand_evaluator_v{TABLES_VERSION}.bin')
+
+
+def save_tables(filename=None):
+    """Generate the tables and write them to a binary file, atomically so that parallel workers never see a partial file."""
+    filename = filename or get_tables_filename()
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    log.info(f"Generating hand evaluator tables in {filename}")
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'wb') as file:
+        for array in build_tables():
+            file.write(array.tobytes())
+    os.replace(tmp_filename, filename)
+    return filename
+
+
+class EvaluatorTables:
+    """Read only memory mapped evaluator tables."""
+
+    def __init__(self, filename):
+        """Map the file, the header is validated by load_tables. Plain ndarray views avoid memmap indexing overhead."""
+        self.header = np.memmap(filename, dtype=np.uint64, mode='r', shape=(HEADER_SIZE,))
+        self.multiplier = int(self.header[2])
+        self.bucket_shift = 64 - int(self.header[3])
+        self.slot_mask = (1 << int(self.header[4])) - 1
+        offset = HEADER_SIZE * 8
+        self.flush = np.memmap(filename, dtype=np.int32, mode='r', offset=offset,
+                               shape=(FLUSH_TABLE_SIZE,)).view(np.ndarray)
+        offset += FLUSH_TABLE_SIZE * 4
+        self.displacement = np.memmap(filename, dtype=np.int32, mode='r', offset=offset,
+                                      shape=(1 << int(self.header[3]),)).view(np.ndarray)
+        offset += self.displacement.size * 4
+        self.ranks = np.memmap(filename, dtype=np.int32, mode='r', offset=offset,
+                               shape=(self.slot_mask + 1,)).view(np.ndarray)
+
+    def is_valid(self):
+        """Check that the file was written by the current table version."""
+        return int(self.header[0]) == TABLES_MAGIC and int(self.header[1]) == TABLES_VERSION
+
+
+_tables = None
+
+
+def load_tables(filename=None):
+    """Open the evaluator tables, generating the file first if it does not exist or is outdated."""
+    global _tables  # pylint: disable=global-statement
+    filename = filename or get_tables_filename()
+    tables = None
+    if os.path.isfile(filename):
+        try:
+            tables = EvaluatorTables(filename)
+        except ValueError:  # truncated file
+            tables = None
+    if tables is None or not tables.is_valid():
+        save_tables(filename)
+        tables = EvaluatorTables(filename)
+    _tables = tables
+    return tables
+
+
+def evaluate_hand(cards):
+    """
+    Evaluate a hand of up to 7 integer cards (see tools.cards).
+
+    Returns:
+        strength (int): comparable strength, the higher the better. Use get_hand_type to get the category.
+
+    """
+    tables = _tables or load_tables()
+    rank_key = 0
+    suit_key = 0
+    for card in cards:
+        rank_key += RANK_KEYS[card]
+        suit_key += SUIT_KEYS[card]
+    hashed = (rank_key * tables.multiplier) & MASK64
+    slot = ((hashed >> HASH_SLOT_SHIFT) & tables.slot_mask) ^ int(tables.displacement[hashed >> tables.bucket_shift])
+    strength = int(tables.ranks[slot])
+
+    flush_bits = (suit_key + FLUSH_CHECK) & FLUSH_BITS
+    if flush_bits:
+        flush_suit = (flush_bits.bit_length() - 1) >> 2
+        rank_mask = 0
+        for card in cards:
+            if card & 3 == flush_suit:
+                rank_mask |= RANK_BITS[card]
+        strength = max(strength, int(tables.flush[rank_mask]))
+    return strength
+
+
+def evaluate_batch(cards):
+    """
+    Evaluate many hands in one vectorized call.
+
+    Args:
+        cards (ndarray): integer cards (see tools.cards) of shape [N, 7], or [..., 7] for any leading shape.
+                         Fewer than 7 cards per hand work as well.
+
+    Returns:
+        strengths (ndarray): int32 array with the leading shape of cards, comparable like evaluate_hand
+
+    """
+    tables = _tables or load_tables()
+    cards = np.asarray(cards, dtype=np.intp)
+    rank_keys = RANK_KEYS_ARRAY[cards].sum(axis=-1, dtype=np.uint64)
+    hashed = rank_keys * np.uint64(tables.multiplier)  # wraps around like MASK64 in evaluate_hand
+    slots = ((hashed >> np.uint64(HASH_SLOT_SHIFT)) & np.uint64(tables.slot_mask)).astype(np.intp) ^ \
+        tables.displacement[(hashed >> np.uint64(tables.bucket_shift)).astype(np.intp)]
+    strengths = tables.ranks[slots]
+
+    suit_keys = SUIT_KEYS_ARRAY[cards].sum(axis=-1, dtype=np.uint64)
+    flush_bits = (suit_keys + np.uint64(FLUSH_CHECK)) & np.uint64(FLUSH_BITS)
+    flush_hands = np.nonzero(flush_bits)
+    if flush_hands[0].size:
+        flush_cards = cards[flush_hands]
+        flush_suit = np.zeros(flush_cards.shape[0], dtype=np.intp)
+        for suit in range(1, 4):
+            flush_suit[(flush_bits[flush_hands] >> np.uint64(4 * suit + 3)) & np.uint64(1) == 1] = suit
+        in_suit = (flush_cards & 3) == flush_suit[:, None]
+        rank_masks = np.bitwise_or.reduce(RANK_BITS_ARRAY[flush_cards] * in_suit, axis=-1)
+        strengths[flush_hands] = np.maximum(strengths[flush_hands], tables.flush[rank_masks])
+    return strengths
+
+
+def get_hand_category(strength):
+    """Category of a hand strength as index into HAND_TYPES."""
+    return strength >> CATEGORY_SHIFT
+
+
+def get_hand_type(strength):
+    """Name of the category of a hand strength, e.g. 'FullHouse'."""
+    return HAND_TYPES[strength >> CATEGORY_SHIFT]
+
+
+def get_hand_strengths(player_hands, table_cards):
+    """Strength of each player's hole cards (list of card strings) combined with the table cards."""
+    table = [CARD_INDEX[card] for card in table_cards]
+    return evaluate_batch([[CARD_INDEX[card] for card in player_hand] + table for player_hand in player_hands])
 
 
 def get_winner(player_hands, table_cards):
     """Determine the winning hands of multiple players"""
-    player_cards_with_table_cards = []
-    for player_hand in player_hands:
-        player_cards_with_table_cards.append(player_hand + table_cards)
+    strengths = get_hand_strengths(player_hands, table_cards)
+    best_hand_ix = int(np.argmax(strengths))
+    return best_hand_ix, get_hand_type(int(strengths[best_hand_ix]))
+
 
-    best_hand, winner_card_type = eval_best_hand(player_cards_with_table_cards)
-    best_hand_ix = (player_cards_with_table_cards.index(best_hand))
-    return best_hand_ix, winner_card_type
+def get_winners(player_hands, table_cards):
+    """
+    Determine all players that share the best hand.
+
+    Returns:
+        winner indices (list): more than one index if the pot is split
+        winning hand type (str)
+
+    """
+    strengths = get_hand_strengths(player_hands, table_cards)
+    best = strengths.max()
+    return np.flatnonzero(strengths == best).tolist(), get_hand_type(int(best))
 
 
 def eval_best_hand(hands):  # evaluate which hand is best
     """Evaluate the best hand."""
-    scores = [(i, _calc_score(hand)) for i, hand in enumerate(hands)]
-    winner = sorted(scores, key=lambda x: x[1], reverse=True)[0][0]
-    return hands[winner], scores[winner][1][-1]
-
-
-def _calc_score(hand):
-    """Assign a calc_score to the hand so it can be compared with other hands"""
-    rcounts = {CARD_RANKS_ORIGINAL.find(r): ''.join(hand).count(r) for r, _ in hand}.items()
-    score, card_ranks = zip(*sorted((cnt, rank) for rank, cnt in rcounts)[::-1])
-
-    potential_threeofakind = score[0] == 3
-    potential_twopair = score == (2, 2, 1, 1, 1)
-    potential_pair = score == (2, 1, 1, 1, 1, 1)
-
-    if score[0:2] == (3, 2) or score[0:2] == (3, 3):  # fullhouse (three of a kind and pair, or two three of a kind)
-        card_ranks = (card_ranks[0], card_ranks[1])
-        score = (3, 2)
-    elif score[0:4] == (2, 2, 2, 1):  # special case: convert three pair to two pair
-        score = (2, 2, 1)  # as three pair are not worth more than two pair
-        kicker = max(card_ranks[2], card_ranks[3])  # avoid for example 11,8,6,7
-        card_ranks = (card_ranks[0], card_ranks[1], kicker)
-    elif score[0] == 4:  # four of a kind
-        score = (4,)
-        sorted_card_ranks = sorted(card_ranks, reverse=True)  # avoid for example 11,8,9
-        card_ranks = (sorted_card_ranks[0], sorted_card_ranks[1])
-    elif len(score) >= 5:  # high card, flush, straight and straight flush
-        # straight
-        if 12 in card_ranks:  # adjust if 5 high straight
-            card_ranks += (-1,)
-        sorted_card_ranks = sorted(card_ranks, reverse=True)  # sort again as if pairs the first rank matches the pair
-        for i in range(len(sorted_card_ranks) - 4):
-            straight = sorted_card_ranks[i] - sorted_card_ranks[i + 4] == 4
-            if straight:
-                card_ranks = (
-                    sorted_card_ranks[i], sorted_card_ranks[i + 1], sorted_card_ranks[i + 2], sorted_card_ranks[i + 3],
-                    sorted_card_ranks[i + 4])
-                break
-
-        # flush
-        suits = [s for _, s in hand]
-        flush = max(suits.count(s) for s in suits) >= 5
-        if flush:
-            for flush_suit in SUITS_ORIGINAL:  # get the suit of the flush
-                if suits.count(flush_suit) >= 5:
-                    break
-
-            flush_hand = [k for k in hand if flush_suit in k]  # pylint: disable=undefined-loop-variable
-            rcounts_flush = {CARD_RANKS_ORIGINAL.find(r): ''.join(flush_hand).count(r) for r, _ in flush_hand}.items()
-            score, card_ranks = zip(*sorted((cnt, rank) for rank, cnt in rcounts_flush)[::-1])
-            card_ranks = tuple(
-                sorted(card_ranks, reverse=True))  # ignore original sorting where pairs had influence
-
-            # check for straight in flush
-            if 12 in card_ranks and -1 not in card_ranks:  # adjust if 5 high straight
-                card_ranks += (-1,)
-            for i in range(len(card_ranks) - 4):
-                straight = card_ranks[i] - card_ranks[i + 4] == 4
-                if straight:
-                    break
-
-        # no pair, straight, flush, or straight flush
-        score = ([(1,), (3, 1, 2)], [(3, 1, 3), (5,)])[flush][straight]
-
-    if score == (1,) and potential_threeofakind:
-        score = (3, 1)
-    elif score == (1,) and potential_twopair:
-        score = (2, 2, 1)
-    elif score == (1,) and potential_pair:
-        score = (2, 1, 1)
-
-    if score[0] == 5:
-        hand_type = "StraightFlush"  # crdRanks=crdRanks[:5] # five card rule makes no difference {:5] would be incorrect
-    elif score[0] == 4:
-        hand_type = "FoufOfAKind"  # crdRanks=crdRanks[:2] # already implemented above
-    elif score[0:2] == (3, 2):
-        hand_type = "FullHouse"  # crdRanks=crdRanks[:2] # already implmeneted above
-    elif score[0:3] == (3, 1, 3):
-        hand_type = "Flush"
-        card_ranks = card_ranks[:5]
-    elif score[0:3] == (3, 1, 2):
-        hand_type = "Straight"
-        card_ranks = card_ranks[:5]
-    elif score[0:2] == (3, 1):
-        hand_type = "ThreeOfAKind"
-        card_ranks = card_ranks[:3]
-    elif score[0:2] == (2, 2):
-        hand_type = "TwoPair"
-        card_ranks = card_ranks[:3]
-    elif score[0] == 2:
-        hand_type = "Pair"
-        card_ranks = card_ranks[:4]
-    elif score[0] == 1:
-        hand_type = "HighCard"
-        card_ranks = card_ranks[:5]
-    else:
-        raise Exception('Card Type error!')  # pylint: disable=broad-exception-raised
-
-    return score, card_ranks, hand_type
+    strengths = evaluate_batch([[CARD_INDEX[card] for card in hand] for hand in hands])
+    winner = int(np.argmax(strengths))
+    return hands[winner], get_hand_type(int(strengths[winner]))
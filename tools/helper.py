@@ -13,8 +13,6 @@ from configparser import ConfigParser, ExtendedInterpolation
 from logging import handlers
 from multiprocessing.pool import ThreadPool
 
-import pandas as pd
-
 CONFIG_FILENAME = 'config.ini'
 log = logging.getLogger(__name__)
 COMPUTER_NAME = os.getenv('COMPUTERNAME')
@@ -198,9 +196,9 @@ def get_multiprocessing_config():
 
     """
     config = get_config()
-    parallel = config.getboolean('MultiThreading', 'parallel')
-    cores = config.getint('MultiThreading', 'cores')
     num_cpus = multiprocessing.cpu_count()
+    parallel = config.getboolean('MultiThreading', 'parallel', fallback=True)
+    cores = config.getint('MultiThreading', 'cores', fallback=num_cpus)
     cores = max(1, min(cores, num_cpus - 1))
     return parallel, cores
 
@@ -268,6 +266,7 @@ def memory_cache(func):
 
 def _keys_to_tuple(args, kwargs):
     """Ensure everything is hashable."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
     compiled_args = []
     for arg in args:
         if isinstance(arg, (pd.DataFrame, dict)):
@@ -1,344 +1,435 @@
 #include "Montecarlo.h"
 
+#include <algorithm>
 #include <array>
+#include <bitset>
+#include <numeric>
+#include <random>
+#if defined(_MSC_VER)
+#include <intrin.h>
+#endif
+#include <stdexcept>
+#include <thread>
 #include <vector>
-#include <iostream>
-#include <tuple>
-#include <algorithm>
 
-#include <iostream>
-#include <algorithm>
-#include <random>
-#include <iterator>
+namespace {
 
-bool eval_best_hand(const std::vector<CardsWithTableCombined>& all_cards_with_table_combined)
-// returns true if first player has best hand
-{
-	std::vector<std::tuple< std::vector<int>, std::vector<int>, std::string>> all_players_score;
-	std::vector<std::tuple< std::vector<int>, std::vector<int>, std::string>>  all_players_score_original;
-	bool best_hand;
+	constexpr int CATEGORY_SHIFT = 20;
+	enum Category : std::uint32_t {
+		HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH, FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH
+	};
 
-	for (const auto& cards_with_table : all_cards_with_table_combined)
-	{
-		auto result = calc_score(cards_with_table);
-		all_players_score.emplace_back(result);
-	}
-	all_players_score_original = all_players_score;
+	const std::string RANKS = "23456789TJQKA";
+	const std::string SUITS = "CDHS";
 
-	std::sort(all_players_score.begin(), all_players_score.end(), std::greater<>());
-	if (all_players_score[0] == all_players_score_original[0])
-		best_hand = true; // first player is best hand
-	else
-		best_hand = false; // different player is best hand
+#if defined(_MSC_VER)
+	inline int highest_bit(std::uint32_t mask) {
+		unsigned long index;
+		_BitScanReverse(&index, mask);
+		return static_cast<int>(index);
+	}
 
-	return best_hand;
-}
+	inline int lowest_bit(CardMask mask) {
+		unsigned long index;
+		_BitScanForward64(&index, mask);
+		return static_cast<int>(index);
+	}
 
-Score get_rcounts(const CardsWithTableCombined& all_cards_with_table_combined,
-	std::vector<std::size_t> available_ranks,
-	const std::string original_ranks) {
-	Score rcounts;
-	for (const auto& card : all_cards_with_table_combined) {
-		available_ranks.emplace_back(original_ranks.find(card.substr(0, 1)));
+	inline int popcount(std::uint32_t mask) {
+		return static_cast<int>(__popcnt(mask));
 	}
-	for (int i = 0; i <= 12; i++) {
-		int count = std::count(available_ranks.begin(), available_ranks.end(), i);
-		if (count > 0) {
-			rcounts.emplace_back(std::make_pair(count, i));
-		}
+#else
+	inline int highest_bit(std::uint32_t mask) {
+		return 31 - __builtin_clz(mask);
 	}
-	return rcounts;
-}
 
-std::tuple< std::vector<int>, std::vector<int>, std::string> calc_score(const CardsWithTableCombined& all_cards_with_table_combined) {
-	const std::string original_ranks = "23456789TJQKA";
-	const std::vector<std::string> original_suits{ "C","D","H","S" };
-	std::vector<std::size_t> available_ranks;
-	std::vector<std::string> available_suits;
-	std::vector<int> score;
-	std::vector<int> card_ranks;
-	std::vector<int> sorted_card_ranks;
-	std::string hand_type;
-	bool flush = false;
-	bool straight = false;
-
-	Score rcounts;
-	std::vector<std::tuple<int, std::string>> rsuits;
-
-	rcounts = get_rcounts(all_cards_with_table_combined, available_ranks, original_ranks);
-
-	// sort tuple and split into score and card ranks
-	std::sort(rcounts.begin(), rcounts.end(), std::greater<std::tuple<int, int>>());
-	for (auto it = std::make_move_iterator(rcounts.begin()),
-		end = std::make_move_iterator(rcounts.end()); it != end; ++it)
-	{
-		score.push_back(std::get<0>(*it));  // amount of occurrences
-		card_ranks.push_back(std::get<1>(*it));  // ranks of individual cards
+	inline int lowest_bit(CardMask mask) {
+		return __builtin_ctzll(mask);
 	}
 
-	bool potential_threeofakind = score[0] == 3;
-	bool potential_twopair = score == std::vector<int> {2, 2, 1, 1, 1};
-	bool potential_pair = score == std::vector<int> {2, 1, 1, 1, 1, 1};
-
-	auto sub_score2 = slice(score, 0, 2);
-	auto sub_score4 = slice(score, 0, 5);
-	auto sub_score0 = slice(score, 0, 0);
-	// # fullhouse(three of a kind and pair, or two three of a kind)
-	if (sub_score2 == std::vector<int> {3, 2} || sub_score2 == std::vector<int> {3, 3}) {
-		// make adjustment
-		card_ranks = slice(card_ranks, 0, 2);
-		score = { 3,2 };
+	inline int popcount(std::uint32_t mask) {
+		return __builtin_popcount(mask);
 	}
-	// edge case: convert three pair to two pair
-	//const auto x = &score[3];
-	else if (sub_score4 == std::vector<int>{2, 2, 2, 1}) {
-		score = { 2,2,1 };
-		int kicker = std::max(card_ranks[2], card_ranks[3]);
-		card_ranks = { card_ranks[0], card_ranks[1], kicker };
+#endif
+
+	// up to n highest ranks of a rank mask, packed into the kicker fields starting at the most significant one
+	inline std::uint32_t top_ranks(std::uint32_t mask, int n, int first_field = 0) {
+		std::uint32_t kickers = 0;
+		for (int field = first_field; field < first_field + n && mask; ++field) {
+			const int rank = highest_bit(mask);
+			kickers |= rank << (16 - 4 * field);
+			mask ^= 1u << rank;
+		}
+		return kickers;
 	}
-	else if (score[0] == 4) {  // four of a kind
-		score = { 4, };
-		// avoid for example 11, 8, 9
-		sorted_card_ranks = card_ranks;
-		std::sort(sorted_card_ranks.begin(), sorted_card_ranks.end(), std::greater <>());
-		card_ranks = { sorted_card_ranks[0], sorted_card_ranks[1] };
+
+	// rank of the high card of the best straight in a rank mask, -1 if there is none
+	inline int straight_high(std::uint32_t mask) {
+		const std::uint32_t extended = (mask << 1) | ((mask >> 12) & 1);  // the ace also plays low
+		const std::uint32_t runs = extended & (extended >> 1) & (extended >> 2) & (extended >> 3) & (extended >> 4);
+		return runs ? highest_bit(runs) + 3 : -1;
 	}
-	else if (score.size() >= 5) {  // high card, flush, straight and straight flush
-		// straight
-		// adjust for 5 high straight
-		if (std::find(card_ranks.begin(), card_ranks.end(), 12) != card_ranks.end())
-			card_ranks.push_back(-1);
-		sorted_card_ranks = card_ranks;
-		std::sort(sorted_card_ranks.begin(), sorted_card_ranks.end(), std::greater <>());  // sort again
-
-		for (int i = 0; i < sorted_card_ranks.size() - 4; ++i) {
-			straight = sorted_card_ranks[i] - sorted_card_ranks[i + 4] == 4;
-			if (straight == true) {
-				card_ranks = {
-					sorted_card_ranks[i], sorted_card_ranks[i + 1], sorted_card_ranks[i + 2], sorted_card_ranks[i + 3],
-					sorted_card_ranks[i + 4] };
-				break;
-			}
-		}
 
-		//flush
-		for (std::string card : all_cards_with_table_combined) {
-			available_suits.emplace_back(card.substr(1, 1));
-		}
+	inline std::uint32_t strength(Category category, std::uint32_t kickers) {
+		return (category << CATEGORY_SHIFT) | kickers;
+	}
 
-		std::vector<int> suit_counts;
-		std::vector<std::string> suit_cards;
-		for (const auto& suit : original_suits) {  // why can original_suits not be a string and suit a char?
-			int count = std::count(available_suits.begin(), available_suits.end(), suit);
-			if (count > 0) {
-				rsuits.emplace_back(std::make_pair(count, suit));
-			}
+	// deals `needed` cards to the front of deck[0..size) with a partial Fisher-Yates shuffle
+	inline void partial_shuffle(std::array<int, NUM_CARDS>& deck, int size, int needed, std::mt19937_64& rng) {
+		for (int i = 0; i < needed; ++i) {
+			std::uniform_int_distribution<int> pick(i, size - 1);
+			std::swap(deck[i], deck[pick(rng)]);
 		}
-		std::sort(rsuits.begin(), rsuits.end(), std::greater<std::tuple<int, std::string>>());
-		flush = std::get<0>(rsuits[0]) >= 5; // the most occurred suit appear at least 5 times
-
-		if (flush == true)
-		{
-			auto flush_suit = std::get<1>(rsuits[0]);
-			CardsWithTableCombined flush_hand;
-			for (auto card : all_cards_with_table_combined) {
-				if (card[1] == flush_suit[0]) {
-					flush_hand.insert(card);
-				}
-			}
-
-			Score rcounts_flush = get_rcounts(flush_hand, available_ranks, original_ranks);
-			// sort tuple and split into score and card ranks
-			std::sort(rcounts_flush.begin(), rcounts_flush.end(), std::greater<std::tuple<int, int>>());
-			card_ranks.clear();
-			score.clear();
-			for (auto it = std::make_move_iterator(rcounts_flush.begin()),
-				end = std::make_move_iterator(rcounts_flush.end()); it != end; ++it)
-			{
-				score.push_back(std::get<0>(*it));  // ranks of individual cards
-				card_ranks.push_back(std::get<1>(*it));  // amount of occurrences
-			}
+	}
+}
 
-			//	# check for straight in flush
-			// if 12 in card_ranks and -1 not in card_ranks : # adjust if 5 high straight
-			if (std::find(card_ranks.begin(), card_ranks.end(), 12) != card_ranks.end() &&
-				!(std::find(card_ranks.begin(), card_ranks.end(), -1) != card_ranks.end())) {
-				card_ranks.push_back(-1);
-			}
+int card_from_string(const std::string& card) {
+	if (card.size() != 2)
+		throw std::invalid_argument("Unknown card: " + card);
+	const auto rank = RANKS.find(card[0]);
+	const auto suit = SUITS.find(card[1]);
+	if (rank == std::string::npos || suit == std::string::npos)
+		throw std::invalid_argument("Unknown card: " + card);
+	return static_cast<int>(rank * 4 + suit);
+}
 
-			for (int i = 0; i < card_ranks.size() - 4; i++) {
-				straight = card_ranks[i] - card_ranks[i + 4] == 4;
-				if (straight == true)
-				{
-					break;
-				}
-			}
-		}
+CardMask cards_to_mask(const std::set<std::string>& cards) {
+	CardMask mask = 0;
+	for (const auto& card : cards)
+		mask |= CardMask{ 1 } << card_from_string(card);
+	return mask;
+}
 
-		// no pair, straight, flush, or straight flush
-		if (flush == false && straight == false)
-			score = { 1 };
-		else if (flush == false && straight == true)
-			score = { 3, 1, 2 };
-		else if (flush == true && straight == false)
-			score = { 3, 1, 3 };
-		else if (flush == true && straight == true)
-			score = { 5 };
-	}
-	if (score[0] == 1 && potential_threeofakind == true)
-		score = { 3,1 };
-	else if (score[0] == 1 && potential_twopair == true)
-		score = { 2, 2, 1 };
-	else if (score[0] == 1 && potential_pair == true)
-		score = { 2, 1, 1 };
-
-	if (score[0] == 5)
-		// # crdRanks=crdRanks[:5] # five card rule makes no difference {:5] would be incorrect
-		hand_type = "StraightFlush";
-	else if (score[0] == 4)
-		hand_type = "FoufOfAKind"; // crdRanks = crdRanks[:2] # already implemented above
-	else if (slice(score, 0, 2) == std::vector<int> {3, 2})
-		hand_type = "FullHouse"; // # crdRanks = crdRanks[:2] # already implmeneted above
-	else if (slice(score, 0, 3) == std::vector<int> {3, 1, 3}) {
-		hand_type = "Flush";
-		card_ranks = slice(card_ranks, 0, 5);
+std::uint32_t evaluate_mask(CardMask cards) {
+	std::array<std::uint32_t, 4> suits{};
+	std::array<int, 13> counts{};
+	while (cards) {
+		const int card = lowest_bit(cards);
+		cards &= cards - 1;
+		suits[card & 3] |= 1u << (card >> 2);
+		++counts[card >> 2];
 	}
 
-	else if (slice(score, 0, 3) == std::vector<int> {3, 1, 2}) {
-		hand_type = "Straight";
-		card_ranks = slice(card_ranks, 0, 5);
+	for (const std::uint32_t suit : suits) {
+		if (popcount(suit) >= 5) {  // with 7 cards a flush beats everything but a straight flush
+			const int high = straight_high(suit);
+			if (high >= 0)
+				return strength(STRAIGHT_FLUSH, top_ranks(1u << high, 1));
+			return strength(FLUSH, top_ranks(suit, 5));
+		}
 	}
 
-	else if (slice(score, 0, 2) == std::vector<int> {3, 1}) {
-		hand_type = "ThreeOfAKind";
-		card_ranks = slice(card_ranks, 0, 3);
-	}
-	else if (slice(score, 0, 2) == std::vector<int> {3, 1}) {
-		hand_type = "ThreeOfAKind";
-		card_ranks = slice(card_ranks, 0, 3);
+	std::uint32_t ranks = 0, pairs = 0, trips = 0, quads = 0;
+	for (int rank = 0; rank < 13; ++rank) {
+		if (counts[rank])
+			ranks |= 1u << rank;
+		if (counts[rank] == 2)
+			pairs |= 1u << rank;
+		else if (counts[rank] == 3)
+			trips |= 1u << rank;
+		else if (counts[rank] == 4)
+			quads |= 1u << rank;
 	}
-	else if (slice(score, 0, 2) == std::vector<int> {2, 2}) {
-		hand_type = "TwoPair";
-		card_ranks = slice(card_ranks, 0, 3);
+
+	if (quads) {
+		const int quad = highest_bit(quads);
+		return strength(FOUR_OF_A_KIND, top_ranks(1u << quad, 1) | top_ranks(ranks ^ (1u << quad), 1, 1));
 	}
-	else if (score[0] == 2) {
-		hand_type = "Pair";
-		card_ranks = slice(card_ranks, 0, 4);
+	if (trips && (popcount(trips) > 1 || pairs)) {
+		const int trip = highest_bit(trips);
+		return strength(FULL_HOUSE, top_ranks(1u << trip, 1) | top_ranks((trips ^ (1u << trip)) | pairs, 1, 1));
 	}
-	else if (score[0] == 1) {
-		hand_type = "HighCard";
-		card_ranks = slice(card_ranks, 0, 5);
+	const int high = straight_high(ranks);
+	if (high >= 0)
+		return strength(STRAIGHT, top_ranks(1u << high, 1));
+	if (trips)
+		return strength(THREE_OF_A_KIND, top_ranks(trips, 1) | top_ranks(ranks ^ trips, 2, 1));
+	if (popcount(pairs) >= 2) {
+		const std::uint32_t high_pair = 1u << highest_bit(pairs);
+		const std::uint32_t top_pairs = high_pair | (1u << highest_bit(pairs ^ high_pair));
+		return strength(TWO_PAIR, top_ranks(top_pairs, 2) | top_ranks(ranks ^ top_pairs, 1, 2));
 	}
-	else
-		throw std::runtime_error("Card Type error!");
-
-	auto res = std::make_tuple(score, card_ranks, hand_type);
-	return res;
+	if (pairs)
+		return strength(PAIR, top_ranks(pairs, 1) | top_ranks(ranks ^ pairs, 3, 1));
+	return strength(HIGH_CARD, top_ranks(ranks, 5));
 }
 
+bool eval_best_hand(const std::vector<CardsWithTableCombined>& all_cards_with_table_combined)
+// returns true if first player has best hand
+{
+	const std::uint32_t first = evaluate_mask(cards_to_mask(all_cards_with_table_combined.at(0)));
+	for (const auto& cards : all_cards_with_table_combined)
+		if (evaluate_mask(cards_to_mask(cards)) > first)
+			return false;
+	return true;
+}
 
-double montecarlo(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table, const int number_of_players, const int iterations) {
-
-	if (cards_on_table.size() < 3)
-		cards_on_table.clear();
-	int wins = 0;
+Situation::Situation(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table,
+	const int number_of_players)
+	: Situation(cards_to_mask(my_cards), cards_to_mask(cards_on_table), number_of_players) {}
+
+Situation::Situation(CardMask hero, CardMask table, const int number_of_players) : hero(hero), table(table) {
+	if (number_of_players < 2)
+		throw std::invalid_argument("At least two players are needed");
+	if (std::bitset<NUM_CARDS>(hero).count() != 2)
+		throw std::invalid_argument("The hero needs two different cards");
+	if (hero & table)
+		throw std::invalid_argument("A hole card is also a table card");
+	if (std::bitset<NUM_CARDS>(table).count() > 5)
+		throw std::invalid_argument("Table cards must be at most 5 cards");
+	if (std::bitset<NUM_CARDS>(table).count() < 3)
+		this->table = table = 0;
+	missing = 5 - static_cast<int>(std::bitset<NUM_CARDS>(table).count());
+	opponents = number_of_players - 1;
+	for (int card = 0; card < NUM_CARDS; ++card)
+		if (!(((hero | table) >> card) & 1))
+			deck[deck_size++] = card;
+	if (2 * opponents + missing > deck_size)
+		throw std::invalid_argument("Not enough cards left for the players");
+}
 
+double Situation::simulate(const int iterations, std::mt19937_64& rng) const {
+	// returns the sum of the hero's pot shares, the deck is copied so that threads can share the situation
+	std::array<int, NUM_CARDS> deck = this->deck;
+	const int needed = 2 * opponents + missing;
+	double wins = 0;
 	for (int i = 0; i < iterations; i++)
 	{
-		Deck deck;
-		deck.remove_visible_cards(my_cards, cards_on_table);
-		deck.distribute_cards(number_of_players);
-		std::vector<CardsWithTableCombined> cards_with_table_combined = deck.get_cards_combined();
-		bool first_player_has_best_hand = eval_best_hand(cards_with_table_combined);
-		if (first_player_has_best_hand == true)
-			wins += 1;
+		partial_shuffle(deck, deck_size, needed, rng);
+		CardMask board = table;
+		for (int card = 2 * opponents; card < needed; ++card)
+			board |= CardMask{ 1 } << deck[card];
+
+		const std::uint32_t hero_strength = evaluate_mask(hero | board);
+		int tied = 1;
+		bool lost = false;
+		for (int opponent = 0; opponent < opponents && !lost; ++opponent) {
+			const CardMask hand = (CardMask{ 1 } << deck[2 * opponent]) | (CardMask{ 1 } << deck[2 * opponent + 1]);
+			const std::uint32_t opponent_strength = evaluate_mask(hand | board);
+			lost = opponent_strength > hero_strength;
+			tied += opponent_strength == hero_strength;
+		}
+		if (!lost)
+			wins += 1.0 / tied;
 	}
-	double equity = (wins / (double)iterations);
-	// std::cout << "Equity: " << equity << std::endl;
-	return equity;
+	return wins;
 }
 
-
-
-Deck::Deck() {
-	std::string combined;
-	//std::cout << "Constructing deck..." << std::endl;
-	for (char& r : ranks) {
-		for (char& s : suits) {
-			combined = std::string() + r + s;
-			full_deck.insert(combined);
-		};
-	};
-	//std::cout << "Cards in deck: " << full_deck.size() << std::endl;
+namespace {
+	void check_iterations(const int iterations) {
+		if (iterations <= 0)
+			throw std::invalid_argument("Iterations must be positive");
+	}
 }
 
-void Deck::remove_visible_cards(const Hand& my_cards_, const std::set<std::string>& cards_on_table_) {
-	// remove my_cards and cards_on_table from full_deck
-	set_difference(full_deck.begin(), full_deck.end(), my_cards_.begin(), my_cards_.end(),
-		std::inserter(remaining_cards_tmp, remaining_cards_tmp.end()));
-
-	// remove visible table cards from deck
-	set_difference(remaining_cards_tmp.begin(), remaining_cards_tmp.end(), cards_on_table_.begin(),
-		cards_on_table_.end(),
-		std::inserter(remaining_cards, remaining_cards.end()));
-
-	//std::cout << "Remaining cards: " << remaining_cards.size() << std::endl;
-
-	this->my_cards = my_cards_.cards;
-	this->cards_on_table = cards_on_table_;
-
-	//std::cout << "Removed my cards from deck...\n";
+double montecarlo(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table,
+	const int number_of_players, const int iterations, const std::uint64_t seed) {
+	check_iterations(iterations);
+	const Situation situation(my_cards, std::move(cards_on_table), number_of_players);
+	std::mt19937_64 rng(seed ? seed : std::random_device()());
+	return situation.simulate(iterations, rng) / iterations;
 }
 
-void Deck::distribute_cards(int number_players) {
-	constexpr size_t cards_in_hand = 2;
-
-	std::vector<std::string> shuffled_deck(remaining_cards.begin(), remaining_cards.end());
-	std::shuffle(shuffled_deck.begin(), shuffled_deck.end(), std::mt19937_64(std::random_device()()));
-	std::vector<Hand> player_hands(number_players);  // empty container
+namespace {
+	// sum of the shares of situation.simulate with the iterations split across threads
+	template <typename Simulation>
+	double simulate_parallel(const Simulation& situation, const int iterations, int threads, std::uint64_t seed) {
+		if (threads <= 0)
+			threads = std::max(1u, std::thread::hardware_concurrency());
+		threads = std::max(1, std::min(threads, iterations));
+		if (!seed)
+			seed = std::random_device()();
+
+		std::vector<double> wins(threads, 0.0);
+		std::vector<std::exception_ptr> errors(threads);
+		std::vector<std::thread> workers;
+		for (int thread = 0; thread < threads; ++thread) {
+			const int thread_iterations = iterations / threads + (thread < iterations % threads);
+			workers.emplace_back([&situation, &wins, &errors, thread, thread_iterations, seed]() {
+				// independent stream per thread
+				std::seed_seq stream{ static_cast<std::uint32_t>(seed), static_cast<std::uint32_t>(seed >> 32),
+					static_cast<std::uint32_t>(thread) };
+				std::mt19937_64 rng(stream);
+				try {
+					wins[thread] = situation.simulate(thread_iterations, rng);
+				}
+				catch (...) {
+					errors[thread] = std::current_exception();
+				}
+			});
+		}
+		for (auto& worker : workers)
+			worker.join();
+		for (const auto& error : errors)
+			if (error)
+				std::rethrow_exception(error);
+		return std::accumulate(wins.begin(), wins.end(), 0.0);
+	}
+}
 
-	auto hand_it = player_hands.begin();
-	*hand_it = Hand(my_cards);  // set my own cards
-	hand_it++;
+double montecarlo_parallel(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table,
+	const int number_of_players, const int iterations, int threads, std::uint64_t seed) {
+	check_iterations(iterations);
+	const Situation situation(my_cards, std::move(cards_on_table), number_of_players);
+	return simulate_parallel(situation, iterations, threads, seed) / iterations;
+}
 
-	auto card_it = shuffled_deck.begin();
-	while (hand_it != player_hands.end()) {
-		*hand_it = Hand(std::set<std::string>{*++card_it, * ++card_it});
-		++hand_it;
+namespace {
+	std::mt19937_64 stream_rng(std::uint64_t seed, std::uint64_t stream) {
+		std::seed_seq sequence{ static_cast<std::uint32_t>(seed), static_cast<std::uint32_t>(seed >> 32),
+			static_cast<std::uint32_t>(stream), static_cast<std::uint32_t>(stream >> 32) };
+		return std::mt19937_64(sequence);
 	}
 
-	while (cards_on_table.size() < 5) {
-		cards_on_table.emplace(*++card_it);
+	// equity of one montecarlo_batch row, invalid rows throw std::invalid_argument
+	double batch_equity(const int* situation, std::mt19937_64 rng) {
+		CardMask hero = 0, table = 0;
+		for (int column = 0; column < BATCH_PLAYERS; ++column) {
+			const int card = situation[column];
+			if (card < -1 || card >= NUM_CARDS || (column < 2 && card < 0))
+				throw std::invalid_argument("Unknown card");
+			if (card < 0)
+				continue;
+			if (((hero | table) >> card) & 1)
+				throw std::invalid_argument("Repeated card");
+			(column < 2 ? hero : table) |= CardMask{ 1 } << card;
+		}
+		const int iterations = situation[BATCH_ITERATIONS];
+		check_iterations(iterations);
+		return Situation(hero, table, situation[BATCH_PLAYERS]).simulate(iterations, rng) / iterations;
 	}
-
-	// print out the hands
-	//for (auto const& player_hand : player_hands) {
-	//	std::cout << "Cards: ";
-	//	for (const auto& card : player_hand.cards)
-	//		std::cout << card << " ";
-	//	std::cout << std::endl;
-	//}
-	this->player_hands = player_hands;
-
-	//std::cout << "Cards on table: ";
-	//print_set(cards_on_table);
 }
 
-std::vector<CardsWithTableCombined> Deck::get_cards_combined() {
-	CardsWithTableCombined cards_with_table_combined;
-	std::vector<CardsWithTableCombined> all_cards_with_table_combined;
+void montecarlo_batch(const int* situations, std::size_t count, double* equities, int threads, std::uint64_t seed) {
+	if (threads <= 0)
+		threads = std::max(1u, std::thread::hardware_concurrency());
+	threads = static_cast<int>(std::max<std::size_t>(1, std::min<std::size_t>(threads, count)));
+	if (!seed)
+		seed = std::random_device()();
+
+	std::vector<std::exception_ptr> errors(threads);
+	auto work = [&](int thread) {
+		try {
+			for (std::size_t row = thread; row < count; row += threads) {
+				try {
+					equities[row] = batch_equity(situations + row * BATCH_COLUMNS, stream_rng(seed, row));
+				}
+				catch (const std::invalid_argument& error) {
+					throw std::invalid_argument(std::string(error.what()) + " in row " + std::to_string(row));
+				}
+			}
+		}
+		catch (...) {
+			errors[thread] = std::current_exception();
+		}
+	};
+
+	std::vector<std::thread> workers;
+	for (int thread = 1; thread < threads; ++thread)
+		workers.emplace_back(work, thread);
+	work(0);
+	for (auto& worker : workers)
+		worker.join();
+	for (const auto& error : errors)
+		if (error)
+			std::rethrow_exception(error);
+}
 
-	for (const auto& player_hand : player_hands) {
-		cards_with_table_combined = player_hand.cards;
-		cards_with_table_combined.insert(cards_on_table.begin(), cards_on_table.end());
-		all_cards_with_table_combined.push_back(cards_with_table_combined);
+RangeSituation::RangeSituation(const std::vector<Range>& ranges, CardMask table, CardMask dead)
+	: table(table), known(table | dead) {
+	const int table_size = static_cast<int>(std::bitset<NUM_CARDS>(table).count());
+	if (table_size > 5 || (table & dead))
+		throw std::invalid_argument("Table cards must be at most 5 cards that are not dead");
+	if (ranges.size() < 2)
+		throw std::invalid_argument("At least two players are needed");
+	missing = 5 - table_size;
+
+	for (const auto& range : ranges) {
+		if (range.combos.size() != range.weights.size())
+			throw std::invalid_argument("Every combo of a range needs a weight");
+		std::vector<CardMask> player_combos;
+		std::vector<double> cumulative;
+		for (std::size_t ix = 0; ix < range.combos.size(); ++ix) {
+			if (std::bitset<NUM_CARDS>(range.combos[ix]).count() != 2)
+				throw std::invalid_argument("A combo needs two cards");
+			if ((range.combos[ix] & known) || range.weights[ix] <= 0)
+				continue;
+			player_combos.push_back(range.combos[ix]);
+			cumulative.push_back((cumulative.empty() ? 0 : cumulative.back()) + range.weights[ix]);
+		}
+		if (!range.combos.empty() && player_combos.empty())
+			throw std::invalid_argument("No combo of a range is left to deal");
+		random_players += range.combos.empty();
+		combos.push_back(std::move(player_combos));
+		cumulative_weights.push_back(std::move(cumulative));
 	}
+	if (2 * random_players + missing > NUM_CARDS - static_cast<int>(std::bitset<NUM_CARDS>(known).count()) -
+		2 * (static_cast<int>(ranges.size()) - random_players))
+		throw std::invalid_argument("Not enough cards left for the players");
+}
 
-	return all_cards_with_table_combined;
+double RangeSituation::simulate(const int iterations, std::mt19937_64& rng) const {
+	// returns the sum of the hero's pot shares
+	constexpr int MAX_RANGE_REDRAWS = 1000;  // consecutive runs where ranges clash before giving up
+	const int players = static_cast<int>(combos.size());
+	std::uniform_real_distribution<double> uniform(0.0, 1.0);
+	std::vector<CardMask> hands(players);
+	std::array<int, NUM_CARDS> deck{};
+	double wins = 0;
+	int redraws = 0;
+	for (int i = 0; i < iterations; i++)
+	{
+		CardMask used = known;
+		bool clash = false;
+		for (int player = 0; player < players && !clash; ++player) {
+			const auto& cumulative = cumulative_weights[player];
+			if (cumulative.empty())
+				continue;
+			const auto pick = std::upper_bound(cumulative.begin(), cumulative.end(), uniform(rng) * cumulative.back());
+			hands[player] = combos[player][std::min<std::size_t>(pick - cumulative.begin(), cumulative.size() - 1)];
+			clash = (used & hands[player]) != 0;
+			used |= hands[player];
+		}
+		if (clash) {
+			if (++redraws > MAX_RANGE_REDRAWS)
+				throw std::invalid_argument("The ranges of the players cannot be dealt together");
+			--i;
+			continue;
+		}
+		redraws = 0;
+
+		int deck_size = 0;
+		for (int card = 0; card < NUM_CARDS; ++card)
+			if (!((used >> card) & 1))
+				deck[deck_size++] = card;
+		partial_shuffle(deck, deck_size, 2 * random_players + missing, rng);
+		int dealt = 0;
+		for (int player = 0; player < players; ++player)
+			if (cumulative_weights[player].empty()) {
+				hands[player] = (CardMask{ 1 } << deck[dealt]) | (CardMask{ 1 } << deck[dealt + 1]);
+				dealt += 2;
+			}
+		CardMask board = table;
+		for (int card = 0; card < missing; ++card)
+			board |= CardMask{ 1 } << deck[dealt + card];
+
+		const std::uint32_t hero_strength = evaluate_mask(hands[0] | board);
+		int tied = 1;
+		bool lost = false;
+		for (int opponent = 1; opponent < players && !lost; ++opponent) {
+			const std::uint32_t opponent_strength = evaluate_mask(hands[opponent] | board);
+			lost = opponent_strength > hero_strength;
+			tied += opponent_strength == hero_strength;
+		}
+		if (!lost)
+			wins += 1.0 / tied;
+	}
+	return wins;
 }
 
-void Deck::print_set(const std::set<std::string>& set) {
-	for (const auto& card : set)
-		std::cout << card << " ";
-	std::cout << std::endl;
-}
\ No newline at end of file
+double montecarlo_ranges(const std::vector<Range>& ranges, CardMask table, CardMask dead, const int iterations,
+	int threads, std::uint64_t seed) {
+	check_iterations(iterations);
+	const RangeSituation situation(ranges, table, dead);
+	return simulate_parallel(situation, iterations, threads, seed) / iterations;
+}
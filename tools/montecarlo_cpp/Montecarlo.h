@@ -1,77 +1,89 @@
 #pragma once
 
+#include <array>
+#include <cstdint>
+#include <random>
 #include <set>
 #include <string>
 #include <vector>
 
-
+// A card is an int in 0..51 encoded as rank * 4 + suit, as in tools/cards.py ('2' = 0, 'A' = 12, suits 'CDHS').
+// A set of cards is a 64 bit mask with bit `card` set.
+using CardMask = std::uint64_t;
 using CardsWithTableCombined = std::set<std::string>;
-using Score = std::vector<std::tuple<int, int>>;
-
-bool eval_best_hand(const std::vector<CardsWithTableCombined>&);
-std::tuple< std::vector<int>, std::vector<int>, std::string> calc_score(const CardsWithTableCombined&);
-
-double montecarlo(const std::set<std::string>&, std::set<std::string>, const int, const int);
-
-
-template<typename T>
-std::vector<T> slice(std::vector<T> const& v, int m, int n)
-{
-	if (m > v.size())
-		m = v.size();
-	if (n > v.size())
-		n = v.size();
-	auto first = v.cbegin() + m;
-	auto last = v.cbegin() + n;  // ending index needs to be n=x+1
-
-	std::vector<T> vec(first, last);
-	return vec;
-}
-
 
+constexpr int NUM_CARDS = 52;
 
-typedef std::set<std::string> CardsWithTableCombined;
+int card_from_string(const std::string& card);
+CardMask cards_to_mask(const std::set<std::string>& cards);
 
-struct Hand {
-	Hand() = default;
+// Strength of the best five card hand in up to 7 cards, encoded like tools/hand_evaluator.py:
+// category << 20 | kicker ranks in 4 bit fields, the higher the better. Does not allocate.
+std::uint32_t evaluate_mask(CardMask cards);
 
-	Hand(std::set<std::string> cards) : cards(std::move(cards)) {}
-
-	std::set<std::string> cards;
-
-	void insert(const std::string& card) {
-		cards.insert(card);
-	}
+// true if the first player has the best hand (ties included)
+bool eval_best_hand(const std::vector<CardsWithTableCombined>&);
 
-	void insert_hand(const Hand& hand) {
-		for (const std::string& card : hand.cards)
-			cards.insert(card);
-	}
+// Known cards and the deck that is left for one equity calculation
+struct Situation {
+	Situation(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table, const int number_of_players);
+	Situation(CardMask hero, CardMask table, const int number_of_players);
 
-	[[nodiscard]] auto begin() const { return cards.begin(); }
+	double simulate(const int iterations, std::mt19937_64& rng) const;
 
-	[[nodiscard]] auto end() const { return cards.end(); }
+	CardMask hero = 0;
+	CardMask table = 0;
+	int missing = 0;
+	int opponents = 0;
+	std::array<int, NUM_CARDS> deck{};
+	int deck_size = 0;
 };
 
-class Deck {
-private:
-	std::string ranks = "23456789TJQKA";
-	std::string suits = "CDHS";
-	Hand my_cards;
-	std::set<std::string> remaining_cards_tmp;
-	std::set<std::string> remaining_cards;
-	std::set<std::string> cards_on_table;
-	void print_set(const std::set<std::string>& set);
-public:
-	std::set<std::string> full_deck;
-
-	std::vector<Hand> player_hands;
-
-	Deck();
+// Equity of my_cards against number_of_players - 1 random hands, split pots count as a share of the pot.
+// cards_on_table with less than 3 cards are ignored (preflop). A seed of 0 draws one from std::random_device.
+// std::invalid_argument is thrown for fewer than 2 or too many players, iterations <= 0 and repeated cards.
+double montecarlo(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table,
+	const int number_of_players, const int iterations, const std::uint64_t seed = 0);
+
+// montecarlo with the iterations split across threads, each with its own RNG stream derived from the seed.
+// threads <= 0 uses all hardware threads.
+double montecarlo_parallel(const std::set<std::string>& my_cards, std::set<std::string> cards_on_table,
+	const int number_of_players, const int iterations, int threads = 0, std::uint64_t seed = 0);
+
+// Row layout of montecarlo_batch situations: two hole cards, five table cards (-1 if not dealt yet), the number
+// of players and the iterations. Cards are ints as in tools/cards.py, fewer than 3 table cards mean preflop.
+constexpr int BATCH_COLUMNS = 9;
+constexpr int BATCH_PLAYERS = 7;
+constexpr int BATCH_ITERATIONS = 8;
+
+// Equities of `count` situations (rows of BATCH_COLUMNS ints) written to equities. The rows are split across
+// threads (<= 0 for all hardware threads), row i always uses the RNG stream (seed, i). Rows that montecarlo would
+// reject, or with unknown cards, throw std::invalid_argument with the row number.
+void montecarlo_batch(const int* situations, std::size_t count, double* equities, int threads = 0,
+	std::uint64_t seed = 0);
+
+// Weighted hole card combos of one player, an empty range stands for a random hand
+struct Range {
+	std::vector<CardMask> combos;
+	std::vector<double> weights;
+};
 
-	void distribute_cards(int number_of_players);
+// Known table, dead (ghost) cards and the range of every player, the first player is the hero
+struct RangeSituation {
+	RangeSituation(const std::vector<Range>& ranges, CardMask table, CardMask dead);
 
-	void remove_visible_cards(const Hand& my_cards_, const std::set<std::string>& cards_on_table);
+	double simulate(const int iterations, std::mt19937_64& rng) const;
 
-	std::vector<CardsWithTableCombined> get_cards_combined();
+	// combos that do not touch the table or dead cards with cumulative weights, empty for random players
+	std::vector<std::vector<CardMask>> combos;
+	std::vector<std::vector<double>> cumulative_weights;
+	CardMask table = 0;
+	CardMask known = 0;
+	int missing = 0;
+	int random_players = 0;
 };
+
+// Equity of the first range against the other ranges. Runs where ranges share a card are dealt again,
+// std::invalid_argument is thrown if the ranges cannot be dealt together. Threads and seed as in montecarlo_parallel.
+double montecarlo_ranges(const std::vector<Range>& ranges, CardMask table, CardMask dead, const int iterations,
+	int threads = 0, std::uint64_t seed = 0);
@@ -178,9 +178,9 @@ BOOST_AUTO_TEST_CASE(montecarlo1)
 	std::set<std::string> my_cards = { "3H", "3S" };
 	std::set<std::string>    cards_on_table = { "8S", "4S", "QH", "8C", "4H" };
 	const int number_of_players = 2;
-	const int iterations = 50000;
+	const int iterations = 200000;
 	double equity = montecarlo(my_cards, cards_on_table, number_of_players, iterations);
-	double expected = 40.2;
+	double expected = 20.15;  // mostly split pots playing the board
 	int tolerance = 1;
 
 	BOOST_CHECK_CLOSE(equity*100, expected, tolerance);
@@ -195,7 +195,7 @@ BOOST_AUTO_TEST_CASE(montecarlo3)
 	const int iterations = 50000;
 	double equity = montecarlo(my_cards, cards_on_table, number_of_players, iterations);
 
-	double expected = 51.8;
+	double expected = 50.8;
 	int tolerance = 1;
 
 	BOOST_CHECK_CLOSE(equity * 100, expected, tolerance);
@@ -210,8 +210,74 @@ BOOST_AUTO_TEST_CASE(montecarlo4)
 	const int iterations = 50000;
 	double equity = montecarlo(my_cards, cards_on_table, number_of_players, iterations);
 
-	double expected = 67.7;
+	double expected = 66.9;
 	int tolerance = 1;
 
 	BOOST_CHECK_CLOSE(equity * 100, expected, tolerance);
-}
\ No newline at end of file
+}
+
+BOOST_AUTO_TEST_CASE(montecarlo_seeded)
+{
+	std::set<std::string> my_cards = { "AS", "KS" };
+	std::set<std::string> cards_on_table = { "2S", "7D", "9S" };
+	double first = montecarlo(my_cards, cards_on_table, 3, 10000, 42);
+	double second = montecarlo(my_cards, cards_on_table, 3, 10000, 42);
+
+	BOOST_TEST(first == second);
+}
+
+
+BOOST_AUTO_TEST_CASE(montecarlo_parallel_threads)
+{
+	std::set<std::string> my_cards = { "AS", "KS" };
+	std::set<std::string> cards_on_table = { };
+	double equity = montecarlo_parallel(my_cards, cards_on_table, 2, 200000, 4, 7);
+
+	BOOST_CHECK_CLOSE(equity * 100, 66.9, 1);
+	BOOST_TEST(equity == montecarlo_parallel(my_cards, cards_on_table, 2, 200000, 4, 7));
+}
+
+BOOST_AUTO_TEST_CASE(montecarlo_batch_rows)
+{
+	// AS KS preflop heads up, AS AH on 2C 7D 9S against two opponents
+	const std::vector<int> situations = {
+		51, 47, -1, -1, -1, -1, -1, 2, 200000,
+		51, 50, 0, 21, 31, -1, -1, 3, 200000 };
+	std::vector<double> equities(2), threaded(2);
+	montecarlo_batch(situations.data(), 2, equities.data(), 1, 7);
+	montecarlo_batch(situations.data(), 2, threaded.data(), 2, 7);
+
+	BOOST_CHECK_CLOSE(equities[0] * 100, 66.9, 1);
+	BOOST_CHECK_CLOSE(equities[1] * 100, montecarlo({ "AS", "AH" }, { "2C", "7D", "9S" }, 3, 200000, 7) * 100, 1);
+	BOOST_TEST(equities == threaded);
+}
+
+BOOST_AUTO_TEST_CASE(montecarlo_invalid_situations)
+{
+	BOOST_CHECK_THROW(montecarlo({ "AS", "KS" }, { }, 1, 100), std::invalid_argument);
+	BOOST_CHECK_THROW(montecarlo({ "AS", "KS" }, { }, 2, 0), std::invalid_argument);
+	BOOST_CHECK_THROW(montecarlo({ "AS", "KS" }, { "KS", "2C", "3D" }, 2, 100), std::invalid_argument);
+
+	// the second row repeats AS on the flop
+	const std::vector<int> situations = {
+		51, 47, -1, -1, -1, -1, -1, 2, 100,
+		51, 47, 51, 0, 1, -1, -1, 2, 100 };
+	std::vector<double> equities(2);
+	BOOST_CHECK_EXCEPTION(montecarlo_batch(situations.data(), 2, equities.data(), 1, 7), std::invalid_argument,
+		[](const std::invalid_argument& error) { return std::string(error.what()) == "Repeated card in row 1"; });
+}
+
+BOOST_AUTO_TEST_CASE(montecarlo_ranges_fixed_hands)
+{
+	// known hands as single combo ranges agree with montecarlo against a random hand
+	const Range hero{ { cards_to_mask({ "AS", "KS" }) }, { 1.0 } };
+	const double equity = montecarlo_ranges({ hero, Range{} }, cards_to_mask({ "2C", "7D", "9S" }), 0, 200000, 1, 7);
+	BOOST_CHECK_CLOSE(equity * 100, montecarlo({ "AS", "KS" }, { "2C", "7D", "9S" }, 2, 200000, 7) * 100, 2);
+
+	// AA against KK or QQ with the ghost card AH: only AS AD is left for the hero, which has no ace left to improve
+	const Range aces{ { cards_to_mask({ "AS", "AH" }), cards_to_mask({ "AS", "AD" }) }, { 1.0, 1.0 } };
+	const Range villain{ { cards_to_mask({ "KS", "KH" }), cards_to_mask({ "QS", "QH" }) }, { 3.0, 1.0 } };
+	const double ranged = montecarlo_ranges({ aces, villain }, 0, cards_to_mask({ "AH" }), 200000, 2, 7);
+	BOOST_CHECK_CLOSE(ranged * 100, 80.2, 1);
+	BOOST_CHECK_THROW(montecarlo_ranges({ aces, aces }, 0, cards_to_mask({ "AD" }), 10), std::invalid_argument);
+}
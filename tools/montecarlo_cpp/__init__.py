@@ -0,0 +1,40 @@
+"""
+C++ equity calculator, built with ``python setup.py build_ext --inplace``.
+
+pymontecarlo is None if the extension has not been built, callers then fall back to the python calculator.
+The wrappers below call the multi-threaded functions of pymontecarlo with the threads of the config
+([MultiThreading] cores, 1 if parallel is off) instead of all hardware threads.
+"""
+from functools import lru_cache
+
+from tools.helper import get_multiprocessing_config
+
+try:
+    from tools.montecarlo_cpp import pymontecarlo
+except ImportError:
+    pymontecarlo = None
+
+
+@lru_cache(maxsize=None)
+def config_threads():
+    """Threads of the C++ calculators according to the config, read once"""
+    parallel, cores = get_multiprocessing_config()
+    return cores if parallel else 1
+
+
+def montecarlo_parallel(my_cards, cards_on_table, number_of_players, iterations, threads=None, seed=0):
+    """pymontecarlo.montecarlo_parallel, threads defaults to config_threads()"""
+    return pymontecarlo.montecarlo_parallel(my_cards, cards_on_table, number_of_players, iterations,
+                                            threads=config_threads() if threads is None else threads, seed=seed)
+
+
+def montecarlo_batch(situations, threads=None, seed=0):
+    """pymontecarlo.montecarlo_batch, threads defaults to config_threads()"""
+    return pymontecarlo.montecarlo_batch(situations, threads=config_threads() if threads is None else threads,
+                                         seed=seed)
+
+
+def montecarlo_ranges(players, table_cards, dead_cards, iterations, threads=None, seed=0):
+    """pymontecarlo.montecarlo_ranges, threads defaults to config_threads()"""
+    return pymontecarlo.montecarlo_ranges(players, table_cards, dead_cards, iterations,
+                                          threads=config_threads() if threads is None else threads, seed=seed)
@@ -1,14 +1,8 @@
-<%
-cfg['compiler_args'] = ['/std:c++17']
-setup_pybind11(cfg)
-cfg['sources'] = ['Montecarlo.cpp']
-%>
-
-
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 
 #include <pybind11/stl.h>
-#include <pybind11/complex.h>,
+#include <pybind11/complex.h>
 #include <pybind11/functional.h>
 #include <pybind11/chrono.h>
 
@@ -18,6 +12,65 @@ namespace py = pybind11;
 using namespace pybind11::literals;
 
 
+// equities of the rows of a [K, BATCH_COLUMNS] int array (see Montecarlo.h) as a float64 array of length K
+py::array_t<double> montecarlo_batch_array(py::array_t<int, py::array::c_style | py::array::forcecast> situations,
+	int threads, std::uint64_t seed) {
+	if (situations.ndim() != 2 || situations.shape(1) != BATCH_COLUMNS)
+		throw std::invalid_argument("situations need the shape [K, " + std::to_string(BATCH_COLUMNS) + "]");
+	const auto count = static_cast<std::size_t>(situations.shape(0));
+	py::array_t<double> equities(count);
+	const int* rows = situations.data();
+	double* results = equities.mutable_data();
+	{
+		py::gil_scoped_release release;
+		montecarlo_batch(rows, count, results, threads, seed);
+	}
+	return equities;
+}
+
+CardMask ints_to_mask(const std::vector<int>& cards) {
+	CardMask mask = 0;
+	for (const int card : cards) {
+		if (card < 0 || card >= NUM_CARDS)
+			throw std::invalid_argument("Unknown card: " + std::to_string(card));
+		mask |= CardMask{ 1 } << card;
+	}
+	return mask;
+}
+
+// equity of the first player, each player is None for a random hand or (combos [n, 2] ints, weights [n])
+double montecarlo_ranges_arrays(const py::list& players, const std::vector<int>& table_cards,
+	const std::vector<int>& dead_cards, int iterations, int threads, std::uint64_t seed) {
+	std::vector<Range> ranges;
+	for (const auto& player : players) {
+		Range range;
+		if (!player.is_none()) {
+			const auto combo_weights = player.cast<py::tuple>();
+			const auto combos = combo_weights[0].cast<py::array_t<int, py::array::c_style | py::array::forcecast>>();
+			const auto weights = combo_weights[1].cast<py::array_t<double, py::array::c_style | py::array::forcecast>>();
+			if (combos.ndim() != 2 || combos.shape(1) != 2 || weights.ndim() != 1 || weights.shape(0) != combos.shape(0))
+				throw std::invalid_argument("A range needs combos of the shape [n, 2] and n weights");
+			for (py::ssize_t ix = 0; ix < combos.shape(0); ++ix)
+				range.combos.push_back(ints_to_mask({ combos.at(ix, 0), combos.at(ix, 1) }));
+			range.weights.assign(weights.data(), weights.data() + weights.shape(0));
+		}
+		ranges.push_back(std::move(range));
+	}
+	const CardMask table = ints_to_mask(table_cards), dead = ints_to_mask(dead_cards);
+	py::gil_scoped_release release;
+	return montecarlo_ranges(ranges, table, dead, iterations, threads, seed);
+}
+
+
 PYBIND11_MODULE(pymontecarlo, m) {
-	m.def("montecarlo", &montecarlo);
+	// card sets are converted while the GIL is held, the simulation runs without it
+	m.def("montecarlo", &montecarlo, "my_cards"_a, "cards_on_table"_a, "number_of_players"_a, "iterations"_a,
+		"seed"_a = 0, py::call_guard<py::gil_scoped_release>());
+	m.def("montecarlo_parallel", &montecarlo_parallel, "my_cards"_a, "cards_on_table"_a, "number_of_players"_a,
+		"iterations"_a, "threads"_a = 0, "seed"_a = 0, py::call_guard<py::gil_scoped_release>());
+	m.def("montecarlo_batch", &montecarlo_batch_array, "situations"_a, "threads"_a = 0, "seed"_a = 0);
+	m.attr("BATCH_COLUMNS") = BATCH_COLUMNS;
+	m.def("montecarlo_ranges", &montecarlo_ranges_arrays, "players"_a, "table_cards"_a, "dead_cards"_a,
+		"iterations"_a, "threads"_a = 0, "seed"_a = 0);
+	m.def("evaluate_mask", &evaluate_mask, "cards"_a);
 }
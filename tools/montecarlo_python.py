@@ -3,24 +3,61 @@ Runs a Montecarlo simulation to calculate the probability
 of winning with a certain pokerhand and a given amount of player.
 """
 
-from tools.hand_evaluator import eval_best_hand
+from tools.cards import CARD_INDEX, CARD_STRINGS, NUM_CARDS, cards_to_ints, ints_to_mask, new_deck
+from tools.hand_evaluator import CATEGORY_SHIFT, HAND_TYPES, evaluate_batch
+from tools.montecarlo_cpp import montecarlo_ranges, pymontecarlo
+from tools.preflop_equity import STARTING_HANDS, get_preflop_equities, hands_by_equity, preflop_lookup
 
 __author__ = 'Nicolas Dickreuter'
 
 # pylint: skip-file
 import logging
-import operator
 import time
 from collections import Counter
-from copy import copy
+from itertools import combinations
+from math import comb, inf, sqrt
 
 import numpy as np
 
 log = logging.getLogger(__name__)
 
 
+def _short_notation_table():
+    """Short notation (e.g. 'AKS', 'AKO', 'AA') for every ordered pair of integer cards"""
+    table = [[None] * NUM_CARDS for _ in range(NUM_CARDS)]
+    for card1 in range(NUM_CARDS):
+        for card2 in range(NUM_CARDS):
+            rank1, rank2 = CARD_STRINGS[card1][0], CARD_STRINGS[card2][0]
+            suited_str = 'S' if card1 & 3 == card2 & 3 else 'O'
+            if rank1 == rank2:
+                suited_str = ''
+            table[card1][card2] = (rank1 + rank2 + suited_str, rank2 + rank1 + suited_str)
+    return table
+
+
+def _combo_table():
+    """All 1326 hole card combos with their short notations and card masks"""
+    first, second = np.triu_indices(NUM_CARDS, 1)
+    combos = np.stack([first, second], axis=1).astype(np.int64)
+    notations = np.array([SHORT_NOTATION[card1][card2] for card1, card2 in combos])
+    masks = (1 << combos[:, 0]) | (1 << combos[:, 1])
+    return combos, notations, masks
+
+
+SHORT_NOTATION = _short_notation_table()
+COMBOS, COMBO_NOTATIONS, COMBO_MASKS = _combo_table()
+MAX_RANGE_REDRAWS = 1000  # rounds of redrawing runs where the ranges of different players clash
+EVALUATION_BATCH_SIZE = 1000  # dealt runs that are collected before they are scored in one vectorized call
+ADAPTIVE_BATCH_SIZE = 250  # runs between standard error checks when sampling towards a target standard error
+EXACT_ENUMERATION_THRESHOLD = 50000  # upper bound of enumerated runs, heads-up turn spots have 45540
+
+
 class MonteCarlo(object):
 
+    def __init__(self, rng=None):
+        """rng is the numpy.random.Generator that deals the runs, one with fresh entropy if not given"""
+        self.rng = np.random.default_rng() if rng is None else rng
+
     def get_two_short_notation(self, input_cards, add_O_to_pairs=False):
         card1 = input_cards[0][0]
         card2 = input_cards[1][0]
@@ -33,163 +70,202 @@ class MonteCarlo(object):
 
         return card1 + card2 + suited_str, card2 + card1 + suited_str
 
+    @property
+    def preflop_equities(self):
+        """Heads-up preflop equity of every starting hand"""
+        return get_preflop_equities(2)
+
     def get_opponent_allowed_cards_list(self, opponent_ranges):
-        self.preflop_equities = {"23O": 0.354, "24O": 0.36233333333333334, "26O": 0.3758666666666667, "34O": 0.3792,
-                                 "25O": 0.3804666666666667, "27O": 0.3807333333333333, "23S": 0.3876, "36O": 0.39,
-                                 "35O": 0.3900666666666667,
-                                 "37O": 0.3957333333333333, "38O": 0.40013333333333334, "24S": 0.4024, "27S": 0.405,
-                                 "28O": 0.4060666666666667, "25S": 0.4076, "26S": 0.41046666666666665, "46O": 0.4108,
-                                 "47O": 0.41713333333333336, "34S": 0.4176666666666667, "45O": 0.4179333333333333,
-                                 "29O": 0.4215333333333333,
-                                 "48O": 0.4234, "37S": 0.424, "35S": 0.4246, "36S": 0.4268, "39O": 0.42733333333333334,
-                                 "56O": 0.428,
-                                 "28S": 0.42873333333333336, "57O": 0.4331333333333333, "49O": 0.43473333333333336,
-                                 "38S": 0.4358,
-                                 "2TO": 0.4362666666666667, "58O": 0.4378666666666667, "45S": 0.4434666666666667,
-                                 "46S": 0.4444,
-                                 "47S": 0.4448666666666667, "67O": 0.4461333333333333, "3TO": 0.4532, "48S": 0.4534,
-                                 "56S": 0.4538,
-                                 "29S": 0.45466666666666666, "39S": 0.45686666666666664, "68O": 0.4570666666666667,
-                                 "59O": 0.45866666666666667, "57S": 0.4640666666666667, "4TO": 0.46526666666666666,
-                                 "49S": 0.46546666666666664, "2JO": 0.466, "69O": 0.4666, "5TO": 0.4672,
-                                 "2TS": 0.46786666666666665,
-                                 "78O": 0.4722, "58S": 0.4756, "6TO": 0.4768, "3TS": 0.47733333333333333, "79O": 0.4788,
-                                 "67S": 0.4808,
-                                 "3JO": 0.4808, "59S": 0.48133333333333334, "68S": 0.48346666666666666,
-                                 "4JO": 0.48633333333333334,
-                                 "2QO": 0.4928666666666667, "2JS": 0.49406666666666665, "69S": 0.49546666666666667,
-                                 "3QO": 0.4965333333333333, "4TS": 0.49706666666666666, "6JO": 0.4971333333333333,
-                                 "5JO": 0.49793333333333334, "5TS": 0.5010666666666667, "7TO": 0.5022, "89O": 0.5038,
-                                 "6TS": 0.5054,
-                                 "78S": 0.5059333333333333, "3JS": 0.5124, "8TO": 0.5130666666666667,
-                                 "7JO": 0.5150666666666667,
-                                 "4JS": 0.5166, "79S": 0.5176666666666667, "7TS": 0.5187333333333334,
-                                 "2QS": 0.5188666666666667,
-                                 "22": 0.5194666666666666, "4QO": 0.5205333333333333, "6JS": 0.5217333333333334,
-                                 "5QO": 0.5253333333333333,
-                                 "5JS": 0.5254, "2KO": 0.5275333333333333, "3KO": 0.5282666666666667, "89S": 0.5294,
-                                 "8JO": 0.5295333333333333, "9TO": 0.5298, "6QO": 0.5319333333333334,
-                                 "4QS": 0.5332666666666667,
-                                 "3QS": 0.5352, "7QO": 0.5357333333333333, "7JS": 0.5391333333333334, "4KO": 0.5392,
-                                 "8TS": 0.5393333333333333, "5KO": 0.5412666666666667, "9JO": 0.5472666666666667,
-                                 "5QS": 0.5484666666666667,
-                                 "2KS": 0.5512666666666667, "33": 0.5556, "9TS": 0.5558666666666666, "8QO": 0.557,
-                                 "6QS": 0.5571333333333334,
-                                 "8JS": 0.5590666666666667, "7QS": 0.5597333333333333, "6KO": 0.5597333333333333,
-                                 "4KS": 0.5641333333333334,
-                                 "9QO": 0.5652666666666667, "3KS": 0.5654666666666667, "2AO": 0.5668, "8KO": 0.5674,
-                                 "TJO": 0.5682666666666667, "7KO": 0.5684, "3AO": 0.5736666666666667, "8QS": 0.5752,
-                                 "5KS": 0.5762666666666667, "9JS": 0.5798666666666666, "44": 0.5818666666666666,
-                                 "6KS": 0.5852,
-                                 "TQO": 0.5856666666666667, "2AS": 0.5878666666666666, "9QS": 0.5883333333333334,
-                                 "7KS": 0.5898666666666667,
-                                 "9KO": 0.5908, "JQO": 0.5912, "4AO": 0.5918666666666667, "6AO": 0.5934666666666667,
-                                 "5AO": 0.5938,
-                                 "TJS": 0.5943333333333334, "8KS": 0.5964666666666667, "7AO": 0.6003333333333334,
-                                 "3AS": 0.6010666666666666,
-                                 "TQS": 0.6062, "TKO": 0.6062666666666666, "4AS": 0.6072, "9AO": 0.6084,
-                                 "JQS": 0.6100666666666666,
-                                 "JKO": 0.6107333333333334, "9KS": 0.6149333333333333, "8AO": 0.6162666666666666,
-                                 "55": 0.6185333333333334,
-                                 "6AS": 0.6204666666666667, "QKO": 0.6242666666666666, "5AS": 0.6255333333333334,
-                                 "7AS": 0.6282666666666666,
-                                 "8AS": 0.6311333333333333, "TKS": 0.6348666666666667, "TAO": 0.6371333333333333,
-                                 "66": 0.6403333333333333,
-                                 "QKS": 0.6410666666666667, "9AS": 0.6426, "JKS": 0.6436, "JAO": 0.6460666666666667,
-                                 "TAS": 0.6498,
-                                 "QAO": 0.6514, "77": 0.6592, "KAO": 0.6592, "JAS": 0.6612666666666667,
-                                 "QAS": 0.6670666666666667,
-                                 "KAS": 0.6816666666666666, "88": 0.6978, "99": 0.7197333333333333,
-                                 "TT": 0.7524666666666666, "JJ": 0.7754,
-                                 "QQ": 0.8024, "KK": 0.8305333333333333, "AA": 0.8527333333333333}
-        peflop_equity_list = sorted(self.preflop_equities.items(), key=operator.itemgetter(1))
-
-        counts = len(peflop_equity_list)
-        take_top = int(counts * opponent_ranges)
-        allowed = set(list(peflop_equity_list)[-take_top:])
-        allowed_cards = [i[0] for i in allowed]
-        # log.debug("Allowed range: "+str(allowed_cards))
-        return set(allowed_cards)
+        """Top share of starting hands by heads-up preflop equity, e.g. 0.1 for the best 10%"""
+        if opponent_ranges >= 1:
+            return set(STARTING_HANDS)  # no need to rank, which keeps the table out of its own generation
+        ranked_hands = hands_by_equity(2)
+        take_top = int(len(ranked_hands) * opponent_ranges)
+        return set(ranked_hands[-take_top:])
 
     def create_card_deck(self):
-        values = "23456789TJQKA"
-        suites = "CDHS"
-        Deck = []
-        [Deck.append(x + y) for x in values for y in suites]
-        return Deck
-
-    def distribute_cards_to_players(self, deck, player_amount, player_card_list, known_table_cards,
-                                    opponent_allowed_cards, passes):
-
-        # rmove table cards from deck
-        CardsOnTable = []
-        for known_table_card in known_table_cards:
-            CardsOnTable.append(
-                deck.pop(deck.index(known_table_card)))  # remove cards that are on the table from the deck
-
-        all_players = []
-        knownPlayers = 0  # for potential collusion if more than one bot is running on the same table
-
-        for player_cards in player_card_list:
-            known_player = []
-
-            if type(player_cards) == set:
-                while True:
-                    passes += 1
-                    random_card1 = np.random.randint(0, len(deck))
-                    random_card2 = np.random.randint(0, len(deck) - 1)
-                    if not random_card1 == random_card2:
-                        crd1, crd2 = self.get_two_short_notation([deck[random_card1], deck[random_card2]],
-                                                                 add_O_to_pairs=False)
-                        if crd1 in player_cards or crd2 in player_cards:
-                            break
-                player_cards = []
-                player_cards.append(deck[random_card1])
-                player_cards.append(deck[random_card2])
-
-            known_player.append(player_cards[0])
-            known_player.append(player_cards[1])
-            all_players.append(known_player)
-
-            try:
-                deck.pop(deck.index(player_cards[0]))
-            except:
-                pass
-            try:
-                deck.pop(deck.index(player_cards[1]))
-            except:
-                pass
-
-            knownPlayers += 1  # my own cards are known
-
-        for _ in range(player_amount - knownPlayers):
-            random_player = []
-            while True:
-                passes += 1
-                random_card1 = np.random.randint(0, len(deck))
-                random_card2 = np.random.randint(0, len(deck) - 1)
-
-                if not random_card1 == random_card2:
-                    crd1, crd2 = self.get_two_short_notation([deck[random_card1], deck[random_card2]],
-                                                             add_O_to_pairs=False)
-                    if crd1 in opponent_allowed_cards or crd2 in opponent_allowed_cards:
-                        break
-
-            random_player.append(deck.pop(random_card1))
-            random_player.append(deck.pop(random_card2))
-
-            all_players.append(random_player)
-
-        return all_players, deck, passes
-
-    def distribute_cards_to_table(self, Deck, table_card_list):
-        remaningRandoms = 5 - len(table_card_list)
-        for n in range(0, remaningRandoms):
-            table_card_list.append(Deck.pop(np.random.randint(0, len(Deck) - 1)))
-        return table_card_list
+        return new_deck()
+
+    def expand_range(self, hand_range, dead_mask):
+        """
+        Hole card combos of a range in short notation (e.g. {'AA', 'AKS'}) that contain no dead cards.
+
+        A range given as a dict maps short notations to weights, in a set all hands weigh the same.
+
+        Returns:
+            combos (np.ndarray): [n, 2] integer cards
+            weights (np.ndarray): weight of each combo
+
+        """
+        notations = list(hand_range)
+        weights = hand_range if type(hand_range) == dict else dict.fromkeys(notations, 1.0)
+        first_notation = np.isin(COMBO_NOTATIONS[:, 0], notations)
+        second_notation = np.isin(COMBO_NOTATIONS[:, 1], notations)
+        keep = np.flatnonzero((first_notation | second_notation) & (COMBO_MASKS & dead_mask == 0))
+        combo_weights = [weights[COMBO_NOTATIONS[ix, 0] if first_notation[ix] else COMBO_NOTATIONS[ix, 1]]
+                         for ix in keep]
+        return COMBOS[keep], np.array(combo_weights, dtype=float)
+
+    def range_source(self, hand_range, dead_mask):
+        """Expanded range with cumulative weights to draw combos from, see deal_runs"""
+        combos, weights = self.expand_range(hand_range, dead_mask)
+        if not len(combos):
+            raise ValueError("No combos of the range " + str(hand_range) + " are left to deal")
+        return combos, np.cumsum(weights)
+
+    def deal_runs(self, runs, player_sources, table_cards, deck):
+        """
+        Deal a batch of runs.
+
+        Range players get a combo drawn by weight, runs where the combos of different range players share a
+        card are redrawn. Random players and the missing table cards are then dealt from the rest of the deck.
+
+        Args:
+            runs (int): number of runs
+            player_sources (list): per player either 2 fixed integer cards, a range from range_source or
+                None for random cards
+            table_cards (list): known integer table cards
+            deck (np.ndarray): integer cards that can be dealt, fixed player cards and table cards are removed
+
+        Returns:
+            dealt runs (np.ndarray): [runs, players, 7] integer cards
+            redraws (int): runs that were dealt again because ranges clashed
+
+        """
+        player_amount = len(player_sources)
+        hands = np.empty((runs, player_amount, 2), dtype=np.int64)
+        used = np.zeros(runs, dtype=np.int64)  # card masks of the range players' combos
+        range_players = []
+        random_players = []
+        for ix, source in enumerate(player_sources):
+            if source is None:
+                random_players.append(ix)
+            elif type(source) == tuple:
+                range_players.append(ix)
+            else:
+                hands[:, ix] = source
+
+        redraws = 0
+        pending = np.arange(runs)
+        for _ in range(MAX_RANGE_REDRAWS):
+            if not len(pending) or not range_players:
+                break
+            used[pending] = 0
+            clash = np.zeros(len(pending), dtype=bool)
+            for ix in range_players:
+                combos, cumulative_weights = player_sources[ix]
+                drawn = combos[np.searchsorted(cumulative_weights,
+                                               self.rng.random(len(pending)) * cumulative_weights[-1], side='right')]
+                masks = (1 << drawn[:, 0]) | (1 << drawn[:, 1])
+                clash |= (used[pending] & masks) != 0
+                used[pending] |= masks
+                hands[pending, ix] = drawn
+            pending = pending[clash]
+            redraws += len(pending)
+        else:
+            raise ValueError("The ranges of the players cannot be dealt together")
+
+        missing = 5 - len(table_cards)
+        needed = 2 * len(random_players) + missing
+        keys = self.rng.random((runs, len(deck)))
+        keys[((used[:, None] >> deck[None, :]) & 1).astype(bool)] = 2  # cards held by range players go last
+        drawn = deck[np.argsort(keys, axis=1)[:, :needed]]
+        for position, ix in enumerate(random_players):
+            hands[:, ix] = drawn[:, 2 * position:2 * position + 2]
+
+        board = np.concatenate([np.broadcast_to(table_cards, (runs, len(table_cards))),
+                                drawn[:, needed - missing:]], axis=1)
+        dealt_runs = np.concatenate([hands, np.broadcast_to(board[:, None, :], (runs, player_amount, 5))], axis=2)
+        return dealt_runs, redraws
+
+    def score_runs(self, dealt_runs, player_amount, winner_card_types, run_weights=None):
+        """
+        Score dealt runs in one batch.
+
+        Args:
+            dealt_runs (list): 7 integer cards per player per run, the first player of each run is the hero
+            player_amount (int): players per run
+            winner_card_types (Counter): the hero's share of each winning hand type is added
+            run_weights (np.ndarray): weight of each run for the hand types, all runs weigh 1 if not given
+
+        Returns:
+            the hero's share of the pot for each run, a split pot counts as 1 / number of tied players
+
+        """
+        strengths = evaluate_batch(np.array(dealt_runs, dtype=np.int8)).reshape(-1, player_amount)
+        hero = strengths[:, 0]
+        best = strengths.max(axis=1)
+        won = hero >= best
+        shares = np.zeros(len(strengths))
+        shares[won] = 1 / np.sum(strengths[won] == best[won, None], axis=1)
+        type_weights = shares[won] if run_weights is None else shares[won] * run_weights[won]
+        categories = np.bincount(hero[won] >> CATEGORY_SHIFT, weights=type_weights, minlength=len(HAND_TYPES))
+        for category, amount in enumerate(categories):
+            if amount:
+                winner_card_types[HAND_TYPES[category]] += amount
+        return shares
+
+    @staticmethod
+    def standard_error(shares_sum, shares_squared_sum, runs):
+        """Standard error of the equity estimated from the sum and the sum of squares of the per run shares"""
+        if runs < 2:
+            return inf
+        variance = max(0.0, (shares_squared_sum - shares_sum ** 2 / runs) / (runs - 1))
+        return sqrt(variance / runs)
+
+    def enumerate_runs(self, player_card_list, table_card_list, player_amount, deck, opponent_allowed_cards,
+                       threshold):
+        """
+        Deal every opponent holding and table runout instead of sampling them.
+
+        Only heads-up spots where the hero's cards are known and the number of runouts does not exceed the
+        threshold are enumerated, which makes the equity exact. Cards missing from deck, such as ghost cards,
+        are not dealt to the opponent either.
+
+        Returns:
+            dealt runs as an array of 7 integer cards per player per run and the weight of each run (mean 1),
+            None if the spot is not enumerated
+
+        """
+        if player_amount != 2 or len(player_card_list) != 1 or type(player_card_list[0]) in (set, dict):
+            return None
+        hero_cards = player_card_list[0]
+        deck = np.array([card for card in deck if card not in hero_cards and card not in table_card_list])
+        missing = 5 - len(table_card_list)
+        if comb(len(deck), 2) * comb(len(deck) - 2, missing) > threshold:
+            return None
+
+        dead_mask = ((1 << NUM_CARDS) - 1) & ~ints_to_mask(deck.tolist())  # hero, table and ghost cards
+        opponents, opponent_weights = self.expand_range(opponent_allowed_cards, dead_mask)
+        boards = list(combinations(deck, missing))
+        boards = np.array(boards, dtype=np.int64).reshape(len(boards), missing)
+
+        opponent_masks = (1 << opponents[:, 0]) | (1 << opponents[:, 1])
+        board_masks = np.bitwise_or.reduce(1 << boards, axis=1)
+        opponent_ix, board_ix = np.nonzero((opponent_masks[:, None] & board_masks[None, :]) == 0)
+        if not len(opponent_ix):
+            return None
+
+        runs = len(opponent_ix)
+        runouts = np.concatenate([np.broadcast_to(table_card_list, (runs, len(table_card_list))),
+                                  boards[board_ix]], axis=1)
+        hero = np.concatenate([np.broadcast_to(hero_cards, (runs, 2)), runouts], axis=1)
+        opponent = np.concatenate([opponents[opponent_ix], runouts], axis=1)
+        run_weights = opponent_weights[opponent_ix]
+        return np.stack([hero, opponent], axis=1).reshape(-1, 7), run_weights * runs / run_weights.sum()
 
     def run_montecarlo(self, original_player_card_list, original_table_card_list, player_amount, ui, maxRuns,
-                       timeout, ghost_cards, opponent_range=1):
+                       timeout, ghost_cards, opponent_range=1, exact_threshold=EXACT_ENUMERATION_THRESHOLD,
+                       target_stderr=None):
+        """
+        Estimate the equity of the first player in original_player_card_list.
+
+        Heads-up spots with at most maxRuns (and exact_threshold) runouts are enumerated exactly, otherwise
+        sampling stops after maxRuns runs or at the timeout. If target_stderr is given, it also stops as soon as
+        the standard error of the equity is at or below it; a confidence interval of +/- width corresponds
+        to a target_stderr of width / 1.96 at 95%. The runs used and the standard error are stored in
+        self.runs and self.stderr.
+        """
 
         if type(opponent_range) == float or type(opponent_range) == int:
             opponent_allowed_cards = self.get_opponent_allowed_cards_list(opponent_range)
@@ -198,50 +274,68 @@ class MonteCarlo(object):
             log.debug('Preflop reverse tables for ranges for opponent: YES')
             opponent_allowed_cards = opponent_range
 
-        winnerCardTypeList = []
+        winnerCardTypeList = Counter()
         wins = 0
+        wins_squared = 0
         runs = 0
         passes = 0
         OriginalDeck = self.create_card_deck()
         if ghost_cards != '':
-            OriginalDeck.pop(OriginalDeck.index(ghost_cards[0]))
-            OriginalDeck.pop(OriginalDeck.index(ghost_cards[1]))
-
-        for m in range(maxRuns):
-            runs += 1
-            Deck = copy(OriginalDeck)
-            PlayerCardList = copy(original_player_card_list)
-            TableCardsList = copy(original_table_card_list)
-            Players, Deck, passes = self.distribute_cards_to_players(Deck, player_amount, PlayerCardList,
-                                                                     TableCardsList, opponent_allowed_cards, passes)
-            Deck5Cards = self.distribute_cards_to_table(Deck, TableCardsList)
-            PlayerFinalCardsWithTableCards = []
-            for o in range(0, player_amount):
-                PlayerFinalCardsWithTableCards.append(Players[o] + Deck5Cards)
-
-            bestHand, winnerCardType = eval_best_hand(PlayerFinalCardsWithTableCards)
-            winner = (PlayerFinalCardsWithTableCards.index(bestHand))
-
-            # print (winnerCardType)
-
-            CollusionPlayers = 0
-            if winner < CollusionPlayers + 1:
-                wins += 1
-                winnerCardTypeList.append(
-                    winnerCardType)  # winnerlist.append(winner)  # self.equity=wins/m  # if self.equity>0.99: self.equity=0.99  # EquityList.append(self.equity)
-
-            self.equity = np.round(wins / runs, 3)
-
-            if passes > 999 and time.time() > timeout:
-                log.debug("Cutting short montecarlo due to timeout")
-                log.debug("Passes: " + str(passes))
-                log.debug("Runs: " + str(runs))
-                break
+            OriginalDeck.pop(OriginalDeck.index(CARD_INDEX[ghost_cards[0]]))
+            OriginalDeck.pop(OriginalDeck.index(CARD_INDEX[ghost_cards[1]]))
+
+        # convert to integer cards once, ranges given as sets or dicts of short notations are kept as they are
+        original_player_card_list = [player_cards if type(player_cards) in (set, dict) else cards_to_ints(player_cards)
+                                     for player_cards in original_player_card_list]
+        original_table_card_list = cards_to_ints(original_table_card_list)
+
+        # enumerating more runs than would be sampled is slower and would ignore maxRuns and the timeout
+        exact = self.enumerate_runs(original_player_card_list, original_table_card_list, player_amount,
+                                    OriginalDeck, opponent_allowed_cards, min(exact_threshold, maxRuns))
+        if exact is not None:
+            exact_runs, run_weights = exact
+            runs = len(run_weights)
+            log.debug("Exact enumeration of " + str(runs) + " runs")
+            wins = self.score_runs(exact_runs, player_amount, winnerCardTypeList, run_weights) @ run_weights
+            self.stderr = 0.0
+
+        else:
+            known_cards = [card for player_cards in original_player_card_list
+                           if type(player_cards) not in (set, dict) for card in player_cards]
+            dead_mask = ints_to_mask(known_cards + original_table_card_list + cards_to_ints(ghost_cards))
+            deck = np.array([card for card in OriginalDeck if not dead_mask >> card & 1], dtype=np.int64)
+            player_sources = [self.range_source(player_cards, dead_mask) if type(player_cards) in (set, dict)
+                              else np.array(player_cards) for player_cards in original_player_card_list]
+            for _ in range(player_amount - len(original_player_card_list)):
+                # a range with all starting hands is dealt as random cards
+                if type(opponent_allowed_cards) == set and len(opponent_allowed_cards) >= len(STARTING_HANDS):
+                    player_sources.append(None)
+                else:
+                    player_sources.append(self.range_source(opponent_allowed_cards, dead_mask))
+
+            batch_size = EVALUATION_BATCH_SIZE if target_stderr is None else ADAPTIVE_BATCH_SIZE
+            while runs < maxRuns:
+                batch = min(batch_size, maxRuns - runs)
+                dealt_runs, redraws = self.deal_runs(batch, player_sources, original_table_card_list, deck)
+                runs += batch
+                passes += batch + redraws
+                shares = self.score_runs(dealt_runs, player_amount, winnerCardTypeList)
+                wins += shares.sum()
+                wins_squared += shares @ shares
+                if target_stderr is not None and self.standard_error(wins, wins_squared, runs) <= target_stderr:
+                    log.debug("Target standard error reached after " + str(runs) + " runs")
+                    break
+
+                if time.time() > timeout:
+                    log.debug("Cutting short montecarlo due to timeout")
+                    log.debug("Passes: " + str(passes))
+                    log.debug("Runs: " + str(runs))
+                    break
 
-                # if passes >= maxruns: break
+            self.stderr = self.standard_error(wins, wins_squared, runs)
 
-        self.equity = wins / runs
-        self.winnerCardTypeList = Counter(winnerCardTypeList)
+        self.equity = float(wins / runs)
+        self.winnerCardTypeList = winnerCardTypeList
         for key, value in self.winnerCardTypeList.items():
             self.winnerCardTypeList[key] = value / runs
 
@@ -251,6 +345,52 @@ class MonteCarlo(object):
 
         return self.equity, self.winTypesDict
 
+    def cpp_ranges(self, player_card_list, table_card_list, player_amount, ghost_cards, opponent_range=1):
+        """
+        Players of run_montecarlo as ranges for pymontecarlo.montecarlo_ranges.
+
+        Returns:
+            list with (combos, weights) per player, None for random hands
+
+        """
+        opponent_allowed_cards = opponent_range
+        if type(opponent_range) in (float, int):
+            opponent_allowed_cards = self.get_opponent_allowed_cards_list(opponent_range)
+        player_card_list = [player_cards if type(player_cards) in (set, dict) else cards_to_ints(player_cards)
+                            for player_cards in player_card_list]
+        known_cards = [card for player_cards in player_card_list
+                       if type(player_cards) not in (set, dict) for card in player_cards]
+        dead_mask = ints_to_mask(known_cards + cards_to_ints(table_card_list) + cards_to_ints(ghost_cards))
+
+        ranges = [self.expand_range(player_cards, dead_mask) if type(player_cards) in (set, dict)
+                  else (np.array([player_cards]), np.ones(1)) for player_cards in player_card_list]
+        for _ in range(player_amount - len(player_card_list)):
+            if type(opponent_allowed_cards) == set and len(opponent_allowed_cards) >= len(STARTING_HANDS):
+                ranges.append(None)
+            else:
+                ranges.append(self.expand_range(opponent_allowed_cards, dead_mask))
+        return ranges
+
+    def run_montecarlo_cpp(self, original_player_card_list, original_table_card_list, player_amount, maxRuns,
+                           ghost_cards, opponent_range=1, seed=None):
+        """
+        Equity of the first player like run_montecarlo, simulated by the C++ extension.
+
+        The seed of the C++ generator is drawn from self.rng if not given. The simulation uses the threads of
+        the [MultiThreading] config. Hand types are not collected.
+        Raises RuntimeError if the extension is not built.
+        """
+        if pymontecarlo is None:
+            raise RuntimeError("The C++ equity calculator is not built (python setup.py build_ext --inplace)")
+        ranges = self.cpp_ranges(original_player_card_list, original_table_card_list, player_amount, ghost_cards,
+                                 opponent_range)
+        if seed is None:
+            seed = int(self.rng.integers(1, 2 ** 63))
+        self.equity = montecarlo_ranges(ranges, cards_to_ints(original_table_card_list), cards_to_ints(ghost_cards),
+                                        maxRuns, seed=seed)
+        self.runs = maxRuns
+        return self.equity
+
 
 def run_montecarlo_wrapper(p, ui_action_and_signals, config, ui, t, L, preflop_state, h):
     # Prepare for montecarlo simulation to evaluate equity (probability of winning with given cards)
@@ -292,7 +432,7 @@ def run_montecarlo_wrapper(p, ui_action_and_signals, config, ui, t, L, preflop_s
 
     t.PlayerCardList = []
     t.PlayerCardList.append(t.mycards)
-    t.PlayerCardList_and_others = copy(t.PlayerCardList)
+    t.PlayerCardList_and_others = list(t.PlayerCardList)
 
     ghost_cards = ''
     m.collusion_cards = ''
@@ -348,9 +488,15 @@ def run_montecarlo_wrapper(p, ui_action_and_signals, config, ui, t, L, preflop_s
             t.player_card_range_list_and_others = t.PlayerCardList_and_others[:]
             t.player_card_range_list_and_others[0] = preflop_state.preflop_bot_ranges
 
-            t.range_equity, _ = m.run_montecarlo(t.player_card_range_list_and_others, t.cardsOnTable,
-                                                 int(t.assumedPlayers), ui, maxRuns=maxRuns, ghost_cards=ghost_cards,
-                                                 timeout=timeout, opponent_range=opponent_range)
+            if pymontecarlo is not None:
+                t.range_equity = m.run_montecarlo_cpp(t.player_card_range_list_and_others, t.cardsOnTable,
+                                                      int(t.assumedPlayers), maxRuns=maxRuns, ghost_cards=ghost_cards,
+                                                      opponent_range=opponent_range)
+            else:
+                t.range_equity, _ = m.run_montecarlo(t.player_card_range_list_and_others, t.cardsOnTable,
+                                                     int(t.assumedPlayers), ui, maxRuns=maxRuns,
+                                                     ghost_cards=ghost_cards, timeout=timeout,
+                                                     opponent_range=opponent_range)
             t.range_equity = np.round(t.range_equity, 2)
             log.debug("Range montecarlo completed successfully with runs: " + str(m.runs))
             log.debug("Range equity (range for bot): " + str(t.range_equity))
@@ -398,11 +544,13 @@ def run_montecarlo_wrapper(p, ui_action_and_signals, config, ui, t, L, preflop_s
     return m
 
 
-def get_equity(player_cards, table_cards, players, runs):
-    """Get equity from a monteacrlo run"""
-    simulation = MonteCarlo()
+@preflop_lookup
+def get_equity(player_cards, table_cards, players, runs, target_stderr=None, rng=None):
+    """Get equity from a monteacrlo run, runs is the maximum if a target standard error is given"""
+    simulation = MonteCarlo(rng)
     simulation.run_montecarlo([list(player_cards)], list(table_cards), players, 1, maxRuns=runs,
-                              timeout=time.time() + 1, ghost_cards='', opponent_range=1)
+                              timeout=time.time() + 1, ghost_cards='', opponent_range=1,
+                              target_stderr=target_stderr)
     return simulation.equity
 
 
@@ -426,5 +574,5 @@ if __name__ == '__main__':
     print("--- %s seconds ---" % (time.time() - start_time))
     print("Runs: " + str(Simulation.runs))
     print("Passes: " + str(Simulation.passes))
-    equity = Simulation.equity  # considering draws as wins
+    equity = Simulation.equity  # split pots count as a share of the pot
     print("Equity: " + str(equity))
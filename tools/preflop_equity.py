@@ -0,0 +1,157 @@
+"""
+Precomputed preflop equities of all 169 starting hands for 2 to 10 players.
+
+The table is generated by Monte Carlo simulation and shipped as a versioned csv file in the data folder,
+so that preflop equities are a single array lookup. Regenerate it with ``main.py preflop_table``.
+"""
+import logging
+import os
+import time
+from functools import lru_cache, wraps
+from multiprocessing import Pool
+
+import numpy as np
+
+from tools.cards import CARD_RANKS, CARD_INDEX, rank_of, suit_of
+from tools.helper import get_dir, get_multiprocessing_config
+
+# pylint: disable=import-outside-toplevel
+
+log = logging.getLogger(__name__)
+
+PREFLOP_TABLE_VERSION = 1
+MIN_PLAYERS = 2
+MAX_PLAYERS = 10
+DEFAULT_RUNS = 100000  # standard error of each entry below 0.0016
+
+
+def _starting_hands():
+    """Short notations of all starting hands, lower rank first as in 'KAS', 'KAO' and 'AA'"""
+    hands = []
+    for low, low_rank in enumerate(CARD_RANKS):
+        for high_rank in CARD_RANKS[low:]:
+            if low_rank == high_rank:
+                hands.append(low_rank + high_rank)
+            else:
+                hands.extend([low_rank + high_rank + 'S', low_rank + high_rank + 'O'])
+    return tuple(hands)
+
+
+STARTING_HANDS = _starting_hands()
+HAND_INDEX = {hand: ix for ix, hand in enumerate(STARTING_HANDS)}
+
+
+def starting_hand(cards):
+    """Short notation of two hole cards, given as card strings or integer cards"""
+    card1, card2 = (CARD_INDEX[card] if isinstance(card, str) else card for card in cards)
+    if rank_of(card1) > rank_of(card2):
+        card1, card2 = card2, card1
+    ranks = CARD_RANKS[rank_of(card1)] + CARD_RANKS[rank_of(card2)]
+    if rank_of(card1) == rank_of(card2):
+        return ranks
+    return ranks + ('S' if suit_of(card1) == suit_of(card2) else 'O')
+
+
+def example_cards(hand):
+    """Hole cards (strings) for a short notation"""
+    return [hand[0] + 'S', hand[1] + ('S' if hand.endswith('S') and len(hand) == 3 else 'H')]
+
+
+def get_preflop_table_filename():
+    """Location of the shipped preflop equity table."""
+    return get_dir('data', f'preflop_equities_v{PREFLOP_TABLE_VERSION}.csv')
+
+
+_table = None
+
+
+def load_preflop_table(filename=None):
+    """Read the table into an array of [hand index, players], rows follow STARTING_HANDS."""
+    global _table  # pylint: disable=global-statement
+    filename = filename or get_preflop_table_filename()
+    table = np.full((len(STARTING_HANDS), MAX_PLAYERS + 1), np.nan)
+    with open(filename, encoding='utf-8') as file:
+        header = file.readline().strip().split(',')
+        players = [int(column) for column in header[1:]]
+        for line in file:
+            hand, *equities = line.strip().split(',')
+            table[HAND_INDEX[hand], players] = [float(equity) for equity in equities]
+    _table = table
+    get_preflop_equities.cache_clear()
+    hands_by_equity.cache_clear()
+    return table
+
+
+def get_preflop_equity(cards, players):
+    """Equity of two hole cards against players - 1 random hands, looked up in the preflop table"""
+    if _table is None:
+        load_preflop_table()
+    return _table[HAND_INDEX[starting_hand(cards)], players]
+
+
+@lru_cache(maxsize=None)
+def get_preflop_equities(players=2):
+    """Equity of every starting hand for a number of players as dict"""
+    if _table is None:
+        load_preflop_table()
+    return {hand: float(_table[ix, players]) for ix, hand in enumerate(STARTING_HANDS)}
+
+
+@lru_cache(maxsize=None)
+def hands_by_equity(players=2):
+    """Starting hands sorted from the lowest to the highest equity"""
+    equities = get_preflop_equities(players)
+    return tuple(sorted(STARTING_HANDS, key=equities.get))
+
+
+def preflop_lookup(get_equity):
+    """Answer preflop spots of an equity calculator get_equity(player_cards, table_cards, players, runs) from the table"""
+
+    @wraps(get_equity)
+    def get_equity_with_lookup(player_cards, table_cards, players, runs, *args, **kwargs):
+        if not table_cards and MIN_PLAYERS <= players <= MAX_PLAYERS:
+            return float(get_preflop_equity(list(player_cards), players))
+        return get_equity(player_cards, table_cards, players, runs, *args, **kwargs)
+
+    return get_equity_with_lookup
+
+
+def save_preflop_table(table, filename=None):
+    """Write the table as csv, atomically so that readers never see a partial file."""
+    filename = filename or get_preflop_table_filename()
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'w', encoding='utf-8') as file:
+        file.write(','.join(['hand'] + [str(players) for players in range(MIN_PLAYERS, MAX_PLAYERS + 1)]) + '\n')
+        for hand, equities in zip(STARTING_HANDS, table):
+            file.write(','.join([hand] + [f"{equity:.4f}" for equity in equities[MIN_PLAYERS:]]) + '\n')
+    os.replace(tmp_filename, filename)
+    return filename
+
+
+def _simulate(task):
+    """Equity of one cell of the table, seeded by its position so that the table is reproducible"""
+    from tools.montecarlo_python import MonteCarlo
+    hand_ix, players, runs = task
+    simulation = MonteCarlo(np.random.default_rng((hand_ix, players)))
+    simulation.run_montecarlo([example_cards(STARTING_HANDS[hand_ix])], [], players, None, maxRuns=runs,
+                              timeout=float('inf'), ghost_cards='')
+    return hand_ix, players, simulation.equity
+
+
+def generate_preflop_table(runs=DEFAULT_RUNS, cores=None, filename=None):
+    """Simulate every starting hand for 2 to 10 players in parallel and save the table."""
+    if cores is None:
+        _, cores = get_multiprocessing_config()
+    tasks = [(hand_ix, players, runs) for hand_ix in range(len(STARTING_HANDS))
+             for players in range(MIN_PLAYERS, MAX_PLAYERS + 1)]
+    table = np.full((len(STARTING_HANDS), MAX_PLAYERS + 1), np.nan)
+    start = time.time()
+    log.info(f"Simulating {len(tasks)} preflop equities with {runs} runs each on {cores} cores")
+    with Pool(cores) as pool:
+        for done, (hand_ix, players, equity) in enumerate(pool.imap_unordered(_simulate, tasks), 1):
+            table[hand_ix, players] = equity
+            if done % 100 == 0:
+                log.info(f"{done}/{len(tasks)} done after {time.time() - start:.0f}s")
+    return save_preflop_table(table, filename)
+